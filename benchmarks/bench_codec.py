@@ -0,0 +1,54 @@
+"""Benchmark the compressed keypoint codec
+
+Encodes and decodes the same synthetic clips with every compression and
+a few precisions, and reports compression ratio against raw float32,
+encode and decode throughput and the largest error:
+
+    python benchmarks/bench_codec.py [videos] [frames_per_video]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from keypoint_codec import decode, encode, zstandard
+from synthetic_motion import generate
+
+PRECISIONS = (None, 1e-4, 1e-3)
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 30000
+    clips = generate(videos, frames)
+    raw_bytes = clips.nbytes
+    print(f'{videos} videos x {frames} frames = {raw_bytes / 1e6:.0f} MB of float32')
+    print(f"{'compression':<13}{'precision':>10}{'ratio':>8}{'encode MB/s':>14}"
+          f"{'decode MB/s':>14}{'max error':>12}")
+
+    compressions = [None, 'gzip'] + (['zstd'] if zstandard is not None else [])
+    for compression in compressions:
+        for precision in PRECISIONS:
+            start = time.perf_counter()
+            encoded = [encode(clip, compression=compression, precision=precision) for clip in clips]
+            encode_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            decoded = [decode(buffer)[1] for buffer in encoded]
+            decode_time = time.perf_counter() - start
+
+            size = sum(len(buffer) for buffer in encoded)
+            error = max(float(np.abs(a[..., :3] - b[..., :3]).max()) for a, b in zip(clips, decoded))
+            print(
+                f"{compression or 'none':<13}{precision or 'range':>10}{raw_bytes / size:>8.1f}"
+                f'{raw_bytes / 1e6 / encode_time:>14,.0f}{raw_bytes / 1e6 / decode_time:>14,.0f}'
+                f'{error:>12.2g}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark the export formats
+
+Writes the same synthetic dataset in every available format and reports
+rows per second and bytes on disk:
+
+    python benchmarks/bench_export.py [videos] [frames_per_video]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keypoint_format import JOINT_NAMES
+from synthetic_motion import iter_sequences
+from training_export import EXTENSIONS, available_formats, export_rows
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    rows = videos * frames * len(JOINT_NAMES)
+    print(f'{videos} videos x {frames} frames = {rows:,} rows')
+    # Generated up front so only the export itself is timed
+    clips = [(clip.video_id, clip.data) for clip in iter_sequences(videos, frames)]
+    print(f"{'format':<10}{'seconds':>10}{'rows/s':>16}{'MB':>10}{'bytes/row':>12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for format_type in available_formats():
+            path = os.path.join(directory, 'export' + EXTENSIONS[format_type])
+            start = time.perf_counter()
+            written = export_rows(path, format_type, iter(clips))
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+            assert written == rows
+            print(
+                f'{format_type:<10}{elapsed:>10.2f}{rows / elapsed:>16,.0f}'
+                f'{size / 1e6:>10.1f}{size / rows:>12.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
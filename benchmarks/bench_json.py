@@ -0,0 +1,55 @@
+"""Benchmark loading legacy JSON keypoint files
+
+Writes synthetic clips as legacy JSON, then loads them with `json.load`
+plus `frames_to_array` and with the streaming reader, and reports the
+throughput of each:
+
+    python benchmarks/bench_json.py [videos] [frames_per_video]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keypoint_format import PoseSequence, frames_to_array
+from keypoint_json import loads, read_json_keypoints
+from synthetic_motion import generate
+
+
+def load_whole(path):
+    with open(path, 'r') as f:
+        return frames_to_array(json.load(f)['keypoints'])
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    clips = generate(videos, frames)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i, clip in enumerate(clips):
+            path = os.path.join(directory, f'keypoints_{i}.json')
+            with open(path, 'w') as f:
+                json.dump(PoseSequence(clip, video_id=i).to_dict(), f)
+            paths.append(path)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f'{videos} videos x {frames} frames = {size / 1e6:.0f} MB of JSON, '
+              f'parsed with {loads.__module__}')
+        print(f"{'reader':<12}{'seconds':>10}{'MB/s':>10}{'frames/s':>14}")
+
+        for name, reader in (('json.load', load_whole), ('streaming', read_json_keypoints)):
+            start = time.perf_counter()
+            for path in paths:
+                reader(path)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<12}{elapsed:>10.2f}{size / 1e6 / elapsed:>10.0f}'
+                  f'{videos * frames / elapsed:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main()
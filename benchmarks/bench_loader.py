@@ -0,0 +1,53 @@
+"""Benchmark the window loader
+
+Packs a synthetic dataset, then iterates one shuffled epoch while a fake
+training step sleeps for every batch, and reports windows per second and
+how long the consumer waited for data:
+
+    python benchmarks/bench_loader.py [videos] [frames_per_video] [step_ms]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_motion import iter_sequences
+from training_dataset import ShardedDataset, write_dataset
+from training_loader import WindowLoader
+
+WINDOW = 64
+STRIDE = 16
+BATCH_SIZE = 256
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    step = (float(sys.argv[3]) if len(sys.argv) > 3 else 5.0) / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dataset')
+        write_dataset(path, iter_sequences(videos, frames))
+        with ShardedDataset(path) as dataset:
+            for label, step_seconds in (('no step', 0.0), (f'{step * 1000:g} ms step', step)):
+                loader = WindowLoader(dataset, WINDOW, stride=STRIDE, batch_size=BATCH_SIZE)
+                waited = 0.0
+                start = time.perf_counter()
+                ready = start
+                for batch in loader:
+                    waited += time.perf_counter() - ready
+                    time.sleep(step_seconds)
+                    ready = time.perf_counter()
+                elapsed = time.perf_counter() - start
+                print(
+                    f'{label:<14}{loader.num_windows:>10,} windows {elapsed:>8.2f} s'
+                    f'{loader.num_windows / elapsed:>12,.0f} windows/s'
+                    f'   waited {waited:.2f} s over {len(loader)} batches'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark clip quality scoring and cleanup
+
+Cleans the same synthetic clips as generated and with detection dropouts,
+one-frame spikes and a frozen stretch added to every clip, and reports
+frames scanned per second and what was found:
+
+    python benchmarks/bench_quality.py [videos] [frames_per_video]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from clip_quality import clean_clip, summarize
+from synthetic_motion import generate
+
+
+def corrupt(clips, seed=0):
+    """Copy of `clips` with dropouts, spikes and a frozen stretch"""
+    rng = np.random.default_rng(seed)
+    clips = clips.copy()
+    num_videos, num_frames, num_joints = clips.shape[:3]
+    dropouts = rng.random((num_videos, num_frames, num_joints)) < 0.02
+    clips[..., 3][dropouts] = 0.1
+    spikes = rng.random((num_videos, num_frames, num_joints)) < 0.001
+    clips[..., 0][spikes] += 1.0
+    frozen = num_frames // 3
+    clips[:, frozen:frozen + num_frames // 10] = clips[:, frozen:frozen + 1]
+    return clips
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    clips = generate(videos, frames)
+    print(f'{videos} videos x {frames} frames = {videos * frames:,} frames')
+    print(f"{'clips':<12}{'seconds':>10}{'frames/s':>14}{'kept':>8}{'spikes':>8}{'filled':>8}")
+
+    for name, data in (('clean', clips), ('corrupted', corrupt(clips))):
+        start = time.perf_counter()
+        reports = {i: clean_clip(clip)[1] for i, clip in enumerate(data)}
+        elapsed = time.perf_counter() - start
+        summary = summarize(reports)
+        spikes = sum(report['spikes'] for report in reports.values())
+        filled = sum(report['filled_joints'] for report in reports.values())
+        print(f'{name:<12}{elapsed:>10.2f}{videos * frames / elapsed:>14,.0f}'
+              f"{summary['kept_fraction']:>8.1%}{spikes:>8,}{filled:>8,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Benchmark retargeting
+
+Solves joint angles for the same synthetic clips with every robot config
+and reports frames solved per second:
+
+    python benchmarks/bench_retarget.py [videos] [frames_per_video]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from robot_retarget import available_robots, check_conventions, load_robot
+from synthetic_motion import generate
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    # Angles of the wrong sign would be as fast to solve
+    check_conventions()
+    clips = generate(videos, frames)
+    print(f'{videos} videos x {frames} frames = {videos * frames:,} frames')
+    print(f"{'robot':<20}{'dofs':>6}{'seconds':>10}{'frames/s':>16}")
+
+    for name in available_robots():
+        robot = load_robot(name)
+        start = time.perf_counter()
+        robot.solve(clips)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<20}{len(robot.dof_names):>6}{elapsed:>10.2f}{videos * frames / elapsed:>16,.0f}')
+
+
+if __name__ == '__main__':
+    main()
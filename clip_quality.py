@@ -0,0 +1,243 @@
+"""Quality scoring and cleanup of keypoint clips
+
+`clean_clip` scans a (frames, joints, 4) clip with whole-array operations
+and returns a cleaned copy and a report:
+
+    low confidence  joints below MIN_CONFIDENCE are unreliable, and frames
+                    with fewer than MIN_FRAME_JOINTS of their joints
+                    reliable are bad
+    teleports       a joint moving faster than MAX_SPEED torso lengths per
+                    second for one frame and straight back is a spike and
+                    unreliable; when most joints jump at once and stay, the
+                    clip has a cut there and a new segment starts
+    frozen          stretches of at least FROZEN_SECONDS in which no joint
+                    moves are a stalled tracker, and bad
+    gaps            up to MAX_GAP_FRAMES unreliable frames of a joint
+                    between reliable ones of the same segment are filled by
+                    linear interpolation
+    segments        runs of good frames shorter than MIN_SEGMENT_SECONDS
+                    are dropped; the others are kept, in order
+
+Joints that stay unreliable in kept frames keep their low confidence
+(spikes get zero). A clip passes when at least MIN_KEPT_FRACTION of its
+frames are kept.
+
+    python clip_quality.py KEYPOINT_FILE...
+
+prints the report of every file and exits with status 1 if any clip
+fails, so it can gate a scheduled build.
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from keypoint_format import JOINT_NAMES, PoseSequence, joint_table
+
+# Part of incremental export versions; bump when cleanup output changes
+QUALITY_VERSION = 2
+
+MIN_CONFIDENCE = 0.3
+# Fraction of joints a frame needs reliable
+MIN_FRAME_JOINTS = 0.5
+# Torso lengths per second; hands peak at roughly half of this
+MAX_SPEED = 20.0
+# Fraction of the joints jumping together that makes a cut
+CUT_JOINTS = 0.5
+FROZEN_SECONDS = 0.5
+# Largest per-frame movement, in torso lengths, that counts as not moving
+FROZEN_EPSILON = 1e-5
+MAX_GAP_FRAMES = 5
+MIN_SEGMENT_SECONDS = 1.0
+MIN_KEPT_FRACTION = 0.5
+
+
+def _torso_length(x, y, z, reliable, index):
+    """Median distance between the hip and shoulder centers, over frames
+    where all four joints are reliable"""
+    hips = [index['left_hip'], index['right_hip']]
+    shoulders = [index['left_shoulder'], index['right_shoulder']]
+    squared = sum(
+        np.square((axis[shoulders[0]] + axis[shoulders[1]] - axis[hips[0]] - axis[hips[1]]) / 2)
+        for axis in (x, y, z)
+    )
+    usable = reliable[hips[0]] & reliable[hips[1]] & reliable[shoulders[0]] & reliable[shoulders[1]]
+    if usable.any():
+        squared = squared[usable]
+    torso = float(np.sqrt(np.median(squared))) if len(squared) else 0.0
+    return torso if torso > 1e-6 else 1.0
+
+
+def _range_mask(length, starts, stops):
+    """Mask of `length` frames set inside the `[start, stop)` ranges"""
+    marks = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(marks, starts, 1)
+    np.add.at(marks, stops, -1)
+    return np.cumsum(marks[:-1]) > 0
+
+
+def _long_runs(mask, min_length):
+    """`mask` with runs of True shorter than `min_length` cleared"""
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long = stops - starts >= min_length
+    return _range_mask(len(mask), starts[long], stops[long])
+
+
+def _fill_gaps(out, reliable, segment, max_gap):
+    """Interpolate every field of short unreliable runs of every joint of
+    (frames, joints, 4) `out` in place; `reliable` is (joints, frames).
+    Returns the mask of filled joint-frames."""
+    filled = np.zeros_like(reliable)
+    num_frames = reliable.shape[1]
+    # Positions in the flattened (joints, frames) mask; the reliable
+    # neighbours of a gap are found by searching between them
+    flat = reliable.ravel()
+    known, missing = np.flatnonzero(flat), np.flatnonzero(~flat)
+    if not len(known) or not len(missing):
+        return filled
+    following = np.searchsorted(known, missing)
+    before = known[np.maximum(following - 1, 0)]
+    after = known[np.minimum(following, len(known) - 1)]
+    joints = missing // num_frames
+    fill = (
+        (following > 0) & (following < len(known))
+        & (before // num_frames == joints) & (after // num_frames == joints)
+        & (after - before - 1 <= max_gap)
+    )
+    joints, frames = joints[fill], missing[fill] % num_frames
+    before, after = before[fill] % num_frames, after[fill] % num_frames
+    same = segment[before] == segment[after]
+    joints, frames, before, after = joints[same], frames[same], before[same], after[same]
+    weight = ((frames - before) / (after - before)).astype(np.float32)[:, None]
+    start = out[before, joints]
+    out[frames, joints] = start + (out[after, joints] - start) * weight
+
+    filled[joints, frames] = True
+    return filled
+
+
+def clean_clip(data, joints=JOINT_NAMES, fps=30, min_confidence=MIN_CONFIDENCE,
+               max_speed=MAX_SPEED, max_gap=MAX_GAP_FRAMES,
+               min_segment_seconds=MIN_SEGMENT_SECONDS, min_kept_fraction=MIN_KEPT_FRACTION):
+    """Clean a (frames, joints, 4) clip; returns `(cleaned, report)`.
+
+    `report['segments']` are the kept `[start, stop)` frame ranges of the
+    original clip, and `cleaned` is those frames one after another;
+    `kept_frames(report)` numbers them.
+    """
+    out = np.array(data, dtype=np.float32)
+    num_frames, num_joints = out.shape[:2]
+    _, index = joint_table(joints)
+    # Scanned as one contiguous (joints, frames) plane per field: differences
+    # run along frames and sums over joints are whole-row additions. The
+    # few changes are made to `out` directly.
+    x, y, z, confidence = np.ascontiguousarray(out.transpose(2, 1, 0))
+    reliable = confidence >= min_confidence
+    low_confidence = float(1 - reliable.mean()) if reliable.size else 0.0
+
+    torso = _torso_length(x, y, z, reliable, index)
+    limit = (max_speed * torso / fps) ** 2
+    # Squared distances against squared thresholds, so no square roots
+    step = np.square(np.diff(x)) + np.square(np.diff(y)) + np.square(np.diff(z))
+    both = reliable[:, 1:] & reliable[:, :-1]
+    jump = (step > limit) & both
+
+    # In at one frame and back out at the next, ending near where it started
+    spike = np.zeros_like(reliable)
+    if num_frames > 2:
+        back = (
+            np.square(x[:, 2:] - x[:, :-2]) + np.square(y[:, 2:] - y[:, :-2])
+            + np.square(z[:, 2:] - z[:, :-2])
+        ) <= limit
+        spike[:, 1:-1] = jump[:, :-1] & jump[:, 1:] & back & reliable[:, 2:] & reliable[:, :-2]
+    reliable &= ~spike
+    spike_joints, spike_frames = np.nonzero(spike)
+    out[spike_frames, spike_joints, 3] = 0
+
+    # Most joints jumping together and not coming back
+    cut = np.zeros(num_frames, dtype=bool)
+    lasting = jump & ~spike[:, 1:] & ~spike[:, :-1]
+    cut[1:] = lasting.sum(axis=0) > CUT_JOINTS * np.maximum(both.sum(axis=0), 1)
+    segment = np.cumsum(cut)
+
+    # The first frame of a stall is kept, its repeats are not
+    still = np.zeros(num_frames, dtype=bool)
+    if num_frames > 1 and num_joints:
+        still[1:] = step.max(axis=0) <= (FROZEN_EPSILON * torso) ** 2
+    frozen = _long_runs(still, max(int(round(FROZEN_SECONDS * fps)), 1))
+
+    filled = _fill_gaps(out, reliable, segment, max_gap)
+    reliable |= filled
+    joint_fraction = reliable.sum(axis=0) / max(num_joints, 1)
+    sparse = joint_fraction < MIN_FRAME_JOINTS
+    good = ~sparse & ~frozen
+
+    # Runs of good frames, broken at cuts
+    starts = np.flatnonzero(good & (~np.concatenate(([False], good[:-1])) | cut))
+    stops = np.flatnonzero(good & (~np.concatenate((good[1:], [False])) | np.append(cut[1:], True))) + 1
+    min_length = max(int(round(min_segment_seconds * fps)), 1)
+    long = stops - starts >= min_length
+    keep = _range_mask(num_frames, starts[long], stops[long])
+
+    kept = int(keep.sum())
+    kept_fraction = kept / num_frames if num_frames else 0.0
+    report = {
+        'frames': int(num_frames),
+        'kept_frames': kept,
+        'kept_fraction': kept_fraction,
+        # Kept fraction weighted by how complete the kept frames are
+        'score': float(joint_fraction[keep].sum() / num_frames) if num_frames else 0.0,
+        'passed': bool(num_frames) and kept_fraction >= min_kept_fraction,
+        'torso_length': torso,
+        'low_confidence_joints': low_confidence,
+        'sparse_frames': int(sparse.sum()),
+        'spikes': int(spike.sum()),
+        'cuts': int(cut.sum()),
+        'frozen_frames': int(frozen.sum()),
+        'filled_joints': int(filled.sum()),
+        'segments': [[int(a), int(b)] for a, b in zip(starts[long], stops[long])],
+        'dropped_segments': int((~long).sum())
+    }
+    return (out if kept == num_frames else out[keep]), report
+
+
+def kept_frames(report):
+    """Original frame numbers of the frames of a cleaned clip"""
+    segments = report['segments']
+    if not segments:
+        return np.zeros(0, dtype=np.int32)
+    return np.concatenate([np.arange(start, stop, dtype=np.int32) for start, stop in segments])
+
+
+def clean_sequence(clip, **options):
+    """`clean_clip` of a PoseSequence; returns `(cleaned sequence, report)`"""
+    data, report = clean_clip(clip.data, clip.joints, clip.fps, **options)
+    return PoseSequence(data, clip.joints, clip.fps, clip.video_id), report
+
+
+def summarize(reports):
+    """Totals of a `{video_id: report}` mapping"""
+    frames = sum(report['frames'] for report in reports.values())
+    kept = sum(report['kept_frames'] for report in reports.values())
+    return {
+        'clips': len(reports),
+        'passed': sum(report['passed'] for report in reports.values()),
+        'failed': [video_id for video_id, report in reports.items() if not report['passed']],
+        'frames': frames,
+        'kept_frames': kept,
+        'dropped_frames': frames - kept,
+        'kept_fraction': kept / frames if frames else 0.0
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} KEYPOINT_FILE...')
+        sys.exit(1)
+    reports = {}
+    for path in sys.argv[1:]:
+        _, reports[path] = clean_sequence(PoseSequence.load(path))
+    print(json.dumps({'clips': reports, 'summary': summarize(reports)}, indent=2))
+    sys.exit(0 if all(report['passed'] for report in reports.values()) else 1)
@@ -0,0 +1,283 @@
+"""Compact quantized keypoint storage
+
+A `.kpz` file stores a (frames, joints, 4) clip in about a quarter of the
+space of a `.kpt` file before compression, and usually far less after:
+
+    b'KPZ1'                 magic
+    uint32 (little endian)  length of the JSON header in bytes
+    JSON header             joints, fps, video_id, frame count, compression,
+                            chunk size, quantization offsets and steps,
+                            the largest value of every axis, and the
+                            stored size of every chunk
+    chunks                  one after another
+
+Coordinates are quantized per axis to int16 over the clip's range (or to a
+coarser step when a `precision` is given), so the error of x, y and z is
+at most half a step; confidence is quantized to uint8 (error at most
+1/510). Decoded values are rounded to float32 once, which can add up to
+half a float32 ulp (see `max_error`). Within a chunk of frames, every frame is stored as its difference
+from the previous one, and the int16 differences are split into a plane of
+low bytes and a plane of high bytes; slow motion then gives long runs of
+near-constant bytes that zstd or gzip compress well.
+
+Chunks are independent, so they are compressed and decompressed by a pool
+of threads (zlib and zstd release the GIL), and decoding is a cumulative
+sum and a scale per chunk.
+
+    python keypoint_codec.py INPUT OUTPUT [zstd|gzip|none]
+"""
+
+import json
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from keypoint_format import DTYPE, FIELDS, JOINT_NAMES, PoseSequence
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b'KPZ1'
+COMPRESSED_EXTENSION = '.kpz'
+
+# Frames per independently coded chunk
+CHUNK_FRAMES = 4096
+
+COMPRESSIONS = ('zstd', 'gzip', None)
+DEFAULT_LEVELS = {'zstd': 3, 'gzip': 6}
+
+# Quantized coordinates span the whole int16 range
+LEVELS = 65535
+CONFIDENCE_LEVELS = 255
+
+
+def default_compression():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def is_compressed(path):
+    """Check whether a file starts with the compressed keypoint magic"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def max_error(header):
+    """Largest absolute error of x, y, z and confidence of a stored clip:
+    half a step plus the float32 rounding of the decoded values"""
+    # Files written before the range was stored: the top of the int16 range
+    highs = header.get('highs') or [
+        offset + LEVELS * step for offset, step in zip(header['offsets'], header['steps'])
+    ]
+    errors = []
+    for offset, high, step in zip(header['offsets'], highs, header['steps']):
+        largest = max(abs(offset), abs(high)) + step / 2
+        errors.append(step / 2 + largest * 2.0 ** -24)
+    # Decoded confidences are at most 1
+    return errors + [0.5 / CONFIDENCE_LEVELS + 2.0 ** -25]
+
+
+def _compress(raw, compression, level):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(raw)
+    if compression == 'gzip':
+        return zlib.compress(raw, level)
+    return raw
+
+
+def _decompress(stored, compression, raw_size):
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(stored, max_output_size=raw_size)
+    if compression == 'gzip':
+        return zlib.decompress(stored)
+    return stored
+
+
+def _quantize(data, precision):
+    """Offsets, largest values and steps per axis, and the int16
+    coordinates and uint8 confidences of (frames, joints, 4) `data`"""
+    # One axis at a time: much faster than reducing (n, 3) along axis 0
+    if data.size:
+        low = np.array([data[..., i].min() for i in range(3)], dtype=np.float64)
+        high = np.array([data[..., i].max() for i in range(3)], dtype=np.float64)
+    else:
+        low = high = np.zeros(3)
+    steps = (high - low) / LEVELS
+    if precision:
+        # Coarser steps give smaller differences between frames. Half a
+        # step plus the float32 rounding of decoded values stays within
+        # `precision`.
+        rounding = np.maximum(np.abs(low), np.abs(high)) * 2.0 ** -24
+        if (steps / 2 + rounding > precision).any():
+            raise ValueError(f'A precision of {precision} is finer than int16 allows over this clip')
+        steps = np.maximum(steps, 2 * (precision * (1 - 1e-6) - rounding))
+    steps = np.where(steps > 0, steps, 1.0)
+
+    # float64: in float32 the rounding error of the scaling alone can
+    # exceed the bound of half a step
+    scaled = np.subtract(data[..., :3], low)
+    scaled *= 1 / steps
+    scaled -= 32768
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, -32768, 32767, out=scaled)
+    confidence = np.clip(data[..., 3], 0, 1) * np.float64(CONFIDENCE_LEVELS)
+    np.rint(confidence, out=confidence)
+    return low.tolist(), high.tolist(), steps.tolist(), scaled.astype(np.int16), confidence.astype(np.uint8)
+
+
+def _delta(values):
+    """Frame-to-frame differences, wrapping around the integer range"""
+    deltas = values.copy()
+    np.subtract(values[1:], values[:-1], out=deltas[1:])
+    return deltas
+
+
+def _split_bytes(values):
+    """int16 values as a plane of low bytes followed by one of high bytes"""
+    return values.view(np.uint8).reshape(-1, 2).T.tobytes()
+
+
+def _join_bytes(planes, shape):
+    pairs = np.frombuffer(planes, dtype=np.uint8).reshape(2, -1).T
+    return np.ascontiguousarray(pairs).view('<i2').reshape(shape)
+
+
+def _encode_chunk(coordinates, confidence, compression, level):
+    raw = _split_bytes(_delta(coordinates)) + _delta(confidence).tobytes()
+    return _compress(raw, compression, level), len(raw)
+
+
+def encode(data, joints=JOINT_NAMES, fps=30, video_id=None, compression='default',
+           level=None, precision=None, chunk_frames=CHUNK_FRAMES, workers=None):
+    """Encode a (frames, joints, 4) array as the bytes of a .kpz file.
+
+    `precision` is the largest acceptable coordinate error (ValueError
+    when the clip's range is too wide for it); by default coordinates use
+    the finest step the int16 range allows.
+    """
+    if compression == 'default':
+        compression = default_compression()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'Unknown compression: {compression}')
+    if compression == 'zstd' and zstandard is None:
+        raise RuntimeError('zstandard is not installed')
+    level = DEFAULT_LEVELS.get(compression) if level is None else level
+
+    data = np.asarray(data, dtype=DTYPE)
+    if data.ndim != 3 or data.shape[1:] != (len(joints), len(FIELDS)):
+        raise ValueError(f'Expected shape (frames, {len(joints)}, {len(FIELDS)}), got {data.shape}')
+    offsets, highs, steps, coordinates, confidence = _quantize(data, precision)
+
+    bounds = range(0, len(data), chunk_frames)
+    with ThreadPoolExecutor(workers) as pool:
+        chunks = list(pool.map(
+            lambda start: _encode_chunk(
+                coordinates[start:start + chunk_frames],
+                confidence[start:start + chunk_frames],
+                compression,
+                level
+            ),
+            bounds
+        ))
+
+    header = json.dumps({
+        'joints': list(joints),
+        'fps': fps,
+        'video_id': video_id,
+        'frames': len(data),
+        'compression': compression,
+        'chunk_frames': chunk_frames,
+        'offsets': offsets,
+        'highs': highs,
+        'steps': steps,
+        'chunks': [[len(stored), raw_size] for stored, raw_size in chunks]
+    }).encode('utf-8')
+    return b''.join(
+        [MAGIC, struct.pack('<I', len(header)), header] + [stored for stored, _ in chunks]
+    )
+
+
+def decode(buffer, workers=None):
+    """Decode the bytes of a .kpz file into `(header, frames)`"""
+    buffer = memoryview(buffer)
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError('Not a compressed keypoint file')
+    (length,) = struct.unpack('<I', buffer[len(MAGIC):len(MAGIC) + 4])
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + length]).decode('utf-8'))
+
+    num_joints = len(header['joints'])
+    chunk_frames = header['chunk_frames']
+    offsets = np.array(header['offsets'], dtype=np.float64)
+    steps = np.array(header['steps'], dtype=np.float64)
+    # Every uint8 confidence divided in float64 and rounded to float32 once
+    confidence_values = (np.arange(CONFIDENCE_LEVELS + 1) / CONFIDENCE_LEVELS).astype(DTYPE)
+    frames = np.empty((header['frames'], num_joints, len(FIELDS)), dtype=DTYPE)
+
+    chunk_starts = []
+    position = start + length
+    for stored_size, _ in header['chunks']:
+        chunk_starts.append(position)
+        position += stored_size
+
+    def decode_chunk(i):
+        stored_size, raw_size = header['chunks'][i]
+        raw = _decompress(
+            buffer[chunk_starts[i]:chunk_starts[i] + stored_size], header['compression'], raw_size
+        )
+        out = frames[i * chunk_frames:(i + 1) * chunk_frames]
+        count = len(out) * num_joints
+        coordinates = np.cumsum(
+            _join_bytes(raw[:count * 6], (len(out), num_joints, 3)), axis=0, dtype=np.int16
+        )
+        confidence = np.cumsum(
+            np.frombuffer(raw[count * 6:], dtype=np.uint8).reshape(len(out), num_joints),
+            axis=0,
+            dtype=np.uint8
+        )
+        # float64, like the quantization; rounded to float32 once
+        positions = coordinates.astype(np.float64)
+        positions += 32768
+        positions *= steps
+        positions += offsets
+        out[..., :3] = positions
+        out[..., 3] = confidence_values[confidence]
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(decode_chunk, range(len(header['chunks']))))
+    return header, frames
+
+
+def save_compressed(path, data, joints=JOINT_NAMES, fps=30, video_id=None, **options):
+    """Write a (frames, joints, 4) array to a .kpz file; `options` as for
+    `encode`"""
+    encoded = encode(data, joints, fps, video_id, **options)
+    with open(path, 'wb') as f:
+        f.write(encoded)
+
+
+def load_compressed(path, workers=None):
+    """Read a .kpz file as `(header, frames)`"""
+    with open(path, 'rb') as f:
+        return decode(f.read(), workers)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print(f'Usage: {sys.argv[0]} INPUT OUTPUT [zstd|gzip|none]')
+        sys.exit(1)
+    compression = sys.argv[3] if len(sys.argv) == 4 else 'default'
+    clip = PoseSequence.load(sys.argv[1])
+    save_compressed(
+        sys.argv[2], clip.data, clip.joints, clip.fps, clip.video_id,
+        compression=None if compression == 'none' else compression
+    )
+    print(f'{os.path.getsize(sys.argv[1]):,} -> {os.path.getsize(sys.argv[2]):,} bytes')
@@ -0,0 +1,363 @@
+"""Binary columnar keypoint format
+
+A `.kpt` file holds a whole recording as one float32 array of shape
+(frames, joints, 4), the last axis being x, y, z and confidence:
+
+    b'KPT1'                 magic
+    uint32 (little endian)  length of the JSON header in bytes
+    JSON header             {"joints": [...], "fps": 30, "video_id": 1}
+    zero padding            up to a 16-byte boundary
+    float32 data            frames x joints x 4, little endian
+
+The frame count is not stored; it follows from the file size, so frames can
+be appended to the end of an existing file without rewriting the header.
+Files are opened with a memory map, which makes opening O(1) and lets any
+frame be read without touching the rest of the recording.
+
+`PoseSequence` wraps such an array together with its joint-name table and
+is the in-memory form of a clip used by the processing scripts; the JSON
+dict-of-dicts frames are only produced for compatibility.
+"""
+
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'KPT1'
+BINARY_EXTENSION = '.kpt'
+ALIGNMENT = 16
+DTYPE = np.dtype('<f4')
+
+FIELDS = ('x', 'y', 'z', 'confidence')
+
+# COCO keypoint order used by every script in this project
+JOINT_NAMES = [
+    'nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
+    'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
+]
+
+# MediaPipe Pose landmark index of each COCO joint
+MEDIAPIPE_TO_COCO = [0, 2, 5, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+
+# Joint-name tables shared by every sequence with the same joints
+_joint_tables = {}
+
+
+def is_binary(path):
+    """Check whether a file starts with the binary keypoint magic"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def encode_header(joints, fps=30, video_id=None):
+    """Build the header bytes, padded so the data that follows is aligned"""
+    header = json.dumps({
+        'joints': list(joints),
+        'fps': fps,
+        'video_id': video_id
+    }).encode('utf-8')
+    prefix = MAGIC + struct.pack('<I', len(header)) + header
+    padding = -len(prefix) % ALIGNMENT
+    return prefix + b'\0' * padding
+
+
+def read_header(f):
+    """Read the header from an open binary file.
+
+    Returns the header dict with an extra `data_offset` key.
+    """
+    f.seek(0)
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a binary keypoint file')
+    (length,) = struct.unpack('<I', f.read(4))
+    header = json.loads(f.read(length).decode('utf-8'))
+    prefix_length = len(MAGIC) + 4 + length
+    header['data_offset'] = prefix_length + (-prefix_length % ALIGNMENT)
+    return header
+
+
+def frame_size(num_joints):
+    """Size in bytes of one frame of data"""
+    return num_joints * len(FIELDS) * DTYPE.itemsize
+
+
+def open_binary(path, mode='r'):
+    """Memory-map a binary keypoint file.
+
+    Returns `(header, frames)` where `frames` is a (frames, joints, 4)
+    float32 array backed by the file. Only whole frames are mapped, so a
+    file that is still being appended to can be opened safely.
+    """
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+
+    num_joints = len(header['joints'])
+    num_frames = (size - header['data_offset']) // frame_size(num_joints)
+    header['frames'] = num_frames
+
+    if num_frames <= 0:
+        return header, np.zeros((0, num_joints, len(FIELDS)), dtype=DTYPE)
+
+    frames = np.memmap(
+        path,
+        dtype=DTYPE,
+        mode=mode,
+        offset=header['data_offset'],
+        shape=(num_frames, num_joints, len(FIELDS))
+    )
+    return header, frames
+
+
+def save_binary(path, frames, joints, fps=30, video_id=None):
+    """Write a (frames, joints, 4) array to a binary keypoint file"""
+    frames = np.ascontiguousarray(frames, dtype=DTYPE)
+    if frames.ndim != 3 or frames.shape[1:] != (len(joints), len(FIELDS)):
+        raise ValueError(
+            f'Expected shape (frames, {len(joints)}, {len(FIELDS)}), got {frames.shape}'
+        )
+
+    with open(path, 'wb') as f:
+        f.write(encode_header(joints, fps, video_id))
+        f.write(frames.tobytes())
+
+
+class KeypointWriter:
+    """Append frames to a binary keypoint file while it is being recorded.
+
+    Each `append` writes whole frames and flushes them, so a reader that
+    polls the file (see `open_binary`) only ever sees complete frames.
+    """
+
+    def __init__(self, path, joints, fps=30, video_id=None):
+        self.path = path
+        self.joints = list(joints)
+        self.file = open(path, 'ab')
+
+        if self.file.tell() == 0:
+            self.file.write(encode_header(self.joints, fps, video_id))
+            self.file.flush()
+        else:
+            with open(path, 'rb') as f:
+                existing = read_header(f)['joints']
+            if existing != self.joints:
+                self.file.close()
+                raise ValueError(f'{path} was recorded with joints {existing}')
+
+    def append(self, frames):
+        """Append a (frames, joints, 4) or single (joints, 4) array"""
+        frames = np.asarray(frames, dtype=DTYPE).reshape(-1, len(self.joints), len(FIELDS))
+        self.file.write(frames.tobytes())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def joint_table(joints):
+    """The shared tuple for a list of joint names and its name -> index map"""
+    key = tuple(joints)
+    table = _joint_tables.get(key)
+    if table is None:
+        table = _joint_tables.setdefault(key, (key, {name: i for i, name in enumerate(key)}))
+    return table
+
+
+def frames_to_array(frames, joints=None):
+    """Convert JSON-style `[{joint: {x, y, z, confidence}}]` frames to an array.
+
+    Joints missing from a frame are stored as zeros, i.e. with zero
+    confidence. Returns `(array, joints)`.
+    """
+    if joints is None:
+        joints = list(frames[0].keys()) if frames else list(JOINT_NAMES)
+
+    # Nested lists converted in one call; item assignment per joint is far slower
+    missing = (0.0, 0.0, 0.0, 0.0)
+    rows = [
+        [
+            (kp['x'], kp['y'], kp['z'], kp['confidence']) if kp else missing
+            for kp in map(frame.get, joints)
+        ]
+        for frame in frames
+    ]
+    array = np.array(rows, dtype=DTYPE).reshape(len(frames), len(joints), len(FIELDS))
+    return array, joints
+
+
+def array_to_frames(array, joints):
+    """Convert a (frames, joints, 4) array back to JSON-style frames"""
+    return [
+        {
+            name: dict(zip(FIELDS, values))
+            for name, values in zip(joints, frame)
+        }
+        for frame in np.asarray(array, dtype=np.float64).tolist()
+    ]
+
+
+def select_joints(frames, joints, target_joints):
+    """Reorder a (frames, joints, 4) array to `target_joints` order.
+
+    Joints that `joints` does not have are filled with zeros.
+    """
+    selected = np.zeros((len(frames), len(target_joints), len(FIELDS)), dtype=DTYPE)
+    for j, name in enumerate(target_joints):
+        if name in joints:
+            selected[:, j] = frames[:, joints.index(name)]
+    return selected
+
+
+def load_array(path):
+    """Load a binary, compressed or JSON keypoint file as `(header, frames)`.
+
+    Binary files are memory-mapped; compressed (.kpz) files are decoded;
+    JSON files are parsed in blocks straight into an array.
+    """
+    if is_binary(path):
+        return open_binary(path)
+
+    # Imported here: both build on this module
+    from keypoint_codec import is_compressed, load_compressed
+    from keypoint_json import read_json_keypoints
+    if is_compressed(path):
+        return load_compressed(path)
+    return read_json_keypoints(path)
+
+
+def convert_json_to_binary(json_path, binary_path=None):
+    """Convert a `keypoints_*.json` file to the binary format.
+
+    Returns the path of the written file.
+    """
+    if binary_path is None:
+        binary_path = os.path.splitext(json_path)[0] + BINARY_EXTENSION
+
+    # Streamed, so files larger than memory convert too
+    from keypoint_json import convert_json_keypoints
+    return convert_json_keypoints(json_path, binary_path)
+
+
+
+class PoseSequence:
+    """Keypoints of one clip as a contiguous (frames, joints, 4) float32 array.
+
+    Joint names live in a tuple shared by all sequences with the same
+    joints, so a sequence costs 16 bytes per joint and frame plus a few
+    attributes. Slicing by frames and `joint()` return views of the same
+    memory; a sequence loaded from a binary file stays memory-mapped.
+    """
+
+    __slots__ = ('data', 'joints', '_index', 'fps', 'video_id')
+
+    def __init__(self, data, joints=JOINT_NAMES, fps=30, video_id=None):
+        self.joints, self._index = joint_table(joints)
+        data = np.asarray(data, dtype=DTYPE)
+        if data.ndim != 3 or data.shape[1:] != (len(self.joints), len(FIELDS)):
+            raise ValueError(
+                f'Expected shape (frames, {len(self.joints)}, {len(FIELDS)}), got {data.shape}'
+            )
+        self.data = data
+        self.fps = fps
+        self.video_id = video_id
+
+    @classmethod
+    def empty(cls, num_frames, joints=JOINT_NAMES, fps=30, video_id=None):
+        """A zero-filled sequence (every joint undetected)"""
+        data = np.zeros((num_frames, len(joints), len(FIELDS)), dtype=DTYPE)
+        return cls(data, joints, fps, video_id)
+
+    @classmethod
+    def from_frames(cls, frames, joints=None, fps=30, video_id=None):
+        """Build from JSON-style `[{joint: {x, y, z, confidence}}]` frames"""
+        data, joints = frames_to_array(frames, joints)
+        return cls(data, joints, fps, video_id)
+
+    @classmethod
+    def from_dict(cls, data, joints=None):
+        """Build from the `{video_id, frames, fps, keypoints}` JSON schema"""
+        return cls.from_frames(
+            data.get('keypoints', []), joints, data.get('fps', 30), data.get('video_id')
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a binary (memory-mapped), compressed or JSON keypoint file"""
+        header, data = load_array(path)
+        return cls(data, header['joints'], header.get('fps', 30), header.get('video_id'))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        """A frame as a (joints, 4) view, or a frame range as a sequence view"""
+        if isinstance(index, slice):
+            return PoseSequence(self.data[index], self.joints, self.fps, self.video_id)
+        return self.data[index]
+
+    def __repr__(self):
+        return f'PoseSequence(frames={len(self)}, joints={len(self.joints)}, fps={self.fps})'
+
+    @property
+    def positions(self):
+        """(frames, joints, 3) view of x, y, z"""
+        return self.data[..., :3]
+
+    @property
+    def confidence(self):
+        """(frames, joints) view of the confidences"""
+        return self.data[..., 3]
+
+    def joint_index(self, name):
+        return self._index[name]
+
+    def joint(self, name):
+        """(frames, 4) view of one joint over the whole sequence"""
+        return self.data[:, self._index[name]]
+
+    def select(self, joints):
+        """The sequence with `joints` in that order; missing joints are
+        undetected. Returns self when the joints already match."""
+        table, _ = joint_table(joints)
+        if table is self.joints:
+            return self
+        return PoseSequence(select_joints(self.data, self.joints, table), table, self.fps, self.video_id)
+
+    def save(self, path):
+        """Write the sequence to a binary keypoint file"""
+        save_binary(path, self.data, self.joints, self.fps, self.video_id)
+
+    def to_frames(self):
+        """JSON-style frames, for code that still expects dicts"""
+        return array_to_frames(self.data, self.joints)
+
+    def to_dict(self):
+        """The `{video_id, frames, fps, keypoints}` JSON schema"""
+        return {
+            'video_id': self.video_id,
+            'frames': len(self),
+            'fps': self.fps,
+            'keypoints': self.to_frames()
+        }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(f'Usage: {sys.argv[0]} keypoints.json [keypoints.kpt]')
+        sys.exit(1)
+    print(convert_json_to_binary(*sys.argv[1:]))
@@ -0,0 +1,182 @@
+"""Streaming reader for legacy JSON keypoint files
+
+A legacy file is one `{"video_id": ..., "fps": ..., "keypoints": [...]}`
+object whose keypoints are JSON-style `{joint: {x, y, z, confidence}}`
+frames. `json.load` builds every frame dict before any of it can be used,
+which takes many times the file size in memory.
+
+Here the file is read in fixed-size blocks. Frame boundaries in a block
+are found with a vectorized count of brace depth (joint names never
+contain braces), each run of complete frames is parsed with one call to the
+fastest JSON backend installed (orjson, else the standard library), and
+the frames are written straight into a preallocated float32 array; only
+one block of text and its frame dicts are alive at a time. The other
+top-level keys are read from the text around the keypoints array.
+"""
+
+import os
+import re
+import shutil
+
+import numpy as np
+
+from keypoint_format import (
+    DTYPE, FIELDS, JOINT_NAMES, KeypointWriter, encode_header, frames_to_array, read_header
+)
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+BLOCK_BYTES = 4 * 1024 * 1024
+
+KEYPOINTS_KEY = re.compile(rb'"keypoints"\s*:\s*\[')
+OPEN, CLOSE, ARRAY_END = ord('{'), ord('}'), ord(']')
+SEPARATORS = b', \t\r\n'
+
+
+class JSONKeypointStream:
+    """Iterate over the frames of a legacy JSON file in batches of frame
+    dicts. `metadata` holds the keys before the keypoints array right
+    away, and every other top-level key once iteration is done;
+    `position` is the number of bytes consumed so far."""
+
+    def __init__(self, f, block_size=BLOCK_BYTES):
+        self.file = f
+        self.block_size = block_size
+        self.position = 0
+
+        buffer = b''
+        while True:
+            block = f.read(block_size)
+            buffer += block
+            match = KEYPOINTS_KEY.search(buffer)
+            if match:
+                break
+            if not block:
+                raise ValueError('No "keypoints" array found')
+        self._prefix = buffer[:match.start()]
+        self._buffer = buffer[match.end():]
+        self.position = match.end()
+        # The keys seen so far, closed off to parse them
+        keys = self._prefix.rstrip(SEPARATORS)
+        self.metadata = loads(keys + b'}') if keys.strip() != b'{' else {}
+
+    def __iter__(self):
+        buffer = self._buffer
+        while True:
+            data = np.frombuffer(buffer, dtype=np.uint8)
+            # Depth after every brace; braces are far fewer than bytes
+            braces = np.flatnonzero((data == OPEN) | (data == CLOSE))
+            depth = np.cumsum(np.where(data[braces] == OPEN, 1, -1))
+            ends = braces[depth == 0]
+            # A `]` outside every frame closes the keypoints array
+            brackets = np.flatnonzero(data == ARRAY_END)
+            bracket_depth = np.concatenate(([0], depth))[np.searchsorted(braces, brackets)]
+            array_end = brackets[bracket_depth == 0]
+            if len(array_end):
+                ends = ends[ends < array_end[0]]
+
+            cut = 0
+            if len(ends):
+                cut = int(ends[-1]) + 1
+                self.position += cut
+                yield loads(b'[' + buffer[:cut].lstrip(SEPARATORS) + b']')
+
+            if len(array_end):
+                tail = buffer[int(array_end[0]) + 1:] + self.file.read()
+                self.position += len(buffer) - cut
+                self.metadata = loads(self._prefix + b'"keypoints": []' + tail)
+                return
+
+            block = self.file.read(self.block_size)
+            if not block:
+                raise ValueError('Unterminated keypoints array')
+            buffer = buffer[cut:] + block
+
+
+def read_json_keypoints(path, joints=None, block_size=BLOCK_BYTES):
+    """Load a legacy JSON keypoint file as `(header, frames)` with memory
+    bounded by the result array plus one block.
+
+    Joints default to those of the first frame, like `frames_to_array`.
+    """
+    size = os.path.getsize(path)
+    frames = None
+    count = 0
+    with open(path, 'rb') as f:
+        stream = JSONKeypointStream(f, block_size)
+        for batch in stream:
+            array, joints = frames_to_array(batch, joints)
+            if frames is None:
+                # The stored frame count, or an estimate from the bytes per frame so far
+                expected = stream.metadata.get('frames')
+                if not isinstance(expected, int) or expected < len(array):
+                    expected = int(size * len(array) / max(stream.position, 1) * 1.05) + 1
+                frames = np.empty((expected, len(joints), len(FIELDS)), dtype=DTYPE)
+            if count + len(array) > len(frames):
+                grown = np.empty((max(2 * len(frames), count + len(array)),) + frames.shape[1:], dtype=DTYPE)
+                grown[:count] = frames[:count]
+                frames = grown
+            frames[count:count + len(array)] = array
+            count += len(array)
+
+    if frames is None:
+        joints = list(joints or JOINT_NAMES)
+        frames = np.zeros((0, len(joints), len(FIELDS)), dtype=DTYPE)
+    header = {
+        'joints': list(joints),
+        'fps': stream.metadata.get('fps', 30),
+        'video_id': stream.metadata.get('video_id'),
+        'frames': count
+    }
+    return header, frames[:count]
+
+
+def convert_json_keypoints(json_path, binary_path, joints=None, block_size=BLOCK_BYTES):
+    """Convert a legacy JSON file to the binary format one block at a time,
+    so files larger than memory can be converted"""
+    temp_path = f'{binary_path}.part'
+    if os.path.exists(temp_path):
+        # KeypointWriter appends to an existing file
+        os.remove(temp_path)
+
+    writer = None
+    try:
+        with open(json_path, 'rb') as f:
+            stream = JSONKeypointStream(f, block_size)
+            for batch in stream:
+                array, joints = frames_to_array(batch, joints)
+                if writer is None:
+                    writer = KeypointWriter(
+                        temp_path, joints, stream.metadata.get('fps', 30), stream.metadata.get('video_id')
+                    )
+                writer.append(array)
+    finally:
+        if writer:
+            writer.close()
+
+    fps, video_id = stream.metadata.get('fps', 30), stream.metadata.get('video_id')
+    if writer is None:
+        with KeypointWriter(temp_path, joints or JOINT_NAMES, fps, video_id):
+            pass
+    else:
+        with open(temp_path, 'rb') as f:
+            header = read_header(f)
+        if (header['fps'], header['video_id']) != (fps, video_id):
+            # fps or video_id came after the keypoints
+            _rewrite_header(temp_path, joints, fps, video_id)
+    os.replace(temp_path, binary_path)
+    return binary_path
+
+
+def _rewrite_header(path, joints, fps, video_id):
+    with open(path, 'rb') as source:
+        source.seek(read_header(source)['data_offset'])
+        with open(f'{path}.header', 'wb') as target:
+            target.write(encode_header(joints, fps, video_id))
+            shutil.copyfileobj(source, target, BLOCK_BYTES)
+    os.replace(f'{path}.header', path)
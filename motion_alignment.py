@@ -0,0 +1,180 @@
+"""Dynamic time warping alignment of keypoint recordings
+
+Clips are compared on body-normalized joint vectors (root-relative and
+scaled by torso length) with squared Euclidean frame cost. The DTW is
+restricted to a Sakoe-Chiba band around the diagonal and computed one row
+at a time with NumPy: the within-row dependency on the left neighbour is
+resolved with a running minimum, so there is no per-cell Python loop.
+An LB_Keogh lower bound and a per-row check allow abandoning comparisons
+that cannot beat a cost threshold.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+Alignment = namedtuple('Alignment', ['cost', 'normalized_cost', 'path'])
+
+# Back-pointer codes stored per band cell
+_DIAGONAL, _UP, _LEFT = 0, 1, 2
+
+
+def pose_features(frames, joints):
+    """Turn (frames, joints, 4) keypoints into (frames, joints * 3) features.
+
+    Coordinates are made relative to the hip center and divided by the
+    torso length, so clips recorded at different positions and distances
+    from the camera are comparable. Undetected joints (zero confidence)
+    contribute zeros.
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    positions = frames[..., :3]
+    detected = frames[..., 3:4] > 0
+
+    def center(names):
+        indexes = [joints.index(name) for name in names if name in joints]
+        if not indexes:
+            return positions.mean(axis=1)
+        return positions[:, indexes].mean(axis=1)
+
+    hips = center(['left_hip', 'right_hip'])
+    shoulders = center(['left_shoulder', 'right_shoulder'])
+    torso = np.linalg.norm(shoulders - hips, axis=1)
+    scale = np.where(torso > 1e-6, torso, 1.0)[:, None, None]
+
+    normalized = (positions - hips[:, None]) / scale * detected
+    return normalized.reshape(len(frames), -1)
+
+
+def _band(n, m, band):
+    """Column offset of every row and the common band width"""
+    radius = int(np.ceil(band * max(n, m)))
+    # The band must be at least as wide as the diagonal's slope to stay connected
+    radius = max(radius, int(np.ceil(m / max(n, 1))), 1)
+    width = min(2 * radius + 1, m)
+    centers = np.round(np.arange(n) * ((m - 1) / max(n - 1, 1))).astype(np.int64)
+    offsets = np.clip(centers - radius, 0, m - width)
+    return offsets, width
+
+
+def lb_keogh(a, b, band=0.05):
+    """LB_Keogh lower bound of the banded DTW cost between feature arrays.
+
+    Each row of `a` is compared with the per-dimension min/max envelope
+    of the rows of `b` inside its band; the DTW cost can never be lower.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    offsets, width = _band(len(a), len(b), band)
+
+    # Sliding min/max over windows of `width` rows of b, via a doubling scheme
+    lower, upper = b.copy(), b.copy()
+    span = 1
+    while span < width:
+        step = min(span, width - span)
+        lower[:-step] = np.minimum(lower[:-step], lower[step:])
+        upper[:-step] = np.maximum(upper[:-step], upper[step:])
+        span += step
+    lower, upper = lower[offsets], upper[offsets]
+
+    above = np.maximum(a - upper, 0.0)
+    below = np.maximum(lower - a, 0.0)
+    return float((above ** 2).sum() + (below ** 2).sum())
+
+
+def dtw(a, b, band=0.05, max_cost=None):
+    """Align two feature arrays with Sakoe-Chiba banded DTW.
+
+    `band` is the band radius as a fraction of the longer clip. Returns an
+    `Alignment` whose `path` is a (steps, 2) array of matched row indexes,
+    or None when `max_cost` is given and the alignment cannot beat it.
+    """
+    a = np.ascontiguousarray(a, dtype=np.float32)
+    b = np.ascontiguousarray(b, dtype=np.float32)
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return Alignment(0.0, 0.0, np.zeros((0, 2), dtype=np.int64))
+
+    if max_cost is not None and lb_keogh(a, b, band) > max_cost:
+        return None
+
+    offsets, width = _band(n, m, band)
+    pointers = np.empty((n, width), dtype=np.uint8)
+    a_norms = np.einsum('ij,ij->i', a, a)
+    b_norms = np.einsum('ij,ij->i', b, b)
+
+    def band_cost(i):
+        # Squared Euclidean cost of row i against its band of b
+        start = offsets[i]
+        cost = a_norms[i] + b_norms[start:start + width] - 2.0 * (b[start:start + width] @ a[i])
+        return np.maximum(cost, 0.0, out=cost)
+
+    # First row can only be reached from the left (offsets[0] is always 0)
+    row = np.cumsum(band_cost(0), dtype=np.float64)
+    pointers[0] = _LEFT
+
+    # previous[shift + k + 1] holds the previous row's cell at column
+    # offsets[i] + k; cells outside the previous band stay infinite
+    shifts = np.diff(offsets)
+    previous = np.full(width + 2 + (int(shifts.max()) if n > 1 else 0), np.inf)
+
+    for i in range(1, n):
+        shift = shifts[i - 1]
+        previous[1:width + 1] = row
+        diagonal = previous[shift:shift + width]
+        up = previous[shift + 1:shift + width + 1]
+        best = np.minimum(diagonal, up)
+
+        # x[j] = c[j] + min(best[j], x[j - 1]) rewritten as a running minimum
+        cumulative = np.cumsum(band_cost(i), dtype=np.float64)
+        row = np.minimum.accumulate(best - np.concatenate(([0.0], cumulative[:-1]))) + cumulative
+
+        pointer = pointers[i]
+        np.greater(diagonal, up, out=pointer, casting='unsafe')
+        pointer[1:][row[:-1] < best[1:]] = _LEFT
+
+        if max_cost is not None and row.min() > max_cost:
+            return None
+
+    total = float(row[m - 1 - offsets[n - 1]])
+    if max_cost is not None and total > max_cost:
+        return None
+
+    # Walk the back-pointers from the last cell
+    path = []
+    i, j = n - 1, m - 1
+    while True:
+        path.append((i, j))
+        if i == 0 and j == 0:
+            break
+        move = pointers[i, j - offsets[i]]
+        if move == _LEFT:
+            j -= 1
+        elif move == _UP:
+            i -= 1
+        else:
+            i -= 1
+            j -= 1
+    path = np.array(path[::-1], dtype=np.int64)
+    return Alignment(total, total / len(path), path)
+
+
+def align_clips(reference, others, joints, band=0.05, max_cost=None):
+    """Align several (frames, joints, 4) clips to a reference clip.
+
+    Returns one `Alignment` (or None if abandoned) per clip in `others`.
+    """
+    reference_features = pose_features(reference, joints)
+    return [
+        dtw(reference_features, pose_features(other, joints), band, max_cost)
+        for other in others
+    ]
+
+
+def frame_map(alignment, num_frames):
+    """Map every reference frame to its first matching frame of the other clip"""
+    mapping = np.zeros(num_frames, dtype=np.int64)
+    path = alignment.path
+    # Assign in reverse so the first match of each reference frame wins
+    mapping[path[::-1, 0]] = path[::-1, 1]
+    return mapping
@@ -0,0 +1,245 @@
+"""Body-centric normalization and augmentation of keypoint clips
+
+`preprocess` turns (..., frames, joints, 4) clips into training input:
+
+    normalize   coordinates relative to the hip center, divided by the
+                clip's median torso length, and turned about the vertical
+                axis so the hips face the camera (every frame, the first
+                frame only, or not at all)
+    augment     mirroring with left/right joints swapped, small rotations
+                about the vertical (yaw) and lateral (pitch) axes, and
+                time-warping by a speed factor with an optional smooth
+                wobble
+
+Every step is an array operation over whole clips; any number of leading
+axes is a batch, and yaw, pitch and mirror may differ per batch item.
+
+`PreprocessCache` stores results on disk as .npy files keyed by a hash of
+the clip and the parameters, so repeated training runs load them instead
+of recomputing.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from keypoint_format import JOINT_NAMES, joint_table
+
+# Part of every cache key; bump when preprocessing output changes
+PREPROCESS_VERSION = 1
+
+FACING_MODES = ('frame', 'first', None)
+
+# Ranges drawn from by random_augmentation
+AUGMENT_RANGES = {
+    'yaw': (-np.pi / 6, np.pi / 6),
+    'pitch': (-np.pi / 18, np.pi / 18),
+    'rate': (0.8, 1.25),
+    'wobble': (0.0, 0.3)
+}
+
+
+def mirror_permutation(joints=JOINT_NAMES):
+    """Index of the mirrored joint of every joint (`left_*` <-> `right_*`)"""
+    _, index = joint_table(joints)
+
+    def mirrored(name):
+        if name.startswith('left_'):
+            return 'right_' + name[len('left_'):]
+        if name.startswith('right_'):
+            return 'left_' + name[len('right_'):]
+        return name
+
+    return np.array([index.get(mirrored(name), i) for i, name in enumerate(joints)])
+
+
+def _center(positions, index, names):
+    return positions[..., [index[name] for name in names], :].mean(axis=-2)
+
+
+def normalize(data, joints=JOINT_NAMES, facing='frame'):
+    """Root-relative, torso-scaled and facing-aligned copy of `data`.
+
+    Undetected joints (zero confidence) are set to the origin, like
+    `motion_alignment.pose_features`.
+    """
+    if facing not in FACING_MODES:
+        raise ValueError(f'Unknown facing mode: {facing}')
+    out = np.array(data, dtype=np.float32)
+    _, index = joint_table(joints)
+    positions = out[..., :3]
+
+    hips = _center(positions, index, ('left_hip', 'right_hip'))
+    shoulders = _center(positions, index, ('left_shoulder', 'right_shoulder'))
+    positions -= hips[..., None, :]
+
+    # One scale per clip: the median is robust to frames with a bad detection
+    torso = np.median(np.linalg.norm(shoulders - hips, axis=-1), axis=-1) if out.shape[-3] else 1.0
+    scale = np.where(torso > 1e-6, torso, 1.0)
+    positions /= np.asarray(scale, dtype=np.float32)[..., None, None, None]
+
+    if facing is not None:
+        # Turn about the vertical (y) axis so the hip line points along +x
+        hip_line = positions[..., index['left_hip'], :] - positions[..., index['right_hip'], :]
+        heading = np.arctan2(hip_line[..., 2], hip_line[..., 0])
+        if facing == 'first':
+            heading = heading[..., :1]
+        _turn(positions, heading[..., None])
+
+    positions *= out[..., 3:4] > 0
+    return out
+
+
+def _turn(positions, angle):
+    """Rotate (..., 3) positions in place about the y axis by `angle`
+    (broadcast against the leading axes)"""
+    cos, sin = np.cos(angle).astype(np.float32), np.sin(angle).astype(np.float32)
+    x, z = positions[..., 0].copy(), positions[..., 2].copy()
+    positions[..., 0] = x * cos + z * sin
+    positions[..., 2] = z * cos - x * sin
+
+
+def _tilt(positions, angle):
+    """Rotate (..., 3) positions in place about the x axis by `angle`"""
+    cos, sin = np.cos(angle).astype(np.float32), np.sin(angle).astype(np.float32)
+    y, z = positions[..., 1].copy(), positions[..., 2].copy()
+    positions[..., 1] = y * cos - z * sin
+    positions[..., 2] = y * sin + z * cos
+
+
+def mirror(data, joints=JOINT_NAMES, where=True):
+    """Mirror normalized clips left to right: x is negated and left/right
+    joints swapped. `where` selects the batch items to mirror."""
+    data = np.asarray(data, dtype=np.float32)
+    mirrored = data[..., mirror_permutation(joints), :]
+    mirrored[..., 0] *= -1
+    where = np.asarray(where, dtype=bool)
+    if where.all():
+        return mirrored
+    return np.where(where.reshape(where.shape + (1,) * 3), mirrored, data)
+
+
+def rotate(data, yaw=0.0, pitch=0.0):
+    """Rotate normalized clips about the vertical axis by `yaw`, then about
+    the lateral axis by `pitch` (radians; scalars or one per batch item)"""
+    out = np.array(data, dtype=np.float32)
+    positions = out[..., :3]
+    # Angles broadcast over frames and joints
+    yaw = np.asarray(yaw, dtype=np.float32)[..., None, None]
+    pitch = np.asarray(pitch, dtype=np.float32)[..., None, None]
+    if np.any(yaw):
+        _turn(positions, yaw)
+    if np.any(pitch):
+        _tilt(positions, pitch)
+    return out
+
+
+def warp_times(num_frames, rate=1.0, wobble=0.0, phase=0.0):
+    """Fractional source frame of every output frame when playing
+    `num_frames` frames `rate` times faster, with the speed itself varying
+    by up to `wobble` (below 1, so time never runs backwards) over one
+    sine period across the clip"""
+    if rate <= 0 or not 0 <= wobble < 1:
+        raise ValueError('rate must be positive and wobble in [0, 1)')
+    last = max(num_frames - 1, 0)
+    # Output time t in [0, 1] maps to source time s(t) = t + w / (2 pi) * (sin(2 pi t + phase) - sin(phase))
+    count = max(int(round(last / rate)) + 1, 1) if num_frames else 0
+    t = np.linspace(0.0, 1.0, count)
+    s = t + wobble / (2 * np.pi) * (np.sin(2 * np.pi * t + phase) - np.sin(phase))
+    # s(1) is 1, so the whole clip is covered
+    return np.clip(s * last, 0, last)
+
+
+def time_warp(data, times):
+    """Resample clips along the frame axis at fractional frame `times`,
+    interpolating positions and confidence linearly"""
+    data = np.asarray(data, dtype=np.float32)
+    times = np.asarray(times, dtype=np.float64)
+    if data.shape[-3] == 0:
+        return data[..., :len(times), :, :]
+    before = np.floor(times).astype(np.int64)
+    after = np.minimum(before + 1, data.shape[-3] - 1)
+    weight = (times - before).astype(np.float32)[:, None, None]
+    start = data[..., before, :, :]
+    return start + (data[..., after, :, :] - start) * weight
+
+
+def preprocess(data, joints=JOINT_NAMES, facing='frame', mirrored=False,
+               yaw=0.0, pitch=0.0, rate=1.0, wobble=0.0, phase=0.0):
+    """Normalize clips, then apply the given augmentation"""
+    out = normalize(data, joints, facing)
+    if np.any(mirrored):
+        out = mirror(out, joints, mirrored)
+    if np.any(yaw) or np.any(pitch):
+        out = rotate(out, yaw, pitch)
+    if rate != 1.0 or wobble:
+        out = time_warp(out, warp_times(out.shape[-3], rate, wobble, phase))
+    return out
+
+
+def random_augmentation(rng, ranges=AUGMENT_RANGES):
+    """Draw `preprocess` augmentation parameters from `ranges`"""
+    params = {name: float(rng.uniform(low, high)) for name, (low, high) in ranges.items()}
+    params['mirrored'] = bool(rng.random() < 0.5)
+    params['phase'] = float(rng.uniform(0, 2 * np.pi))
+    return params
+
+
+def clip_hash(data, joints=JOINT_NAMES):
+    """Content hash of a clip's array and joint names"""
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([list(joints), data.shape]).encode('utf-8'))
+    digest.update(memoryview(data).cast('B'))
+    return digest.hexdigest()
+
+
+class PreprocessCache:
+    """`preprocess` results stored as .npy files under `directory`"""
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source_hash, params):
+        # Per-item augmentation parameters may be arrays
+        text = json.dumps(
+            [PREPROCESS_VERSION, source_hash, params],
+            sort_keys=True,
+            default=lambda value: np.asarray(value).tolist()
+        )
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, data, joints=JOINT_NAMES, source_hash=None, **params):
+        """Preprocessed `data`, computed and stored on a miss.
+
+        `source_hash` identifies the clip; computed with `clip_hash` when
+        not given. Cached arrays are returned memory-mapped, read-only.
+        """
+        joints = list(joints)
+        if source_hash is None:
+            source_hash = clip_hash(data, joints)
+        path = os.path.join(self.directory, self.key(source_hash, dict(params, joints=joints)) + '.npy')
+        try:
+            result = np.load(path, mmap_mode='r')
+            self.hits += 1
+            return result
+        except (OSError, ValueError):
+            pass
+
+        result = preprocess(data, joints, **params)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, result)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.misses += 1
+        return result
@@ -2,11 +2,19 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import webview
+import os
+import shutil
 import threading
 import base64
 from io import BytesIO
 from PIL import Image
 
+from keypoint_format import JOINT_NAMES, MEDIAPIPE_TO_COCO, KeypointWriter
+
+# Frames are appended here as they are processed, so the file can be
+# followed live with `robot-movement-analyzer.py --follow`
+RECORDING_PATH = 'pose_recording.kpt'
+
 class PoseEstimationApp:
     def __init__(self):
         self.mp_pose = mp.solutions.pose
@@ -19,11 +27,17 @@ class PoseEstimationApp:
         self.is_running = False
         self.current_frame = None
         self.video_path = None
+        # Frames written to RECORDING_PATH by the current run
+        self.recorded_frames = 0
         
-    def process_frame(self, frame):
-        """Process a single frame for pose estimation"""
+    def process_frame(self, frame, writer=None):
+        """Process a single frame for pose estimation, appending its
+        keypoints to `writer` when given"""
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         results = self.pose.process(rgb_frame)
+        if writer is not None:
+            writer.append(self.landmarks_to_keypoints(results.pose_landmarks))
+            self.recorded_frames += 1
         
         if results.pose_landmarks:
             self.mp_drawing.draw_landmarks(
@@ -56,6 +70,18 @@ class PoseEstimationApp:
         
         return frame
     
+    def landmarks_to_keypoints(self, pose_landmarks):
+        """COCO keypoints of one frame as a (joints, 4) array; all zeros
+        (undetected) when no pose was found"""
+        keypoints = np.zeros((len(JOINT_NAMES), 4), dtype=np.float32)
+        if pose_landmarks:
+            landmarks = pose_landmarks.landmark
+            keypoints[:] = [
+                (lm.x, lm.y, lm.z, lm.visibility)
+                for lm in (landmarks[i] for i in MEDIAPIPE_TO_COCO)
+            ]
+        return keypoints
+    
     def calculate_angle(self, a, b, c):
         """Calculate angle between three points"""
         a = np.array(a)
@@ -97,33 +123,62 @@ class PoseEstimationApp:
         if not self.cap or not self.cap.isOpened():
             return {"success": False, "message": "No video source loaded"}
         
+        fps = 30
+        if self.video_path != "webcam":
+            fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+        # A new recording; KeypointWriter appends to an existing file
+        if os.path.exists(RECORDING_PATH):
+            os.remove(RECORDING_PATH)
+        writer = KeypointWriter(RECORDING_PATH, JOINT_NAMES, fps)
+        self.recorded_frames = 0
+        
         self.is_running = True
-        threading.Thread(target=self._process_loop, daemon=True).start()
-        return {"success": True, "message": "Processing started"}
+        threading.Thread(target=self._process_loop, args=(writer,), daemon=True).start()
+        return {"success": True, "message": f"Processing started, recording to {RECORDING_PATH}"}
     
     def stop_processing(self):
         """Stop video processing"""
         self.is_running = False
         return {"success": True, "message": "Processing stopped"}
     
-    def _process_loop(self):
-        """Main processing loop"""
-        while self.is_running and self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                if self.video_path and self.video_path != "webcam":
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                else:
-                    break
-            
-            processed_frame = self.process_frame(frame)
-            self.current_frame = self.frame_to_base64(processed_frame)
+    def _process_loop(self, writer):
+        """Main processing loop; records into `writer` until processing
+        stops or, for a video file, until the first pass ends"""
+        try:
+            while self.is_running and self.cap and self.cap.isOpened():
+                ret, frame = self.cap.read()
+                if not ret:
+                    if self.video_path and self.video_path != "webcam":
+                        # Looping playback; the first pass is already recorded
+                        if writer is not None:
+                            writer.close()
+                            writer = None
+                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    else:
+                        break
+                
+                processed_frame = self.process_frame(frame, writer)
+                self.current_frame = self.frame_to_base64(processed_frame)
+        finally:
+            if writer is not None:
+                writer.close()
     
     def get_frame(self):
         """Get current processed frame"""
         return self.current_frame
     
+    def save_recording(self, path=RECORDING_PATH):
+        """Keypoints are written as they are detected; copy the recording
+        to `path` when it is somewhere else"""
+        if not self.recorded_frames:
+            return {"success": False, "message": "Nothing recorded yet"}
+        frames = self.recorded_frames
+        if os.path.abspath(path) != os.path.abspath(RECORDING_PATH):
+            # Readers map only whole frames, so a copy taken mid-write is valid
+            shutil.copyfile(RECORDING_PATH, path)
+        return {"success": True, "message": f"Saved {frames} frames to {path}"}
+    
     def cleanup(self):
         """Cleanup resources"""
         self.is_running = False
@@ -150,6 +205,9 @@ class Api:
     
     def get_frame(self):
         return app.get_frame()
+    
+    def save_recording(self):
+        return app.save_recording()
 
 # HTML content
 html_content = """
@@ -328,6 +386,7 @@ html_content = """
             </button>
             <button class="btn-secondary" onclick="startProcessing()">▶️ Start</button>
             <button class="btn-danger" onclick="stopProcessing()">⏹️ Stop</button>
+            <button class="btn-secondary" onclick="saveRecording()">💾 Save Keypoints</button>
             <input type="file" id="fileInput" class="file-input" accept="video/*" onchange="loadVideo(this)">
         </div>
         
@@ -403,6 +462,12 @@ html_content = """
             });
         }
         
+        function saveRecording() {
+            pywebview.api.save_recording().then(result => {
+                updateStatus(result.message, result.success ? 'success' : 'error');
+            });
+        }
+        
         function updateStatus(message, type) {
             const status = document.getElementById('status');
             status.textContent = message;
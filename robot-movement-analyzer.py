@@ -1,6 +1,14 @@
 import webview
 import json
 import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from keypoint_format import PoseSequence, is_binary, open_binary, read_header
+from motion_alignment import align_clips, frame_map
 
 # HTML content for the application
 HTML_CONTENT = """
@@ -50,6 +58,28 @@ HTML_CONTENT = """
             position: relative;
         }
         
+        .timeline {
+            height: 80px;
+            background: rgba(0, 0, 0, 0.6);
+            position: relative;
+            cursor: pointer;
+        }
+        
+        #timeline-canvas {
+            width: 100%;
+            height: 100%;
+            display: block;
+        }
+        
+        .timeline-legend {
+            position: absolute;
+            top: 4px;
+            left: 8px;
+            font-size: 11px;
+            opacity: 0.7;
+            pointer-events: none;
+        }
+        
         .controls {
             background: rgba(0, 0, 0, 0.5);
             padding: 15px 20px;
@@ -214,6 +244,11 @@ HTML_CONTENT = """
                 </div>
             </div>
             
+            <div class="section" id="alignment-section" style="display: none;">
+                <h3>🔀 Aligned Clips</h3>
+                <div id="alignment-list"></div>
+            </div>
+            
             <div class="section">
                 <h3>📈 Movement Stats</h3>
                 <div class="stat-row">
@@ -230,6 +265,15 @@ HTML_CONTENT = """
         <div class="main-content">
             <div id="canvas-container"></div>
             
+            <div class="timeline" id="timeline">
+                <canvas id="timeline-canvas"></canvas>
+                <div class="timeline-legend">
+                    <span style="color: #4ecdc4;">■ Joint speed</span>
+                    <span style="color: #ffd700;">— Confidence</span>
+                    · scroll to zoom, drag to scrub
+                </div>
+            </div>
+            
             <div class="controls">
                 <button id="play-btn">▶️ Play</button>
                 <button id="pause-btn" disabled>⏸️ Pause</button>
@@ -246,8 +290,8 @@ HTML_CONTENT = """
     </div>
     
     <script>
-        // Keypoints data (will be injected)
-        const KEYPOINTS_DATA = __KEYPOINTS_DATA__;
+        // Recording metadata (will be injected); frames are fetched in windows
+        const KEYPOINTS_META = __KEYPOINTS_META__;
         
         // Three.js scene setup
         let scene, camera, renderer, skeleton, animationId;
@@ -255,6 +299,16 @@ HTML_CONTENT = """
         let currentFrame = 0;
         let playbackSpeed = 1.0;
         
+        // Frame window cache: windows of WINDOW_SIZE frames are fetched from
+        // Python on demand, READ_AHEAD windows ahead of the playhead, and the
+        // least recently used ones are evicted past MAX_CACHED_WINDOWS.
+        const WINDOW_SIZE = 256;
+        const READ_AHEAD = 2;
+        const MAX_CACHED_WINDOWS = 16;
+        const VALUES_PER_FRAME = KEYPOINTS_META.joints.length * 4;
+        const frameCache = new Map();
+        const pendingWindows = new Map();
+        
         const jointConnections = [
             ['nose', 'left_eye'], ['nose', 'right_eye'],
             ['left_eye', 'left_ear'], ['right_eye', 'right_ear'],
@@ -268,6 +322,142 @@ HTML_CONTENT = """
             ['right_hip', 'right_knee'], ['right_knee', 'right_ankle']
         ];
         
+        function whenApiReady() {
+            return new Promise(resolve => {
+                if (window.pywebview && window.pywebview.api) {
+                    resolve();
+                } else {
+                    window.addEventListener('pywebviewready', resolve, { once: true });
+                }
+            });
+        }
+        
+        function fetchWindow(index) {
+            if (frameCache.has(index)) return Promise.resolve(frameCache.get(index));
+            if (pendingWindows.has(index)) return pendingWindows.get(index);
+            
+            const request = pywebview.api.get_frame_window(index * WINDOW_SIZE, WINDOW_SIZE)
+                .then(result => {
+                    const frameWindow = {
+                        data: new Float32Array(result.data),
+                        distance: new Float64Array(result.distance),
+                        avgConfidence: new Float32Array(result.avg_confidence),
+                        confidenceClass: new Uint8Array(result.confidence_class),
+                        overlays: result.overlays.map(data => new Float32Array(data))
+                    };
+                    frameCache.set(index, frameWindow);
+                    pendingWindows.delete(index);
+                    
+                    // Evict least recently used windows
+                    while (frameCache.size > MAX_CACHED_WINDOWS) {
+                        frameCache.delete(frameCache.keys().next().value);
+                    }
+                    return frameWindow;
+                })
+                .catch(error => {
+                    pendingWindows.delete(index);
+                    console.error('Failed to fetch frames:', error);
+                });
+            
+            pendingWindows.set(index, request);
+            return request;
+        }
+        
+        function concatArrays(first, second) {
+            const joined = new first.constructor(first.length + second.length);
+            joined.set(first);
+            joined.set(second, first.length);
+            return joined;
+        }
+        
+        // Called from Python in follow mode with frames appended to the file
+        function appendFrames(update) {
+            const previousFrames = KEYPOINTS_META.frames;
+            const wasAtEnd = currentFrame >= previousFrames - 1;
+            KEYPOINTS_META.frames = update.frames;
+            KEYPOINTS_META.total_distance = update.total_distance;
+            
+            // Merge pushed frames into the windows they belong to. A window
+            // stays cached only if it is complete up to the new last frame;
+            // anything else is dropped and fetched again on demand.
+            const jointCount = KEYPOINTS_META.joints.length;
+            const pushedEnd = update.start + update.count;
+            const firstIndex = Math.floor(previousFrames / WINDOW_SIZE);
+            const lastIndex = Math.floor((update.frames - 1) / WINDOW_SIZE);
+            for (let index = firstIndex; index <= lastIndex; index++) {
+                const windowStart = index * WINDOW_SIZE;
+                const windowEnd = Math.min(windowStart + WINDOW_SIZE, update.frames);
+                let cached = frameCache.get(index);
+                
+                const from = (cached ? windowStart + cached.distance.length : windowStart) - update.start;
+                const to = Math.min(pushedEnd, windowEnd) - update.start;
+                if (from >= 0 && from < to) {
+                    const part = {
+                        data: new Float32Array(update.data.slice(from * VALUES_PER_FRAME, to * VALUES_PER_FRAME)),
+                        distance: new Float64Array(update.distance.slice(from, to)),
+                        avgConfidence: new Float32Array(update.avg_confidence.slice(from, to)),
+                        confidenceClass: new Uint8Array(update.confidence_class.slice(from * jointCount, to * jointCount)),
+                        overlays: []
+                    };
+                    cached = !cached ? part : {
+                        data: concatArrays(cached.data, part.data),
+                        distance: concatArrays(cached.distance, part.distance),
+                        avgConfidence: concatArrays(cached.avgConfidence, part.avgConfidence),
+                        confidenceClass: concatArrays(cached.confidenceClass, part.confidenceClass),
+                        overlays: []
+                    };
+                    frameCache.set(index, cached);
+                }
+                
+                if (cached && windowStart + cached.distance.length < windowEnd) {
+                    frameCache.delete(index);
+                }
+            }
+            
+            document.getElementById('total-frames').textContent = KEYPOINTS_META.frames;
+            document.getElementById('duration').textContent = 
+                (KEYPOINTS_META.frames / KEYPOINTS_META.fps).toFixed(1) + 's';
+            
+            // Keep the timeline and a paused playhead pinned to the live edge
+            if (viewEnd >= previousFrames) {
+                viewEnd = KEYPOINTS_META.frames;
+            }
+            requestEnvelope();
+            if (!isPlaying && wasAtEnd) {
+                seek(KEYPOINTS_META.frames - 1);
+            }
+        }
+        
+        function prefetchAround(frame) {
+            const index = Math.floor(frame / WINDOW_SIZE);
+            const lastIndex = Math.floor((KEYPOINTS_META.frames - 1) / WINDOW_SIZE);
+            for (let i = 0; i <= READ_AHEAD; i++) {
+                // Wrap around so looping playback never stalls at the end
+                const ahead = (index + i) % (lastIndex + 1);
+                if (!frameCache.has(ahead)) fetchWindow(ahead);
+            }
+        }
+        
+        function getFrame(frame) {
+            const index = Math.floor(frame / WINDOW_SIZE);
+            const frameWindow = frameCache.get(index);
+            prefetchAround(frame);
+            if (!frameWindow) return null;
+            
+            // Mark window as most recently used
+            frameCache.delete(index);
+            frameCache.set(index, frameWindow);
+            
+            const row = frame - index * WINDOW_SIZE;
+            if (row >= frameWindow.distance.length) {
+                // Window was cached before more frames were appended
+                frameCache.delete(index);
+                fetchWindow(index);
+                return null;
+            }
+            return { frameWindow, row, offset: row * VALUES_PER_FRAME };
+        }
+        
         function init() {
             const container = document.getElementById('canvas-container');
             
@@ -301,6 +491,7 @@ HTML_CONTENT = """
             createSkeleton();
             
             // Update stats
+            createJointList();
             updateStats();
             
             // Event listeners
@@ -313,116 +504,230 @@ HTML_CONTENT = """
             });
             
             window.addEventListener('resize', onWindowResize);
+            initTimeline();
             
             // Start render loop
             animate();
             
-            // Update first frame
-            updateSkeleton(0);
+            // Update first frame once the Python bridge is available
+            whenApiReady().then(() => {
+                if (KEYPOINTS_META.frames > 0) {
+                    fetchWindow(0).then(() => updateSkeleton(0));
+                }
+            });
         }
         
+        // Renderer state resolved once in createSkeleton and reused every frame.
+        // The loaded clip is the first layer; clips aligned to it with DTW are
+        // drawn as further, single-colored overlay layers.
+        let skeletonLayers = [];
+        let boneIndexes;
+        const jointMatrix = new THREE.Matrix4();
+        // Indexed by confidence class: 0 low, 1 medium, 2 high
+        const jointColors = [
+            new THREE.Color(0xf87171),
+            new THREE.Color(0xfbbf24),
+            new THREE.Color(0x4ade80)
+        ];
+        const overlayColors = [0xa78bfa, 0xf472b6, 0x60a5fa, 0xfacc15];
+        const confidenceClasses = ['confidence-low', 'confidence-medium', 'confidence-high'];
+        
         function createSkeleton() {
             skeleton = new THREE.Group();
             
-            // Create joints (spheres)
-            const jointGeometry = new THREE.SphereGeometry(0.02, 16, 16);
-            const jointMaterial = new THREE.MeshPhongMaterial({ color: 0xff6b6b });
-            
-            KEYPOINTS_DATA.keypoints[0] && Object.keys(KEYPOINTS_DATA.keypoints[0]).forEach(jointName => {
-                const joint = new THREE.Mesh(jointGeometry, jointMaterial.clone());
-                joint.name = jointName;
-                skeleton.add(joint);
+            // Bones: one line segment per connection whose joints both exist
+            boneIndexes = [];
+            jointConnections.forEach(([start, end]) => {
+                const startIndex = KEYPOINTS_META.joints.indexOf(start);
+                const endIndex = KEYPOINTS_META.joints.indexOf(end);
+                if (startIndex >= 0 && endIndex >= 0) {
+                    boneIndexes.push(startIndex, endIndex);
+                }
             });
             
-            // Create bones (lines)
-            jointConnections.forEach(([start, end]) => {
-                const geometry = new THREE.BufferGeometry();
-                const material = new THREE.LineBasicMaterial({ color: 0x4ecdc4, linewidth: 2 });
-                const line = new THREE.Line(geometry, material);
-                line.name = `bone_${start}_${end}`;
-                skeleton.add(line);
+            skeletonLayers = [createSkeletonLayer(null, 0x4ecdc4)];
+            KEYPOINTS_META.overlays.forEach((overlay, i) => {
+                const color = overlayColors[i % overlayColors.length];
+                skeletonLayers.push(createSkeletonLayer(new THREE.Color(color), color));
             });
             
             scene.add(skeleton);
         }
         
-        function updateSkeleton(frame) {
-            if (!KEYPOINTS_DATA.keypoints[frame]) return;
-            
-            const keypoints = KEYPOINTS_DATA.keypoints[frame];
-            
-            // Update joint positions
-            Object.keys(keypoints).forEach(jointName => {
-                const joint = skeleton.getObjectByName(jointName);
-                if (joint && keypoints[jointName]) {
-                    const kp = keypoints[jointName];
-                    joint.position.set(
-                        (kp.x - 0.5) * 2,
-                        (1 - kp.y) * 2 - 0.5,
-                        (kp.z - 0.6) * 2
-                    );
-                    
-                    // Color by confidence
-                    const color = kp.confidence > 0.9 ? 0x4ade80 :
-                                 kp.confidence > 0.7 ? 0xfbbf24 : 0xf87171;
-                    joint.material.color.setHex(color);
-                }
-            });
+        function createSkeletonLayer(color, boneColor) {
+            const jointCount = KEYPOINTS_META.joints.length;
             
-            // Update bones
-            jointConnections.forEach(([start, end]) => {
-                const bone = skeleton.getObjectByName(`bone_${start}_${end}`);
-                const startJoint = skeleton.getObjectByName(start);
-                const endJoint = skeleton.getObjectByName(end);
+            // Joints: one instanced sphere per joint, colored per instance
+            const jointGeometry = new THREE.SphereGeometry(0.02, 16, 16);
+            const jointMaterial = new THREE.MeshPhongMaterial({ color: 0xffffff });
+            const jointMesh = new THREE.InstancedMesh(jointGeometry, jointMaterial, jointCount);
+            jointMesh.instanceMatrix.setUsage(THREE.DynamicDrawUsage);
+            jointMesh.frustumCulled = false;
+            for (let j = 0; j < jointCount; j++) {
+                jointMesh.setMatrixAt(j, jointMatrix);
+                jointMesh.setColorAt(j, color || jointColors[0]);
+            }
+            skeleton.add(jointMesh);
+            
+            const bonePositions = new Float32Array(boneIndexes.length * 3);
+            const boneGeometry = new THREE.BufferGeometry();
+            const positionAttribute = new THREE.BufferAttribute(bonePositions, 3);
+            positionAttribute.setUsage(THREE.DynamicDrawUsage);
+            boneGeometry.setAttribute('position', positionAttribute);
+            const boneMaterial = new THREE.LineBasicMaterial({ color: boneColor, linewidth: 2 });
+            const boneLines = new THREE.LineSegments(boneGeometry, boneMaterial);
+            boneLines.frustumCulled = false;
+            skeleton.add(boneLines);
+            
+            return {
+                jointMesh,
+                boneLines,
+                bonePositions,
+                jointPositions: new Float32Array(jointCount * 3),
+                colorByConfidence: !color
+            };
+        }
+        
+        function updateSkeletonLayer(layer, data, offset, classes, row) {
+            const jointCount = KEYPOINTS_META.joints.length;
+            const { jointMesh, jointPositions, bonePositions } = layer;
+            
+            // Update joint positions and colors in place
+            for (let j = 0; j < jointCount; j++) {
+                const base = offset + j * 4;
+                const x = (data[base] - 0.5) * 2;
+                const y = (1 - data[base + 1]) * 2 - 0.5;
+                const z = (data[base + 2] - 0.6) * 2;
+                jointPositions[j * 3] = x;
+                jointPositions[j * 3 + 1] = y;
+                jointPositions[j * 3 + 2] = z;
                 
-                if (bone && startJoint && endJoint) {
-                    const positions = new Float32Array([
-                        startJoint.position.x, startJoint.position.y, startJoint.position.z,
-                        endJoint.position.x, endJoint.position.y, endJoint.position.z
-                    ]);
-                    bone.geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+                jointMatrix.makeTranslation(x, y, z);
+                jointMesh.setMatrixAt(j, jointMatrix);
+                
+                // Color by precomputed confidence class
+                if (layer.colorByConfidence) {
+                    jointMesh.setColorAt(j, jointColors[classes[row * jointCount + j]]);
                 }
+            }
+            jointMesh.instanceMatrix.needsUpdate = true;
+            jointMesh.instanceColor.needsUpdate = true;
+            
+            // Update bones from the resolved joint indexes
+            for (let b = 0; b < boneIndexes.length; b++) {
+                const source = boneIndexes[b] * 3;
+                bonePositions[b * 3] = jointPositions[source];
+                bonePositions[b * 3 + 1] = jointPositions[source + 1];
+                bonePositions[b * 3 + 2] = jointPositions[source + 2];
+            }
+            layer.boneLines.geometry.attributes.position.needsUpdate = true;
+        }
+        
+        function updateSkeleton(frame) {
+            const keypoints = getFrame(frame);
+            if (!keypoints) return false;
+            
+            const { frameWindow, row, offset } = keypoints;
+            updateSkeletonLayer(skeletonLayers[0], frameWindow.data, offset, frameWindow.confidenceClass, row);
+            frameWindow.overlays.forEach((data, i) => {
+                updateSkeletonLayer(skeletonLayers[i + 1], data, offset, null, row);
             });
             
             // Update UI
-            updateJointList(keypoints);
+            updateJointList(frameWindow, row, offset);
+            updateMovementStats(frameWindow, row);
             document.getElementById('frame-info').textContent = 
-                `Frame: ${frame + 1} / ${KEYPOINTS_DATA.keypoints.length}`;
+                `Frame: ${frame + 1} / ${KEYPOINTS_META.frames}`;
+            drawTimeline(frame);
+            return true;
         }
         
-        function updateJointList(keypoints) {
+        // Joint list cells are created once; per frame only changed cells are touched
+        const jointCells = [];
+        const jointCellText = [];
+        const jointCellClass = [];
+        
+        function createJointList() {
             const listElement = document.getElementById('joint-list');
-            let html = '';
-            
-            Object.keys(keypoints).forEach(name => {
-                const kp = keypoints[name];
-                const confClass = kp.confidence > 0.9 ? 'confidence-high' :
-                                 kp.confidence > 0.7 ? 'confidence-medium' : 'confidence-low';
-                html += `<div class="joint-item">
-                    <strong>${name}:</strong> 
-                    <span class="${confClass}">${(kp.confidence * 100).toFixed(1)}%</span>
-                </div>`;
+            listElement.textContent = '';
+            
+            KEYPOINTS_META.joints.forEach(name => {
+                const item = document.createElement('div');
+                item.className = 'joint-item';
+                const label = document.createElement('strong');
+                label.textContent = `${name}: `;
+                const value = document.createElement('span');
+                item.appendChild(label);
+                item.appendChild(value);
+                listElement.appendChild(item);
+                
+                jointCells.push(value);
+                jointCellText.push('');
+                jointCellClass.push(-1);
             });
+        }
+        
+        function updateJointList(frameWindow, row, offset) {
+            const jointCount = KEYPOINTS_META.joints.length;
             
-            listElement.innerHTML = html;
+            for (let j = 0; j < jointCount; j++) {
+                const confClass = frameWindow.confidenceClass[row * jointCount + j];
+                if (confClass !== jointCellClass[j]) {
+                    jointCells[j].className = confidenceClasses[confClass];
+                    jointCellClass[j] = confClass;
+                }
+                
+                const text = (frameWindow.data[offset + j * 4 + 3] * 100).toFixed(1) + '%';
+                if (text !== jointCellText[j]) {
+                    jointCells[j].textContent = text;
+                    jointCellText[j] = text;
+                }
+            }
+        }
+        
+        const statCellText = {};
+        function setStatText(id, text) {
+            if (statCellText[id] !== text) {
+                document.getElementById(id).textContent = text;
+                statCellText[id] = text;
+            }
+        }
+        
+        function updateMovementStats(frameWindow, row) {
+            setStatText('avg-confidence', (frameWindow.avgConfidence[row] * 100).toFixed(1) + '%');
+            setStatText('total-distance', frameWindow.distance[row].toFixed(2));
         }
         
         function updateStats() {
-            document.getElementById('total-frames').textContent = KEYPOINTS_DATA.keypoints.length;
-            document.getElementById('fps').textContent = KEYPOINTS_DATA.fps;
+            document.getElementById('total-frames').textContent = KEYPOINTS_META.frames;
+            document.getElementById('fps').textContent = KEYPOINTS_META.fps;
             document.getElementById('duration').textContent = 
-                (KEYPOINTS_DATA.keypoints.length / KEYPOINTS_DATA.fps).toFixed(1) + 's';
-            
-            // Calculate average confidence
-            let totalConf = 0, count = 0;
-            KEYPOINTS_DATA.keypoints.forEach(frame => {
-                Object.values(frame).forEach(kp => {
-                    totalConf += kp.confidence;
-                    count++;
+                (KEYPOINTS_META.frames / KEYPOINTS_META.fps).toFixed(1) + 's';
+            
+            // DTW alignment of overlaid clips, one row per clip
+            if (KEYPOINTS_META.overlays.length > 0) {
+                document.getElementById('alignment-section').style.display = 'block';
+                const list = document.getElementById('alignment-list');
+                KEYPOINTS_META.overlays.forEach((overlay, i) => {
+                    const row = document.createElement('div');
+                    row.className = 'stat-row';
+                    const label = document.createElement('span');
+                    label.className = 'stat-label';
+                    label.style.color = '#' + overlayColors[i % overlayColors.length].toString(16).padStart(6, '0');
+                    label.textContent = overlay.name;
+                    const value = document.createElement('span');
+                    value.className = 'stat-value';
+                    value.textContent = overlay.normalized_cost.toFixed(3);
+                    value.title = 'Mean DTW cost per aligned step';
+                    row.appendChild(label);
+                    row.appendChild(value);
+                    list.appendChild(row);
                 });
-            });
-            document.getElementById('avg-confidence').textContent = 
-                ((totalConf / count) * 100).toFixed(1) + '%';
+            }
+            
+            // Whole-recording values until the first frame arrives
+            setStatText('avg-confidence', (KEYPOINTS_META.avg_confidence * 100).toFixed(1) + '%');
+            setStatText('total-distance', KEYPOINTS_META.total_distance.toFixed(2));
         }
         
         function play() {
@@ -438,21 +743,142 @@ HTML_CONTENT = """
         }
         
         function reset() {
-            currentFrame = 0;
-            updateSkeleton(0);
+            seek(0);
             pause();
         }
         
+        function seek(frame) {
+            currentFrame = Math.max(0, Math.min(KEYPOINTS_META.frames - 1, frame));
+            if (!updateSkeleton(currentFrame)) {
+                const target = currentFrame;
+                fetchWindow(Math.floor(target / WINDOW_SIZE)).then(() => {
+                    if (currentFrame === target) updateSkeleton(target);
+                });
+            }
+        }
+        
+        // Timeline: draws the speed / confidence envelope of the visible
+        // frame range. Envelopes come precomputed from Python at a zoom
+        // level matching the canvas width, so zooming and scrubbing never
+        // touch raw frames.
+        const MIN_VIEW_FRAMES = 32;
+        let timelineCanvas, timelineCtx;
+        let viewStart = 0, viewEnd = KEYPOINTS_META.frames;
+        let envelope = null;
+        let envelopeRequest = 0;
+        let scrubbing = false;
+        
+        function initTimeline() {
+            timelineCanvas = document.getElementById('timeline-canvas');
+            timelineCtx = timelineCanvas.getContext('2d');
+            resizeTimeline();
+            
+            timelineCanvas.addEventListener('wheel', (e) => {
+                e.preventDefault();
+                const frame = timelineFrameAt(e.offsetX);
+                const span = viewEnd - viewStart;
+                const newSpan = Math.max(MIN_VIEW_FRAMES, Math.min(KEYPOINTS_META.frames,
+                    Math.round(span * (e.deltaY > 0 ? 1.25 : 0.8))));
+                const ratio = (frame - viewStart) / span;
+                viewStart = Math.max(0, Math.min(KEYPOINTS_META.frames - newSpan,
+                    Math.round(frame - ratio * newSpan)));
+                viewEnd = viewStart + newSpan;
+                requestEnvelope();
+            }, { passive: false });
+            
+            timelineCanvas.addEventListener('pointerdown', (e) => {
+                scrubbing = true;
+                timelineCanvas.setPointerCapture(e.pointerId);
+                seek(timelineFrameAt(e.offsetX));
+            });
+            timelineCanvas.addEventListener('pointermove', (e) => {
+                if (scrubbing) seek(timelineFrameAt(e.offsetX));
+            });
+            timelineCanvas.addEventListener('pointerup', () => { scrubbing = false; });
+            
+            whenApiReady().then(requestEnvelope);
+        }
+        
+        function resizeTimeline() {
+            timelineCanvas.width = timelineCanvas.offsetWidth;
+            timelineCanvas.height = timelineCanvas.offsetHeight;
+            drawTimeline(currentFrame);
+        }
+        
+        function timelineFrameAt(x) {
+            const ratio = Math.max(0, Math.min(1, x / timelineCanvas.width));
+            return Math.floor(viewStart + ratio * (viewEnd - viewStart));
+        }
+        
+        function requestEnvelope() {
+            if (KEYPOINTS_META.frames === 0) return;
+            
+            // Only the latest request is drawn
+            const request = ++envelopeRequest;
+            pywebview.api.get_envelope(viewStart, viewEnd, timelineCanvas.width).then(result => {
+                if (request !== envelopeRequest) return;
+                envelope = result;
+                drawTimeline(currentFrame);
+            });
+        }
+        
+        function drawTimeline(frame) {
+            if (!timelineCtx) return;
+            const { width, height } = timelineCanvas;
+            timelineCtx.clearRect(0, 0, width, height);
+            
+            const span = viewEnd - viewStart;
+            if (envelope && envelope.speed_max.length > 0 && span > 0) {
+                const maxSpeed = Math.max(envelope.max_speed, 1e-6);
+                const binWidth = envelope.bin_frames / span * width;
+                
+                // Speed band: min to max per bin, with the mean on top
+                timelineCtx.fillStyle = 'rgba(78, 205, 196, 0.35)';
+                timelineCtx.strokeStyle = '#4ecdc4';
+                timelineCtx.beginPath();
+                for (let i = 0; i < envelope.speed_max.length; i++) {
+                    const x = (envelope.start + i * envelope.bin_frames - viewStart) / span * width;
+                    const top = height - envelope.speed_max[i] / maxSpeed * height;
+                    const bottom = height - envelope.speed_min[i] / maxSpeed * height;
+                    timelineCtx.fillRect(x, top, Math.max(1, binWidth), Math.max(1, bottom - top));
+                    const mean = height - envelope.speed_mean[i] / maxSpeed * height;
+                    if (i === 0) timelineCtx.moveTo(x, mean); else timelineCtx.lineTo(x, mean);
+                }
+                timelineCtx.stroke();
+                
+                // Mean confidence line
+                timelineCtx.strokeStyle = '#ffd700';
+                timelineCtx.beginPath();
+                for (let i = 0; i < envelope.confidence_mean.length; i++) {
+                    const x = (envelope.start + i * envelope.bin_frames - viewStart) / span * width;
+                    const y = height - envelope.confidence_mean[i] * height;
+                    if (i === 0) timelineCtx.moveTo(x, y); else timelineCtx.lineTo(x, y);
+                }
+                timelineCtx.stroke();
+            }
+            
+            // Playhead
+            if (frame >= viewStart && frame < viewEnd) {
+                const x = (frame - viewStart) / span * width;
+                timelineCtx.fillStyle = '#fff';
+                timelineCtx.fillRect(x - 1, 0, 2, height);
+            }
+        }
+        
         let lastTime = 0;
         function animate(time = 0) {
             animationId = requestAnimationFrame(animate);
             
             const deltaTime = time - lastTime;
             
-            if (isPlaying && deltaTime > (1000 / (KEYPOINTS_DATA.fps * playbackSpeed))) {
-                currentFrame = (currentFrame + 1) % KEYPOINTS_DATA.keypoints.length;
-                updateSkeleton(currentFrame);
-                lastTime = time;
+            if (isPlaying && KEYPOINTS_META.frames > 0 &&
+                deltaTime > (1000 / (KEYPOINTS_META.fps * playbackSpeed))) {
+                // Hold on the current frame until the next window has arrived
+                const nextFrame = (currentFrame + 1) % KEYPOINTS_META.frames;
+                if (updateSkeleton(nextFrame)) {
+                    currentFrame = nextFrame;
+                    lastTime = time;
+                }
             }
             
             // Rotate camera slightly for better view
@@ -466,6 +892,8 @@ HTML_CONTENT = """
             camera.aspect = container.clientWidth / container.clientHeight;
             camera.updateProjectionMatrix();
             renderer.setSize(container.clientWidth, container.clientHeight);
+            resizeTimeline();
+            requestEnvelope();
         }
         
         // Initialize when DOM is ready
@@ -479,40 +907,452 @@ HTML_CONTENT = """
 </html>
 """
 
+# Seconds between checks of a followed file for appended frames
+FOLLOW_INTERVAL = 0.25
+
+# Upper bound on frames returned by a single bridge call
+MAX_WINDOW_FRAMES = 1024
+
+# Joint confidence thresholds for the high / medium classes
+CONFIDENCE_HIGH = 0.9
+CONFIDENCE_MEDIUM = 0.7
+
+# Frames processed per step when precomputing analytics
+ANALYTICS_CHUNK_FRAMES = 65536
+
+def compute_analytics(frames, previous_frame=None, start_distance=0.0):
+    """Precompute per-frame movement statistics in a single pass.
+    
+    `frames` is a (frames, joints, 4) array. Returns a dict with
+    `distance`, the cumulative path length of all joints up to each frame,
+    `avg_confidence`, the mean joint confidence of each frame, and
+    `confidence_class`, a (frames, joints) array of 0 (low), 1 (medium)
+    or 2 (high). Steps to or from an undetected joint (zero confidence)
+    are not counted as movement.
+    
+    To extend analytics for frames appended to a recording, pass the last
+    already-analyzed frame as `previous_frame` and its cumulative distance
+    as `start_distance`.
+    """
+    num_frames, num_joints = frames.shape[:2]
+    distance = np.zeros(num_frames, dtype=np.float64)
+    avg_confidence = np.zeros(num_frames, dtype=np.float32)
+    confidence_class = np.zeros((num_frames, num_joints), dtype=np.uint8)
+    
+    previous = None if previous_frame is None else np.asarray(previous_frame, dtype=np.float32)
+    total = start_distance
+    for start in range(0, num_frames, ANALYTICS_CHUNK_FRAMES):
+        chunk = np.asarray(frames[start:start + ANALYTICS_CHUNK_FRAMES], dtype=np.float32)
+        end = start + len(chunk)
+        
+        # Prepend the last frame of the previous chunk so steps are continuous
+        joined = chunk if previous is None else np.concatenate([previous[None], chunk])
+        steps = np.linalg.norm(np.diff(joined[..., :3], axis=0), axis=2)
+        detected = joined[..., 3] > 0
+        steps *= detected[1:] & detected[:-1]
+        step_totals = steps.sum(axis=1)
+        if previous is None:
+            step_totals = np.concatenate([[0.0], step_totals])
+        
+        distance[start:end] = total + np.cumsum(step_totals)
+        total = distance[end - 1]
+        previous = chunk[-1]
+        
+        confidence = chunk[..., 3]
+        avg_confidence[start:end] = confidence.mean(axis=1)
+        confidence_class[start:end] = (
+            (confidence > CONFIDENCE_MEDIUM).astype(np.uint8) + (confidence > CONFIDENCE_HIGH)
+        )
+    
+    return {
+        'distance': distance,
+        'avg_confidence': avg_confidence,
+        'confidence_class': confidence_class
+    }
+
 class API:
     def __init__(self):
-        # Load keypoints data from the provided file
-        self.keypoints_data = {
-            "video_id": 1,
-            "frames": 150,
-            "fps": 30,
-            "keypoints": []  # Will be loaded from file
-        }
+        # Keypoints are held as a (frames, joints, 4) float32 array of
+        # x, y, z, confidence; for binary files it is memory-mapped
+        self.video_id = 1
+        self.fps = 30
+        self.joint_names = []
+        self.frames = np.zeros((0, 0, 4), dtype=np.float32)
+        # Clips aligned to this one, drawn as overlays
+        self.comparisons = []
+        # Guards frame and analytics state while a followed file grows
+        self._lock = threading.Lock()
+        self._window = None
+        # (device, inode) and header of the followed file, to tell a new
+        # recording at the same path from a longer one
+        self._followed = None
+        self._index()
+    
+    def _index(self, source_path=None):
+        """Precompute analytics and the timeline envelope for the frames"""
+        self.analytics = compute_analytics(self.frames)
+        if source_path:
+            self.envelope = load_envelope(source_path, self.analytics, len(self.joint_names), self.fps)
+        else:
+            self.envelope = build_envelope(self.analytics, len(self.joint_names), self.fps)
+    
+    def _use_clip(self, clip):
+        self.frames = clip.data
+        self.joint_names = list(clip.joints)
+        self.video_id = clip.video_id
+        self.fps = clip.fps
+    
+    def set_keypoints(self, data):
+        """Use already-parsed JSON keypoints data"""
+        self._use_clip(PoseSequence.from_dict(data))
+        self._index()
     
     def load_keypoints(self, filepath):
-        """Load keypoints from JSON file"""
+        """Load keypoints from a binary (.kpt) or JSON file"""
         try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                self.keypoints_data = data
-                return True
+            self._use_clip(PoseSequence.load(filepath))
+            self._index(filepath)
+            return True
         except Exception as e:
             print(f"Error loading keypoints: {e}")
             return False
+    
+    def add_comparisons(self, filepaths):
+        """Load further keypoint files and align them to the loaded clip
+        with DTW, so they can be played back as overlays"""
+        clips = []
+        for filepath in filepaths:
+            try:
+                clip = PoseSequence.load(filepath).select(self.joint_names)
+            except Exception as e:
+                print(f"Error loading keypoints: {e}")
+                continue
+            clips.append((filepath, clip))
+        
+        alignments = align_clips(self.frames, [clip.data for _, clip in clips], self.joint_names)
+        for (filepath, clip), alignment in zip(clips, alignments):
+            self.comparisons.append({
+                'name': os.path.basename(filepath),
+                'video_id': clip.video_id,
+                'frames': clip.data,
+                'frame_map': frame_map(alignment, len(self.frames)),
+                'cost': alignment.cost,
+                'normalized_cost': alignment.normalized_cost
+            })
+    
+    def follow(self, filepath, window):
+        """Watch a binary keypoints file that is still being recorded and
+        push newly appended frames to the page"""
+        if not is_binary(filepath):
+            print(f"Follow mode needs a binary .kpt file: {filepath}")
+            return
+        self._window = window
+        self._followed = self._identify(filepath)
+        threading.Thread(target=self._follow_loop, args=(filepath,), daemon=True).start()
+    
+    def _follow_loop(self, filepath):
+        """Poll the followed file and push appended frames to the page; a
+        new recording at the path reloads the page"""
+        while True:
+            time.sleep(FOLLOW_INTERVAL)
+            try:
+                update = self._read_appended(filepath)
+            except FileNotFoundError:
+                # Between a recording being deleted and its replacement
+                continue
+            except Exception as e:
+                print(f"Error following keypoints: {e}")
+                continue
+            if update and update.get('reloaded'):
+                self._window.load_html(page_html(self.get_metadata()))
+            elif update:
+                self._window.evaluate_js(f'appendFrames({json.dumps(update)})')
+    
+    @staticmethod
+    def _identify(filepath):
+        stat = os.stat(filepath)
+        with open(filepath, 'rb') as f:
+            header = read_header(f)
+        return (stat.st_dev, stat.st_ino), header
+    
+    def _reload(self, filepath):
+        """Load a followed file from scratch"""
+        clip = PoseSequence.load(filepath)
+        analytics = compute_analytics(clip.data)
+        envelope = build_envelope(analytics, len(clip.joints), clip.fps)
+        with self._lock:
+            self._use_clip(clip)
+            self.analytics = analytics
+            self.envelope = envelope
+        return {'reloaded': True, 'frames': len(clip)}
+    
+    def _read_appended(self, filepath):
+        """Pick up frames appended since the last check and extend the
+        analytics over only those frames. Returns the page update, or None
+        when nothing was appended.
+        
+        A file that was replaced (another inode or header), shrank, or
+        whose last known frame changed holds a new recording, and is
+        reloaded whole instead.
+        """
+        identity = self._identify(filepath)
+        # Remapping is O(1); only whole frames are mapped
+        header, frames = open_binary(filepath)
+        start = len(self.frames)
+        if (identity != self._followed or len(frames) < start
+                or (start and not np.array_equal(frames[start - 1], self.frames[start - 1]))):
+            self._followed = identity
+            return self._reload(filepath)
+        if len(frames) == start:
+            return None
+        
+        appended = compute_analytics(
+            frames[start:],
+            previous_frame=self.frames[start - 1] if start else None,
+            start_distance=float(self.analytics['distance'][-1]) if start else 0.0
+        )
+        analytics = {
+            key: np.concatenate([self.analytics[key], appended[key]])
+            for key in appended
+        }
+        envelope = extend_envelope(self.envelope, analytics, start, len(self.joint_names), self.fps)
+        
+        with self._lock:
+            self.frames = frames
+            self.analytics = analytics
+            self.envelope = envelope
+        
+        update = self.get_frame_window(start, len(frames) - start)
+        update['frames'] = len(frames)
+        update['total_distance'] = float(analytics['distance'][-1])
+        return update
+    
+    def get_metadata(self):
+        """Describe the loaded recording without any per-frame data"""
+        return {
+            'video_id': self.video_id,
+            'fps': self.fps,
+            'frames': len(self.frames),
+            'joints': self.joint_names,
+            'avg_confidence': float(self.analytics['avg_confidence'].mean()) if len(self.frames) else 0.0,
+            'total_distance': float(self.analytics['distance'][-1]) if len(self.frames) else 0.0,
+            'overlays': [
+                {
+                    'name': comparison['name'],
+                    'video_id': comparison['video_id'],
+                    'cost': comparison['cost'],
+                    'normalized_cost': comparison['normalized_cost']
+                }
+                for comparison in self.comparisons
+            ]
+        }
+    
+    def get_frame_window(self, start, count):
+        """Return up to `count` frames from `start` as one flat list of
+        x, y, z, confidence values per joint, in `joint_names` order,
+        along with the precomputed analytics for those frames and the
+        aligned frames of every overlay clip"""
+        with self._lock:
+            return self._frame_window(start, count)
+    
+    def _frame_window(self, start, count):
+        start = max(0, int(start))
+        end = min(len(self.frames), start + min(int(count), MAX_WINDOW_FRAMES))
+        
+        window = slice(start, end)
+        return {
+            'start': start,
+            'count': max(0, end - start),
+            'data': self.frames[window].ravel().tolist(),
+            'distance': self.analytics['distance'][window].tolist(),
+            'avg_confidence': self.analytics['avg_confidence'][window].tolist(),
+            'confidence_class': self.analytics['confidence_class'][window].ravel().tolist(),
+            'overlays': [
+                comparison['frames'][comparison['frame_map'][window]].ravel().tolist()
+                for comparison in self.comparisons
+            ]
+        }
+    
+    def get_envelope(self, start, end, bins):
+        """Return the timeline envelope for frames [start, end) from the
+        coarsest pyramid level that still gives at least `bins` bins"""
+        with self._lock:
+            return self._envelope_range(start, end, bins)
+    
+    def _envelope_range(self, start, end, bins):
+        bin_sizes = self.envelope['bin_frames'].tolist()
+        start = max(0, int(start))
+        end = min(len(self.frames), int(end))
+        bins = max(1, min(int(bins), MAX_ENVELOPE_BINS))
+        
+        result = {'start': start, 'bin_frames': 1, 'max_speed': float(self.envelope['max_speed'])}
+        for signal in ('speed', 'confidence'):
+            for stat in ENVELOPE_STATS:
+                result[f'{signal}_{stat}'] = []
+        if not bin_sizes or end <= start:
+            return result
+        
+        level = 0
+        for candidate, size in enumerate(bin_sizes):
+            if (end - start) / size >= bins:
+                level = candidate
+        
+        size = bin_sizes[level]
+        first = start // size
+        last = -(-end // size)
+        result['start'] = first * size
+        result['bin_frames'] = size
+        for signal in ('speed', 'confidence'):
+            for stat in ENVELOPE_STATS:
+                values = self.envelope[f'{signal}_{stat}_{level}'][first:last]
+                result[f'{signal}_{stat}'] = values.tolist()
+        return result
+
+# Envelope pyramid: level 0 bins ENVELOPE_BASE_BIN frames, each further
+# level merges ENVELOPE_FANOUT bins of the one below
+ENVELOPE_BASE_BIN = 4
+ENVELOPE_FANOUT = 4
+ENVELOPE_SUFFIX = '.envelope.npz'
+ENVELOPE_STATS = ('min', 'max', 'mean')
+MAX_ENVELOPE_BINS = 4096
+
+def build_envelope(analytics, num_joints, fps):
+    """Build min/max/mean pyramids of joint speed and confidence.
+    
+    Works from the precomputed analytics, so no pass over raw frames is
+    needed. Returns a flat dict of arrays suitable for `np.savez`: the
+    bin size of each level in `bin_frames` and, per level, `counts_<level>`
+    plus `<signal>_<stat>_<level>` for every signal and statistic.
+    """
+    return extend_envelope(None, analytics, 0, num_joints, fps)
+
+def extend_envelope(envelope, analytics, start, num_joints, fps):
+    """Extend `envelope`, built over the first `start` frames of
+    `analytics`, to all of them.
+    
+    Bins wholly before `start` are kept; only the last, partial bin of
+    every level and the bins after it are recomputed, so following a
+    growing file costs time in proportion to the appended frames.
+    """
+    if envelope is None or not len(envelope['bin_frames']):
+        envelope, start = None, 0
+    levels = len(envelope['bin_frames']) if envelope is not None else 0
+    
+    # Unchanged bins of the current level, and the first frame after them
+    kept = start // ENVELOPE_BASE_BIN
+    first = kept * ENVELOPE_BASE_BIN
+    distance = analytics['distance']
+    # Mean joint speed in normalized units per second
+    previous = distance[first - 1:first] if first else distance[:1]
+    speed = np.diff(distance[first:], prepend=previous) * fps / max(num_joints, 1)
+    signals = {
+        'speed': speed,
+        'confidence': analytics['avg_confidence'][first:].astype(np.float64)
+    }
+    
+    result = {}
+    bin_frames = []
+    size = fanout = ENVELOPE_BASE_BIN
+    counts = np.ones(len(speed), dtype=np.int64)
+    current = {name: {stat: values for stat in ENVELOPE_STATS} for name, values in signals.items()}
+    
+    def joined(key, values):
+        """Kept bins of `key` followed by the recomputed `values`"""
+        if level >= levels:
+            return values
+        return np.concatenate([envelope[key][:kept], values])
+    
+    while True:
+        starts = np.arange(0, len(counts), fanout)
+        if len(starts) == 0:
+            break
+        
+        level = len(bin_frames)
+        next_counts = np.add.reduceat(counts, starts)
+        for name, stats in current.items():
+            for stat in ENVELOPE_STATS:
+                if stat == 'min':
+                    merged = np.minimum.reduceat(stats['min'], starts)
+                elif stat == 'max':
+                    merged = np.maximum.reduceat(stats['max'], starts)
+                else:
+                    merged = np.add.reduceat(stats['mean'] * counts, starts) / next_counts
+                result[f'{name}_{stat}_{level}'] = joined(f'{name}_{stat}_{level}', merged)
+        result[f'counts_{level}'] = joined(f'counts_{level}', next_counts)
+        bin_frames.append(size)
+        
+        if len(result[f'counts_{level}']) <= 1:
+            break
+        size *= ENVELOPE_FANOUT
+        fanout = ENVELOPE_FANOUT
+        # The next level recomputes from the first of its bins that changed
+        kept //= ENVELOPE_FANOUT
+        counts = result[f'counts_{level}'][kept * ENVELOPE_FANOUT:]
+        current = {
+            name: {stat: result[f'{name}_{stat}_{level}'][kept * ENVELOPE_FANOUT:] for stat in ENVELOPE_STATS}
+            for name in signals
+        }
+    
+    result['bin_frames'] = np.array(bin_frames, dtype=np.int64)
+    max_speed = float(envelope['max_speed']) if envelope is not None else 0.0
+    result['max_speed'] = np.array(max(max_speed, speed.max()) if len(speed) else max_speed)
+    return result
+
+def load_envelope(source_path, analytics, num_joints, fps):
+    """Load the envelope cached beside `source_path`, rebuilding it when
+    the cache is missing or older than the source"""
+    cache_path = source_path + ENVELOPE_SUFFIX
+    stat = os.stat(source_path)
+    
+    try:
+        with np.load(cache_path) as cached:
+            if (int(cached['source_size']) == stat.st_size and
+                    int(cached['source_mtime_ns']) == stat.st_mtime_ns):
+                return {key: cached[key] for key in cached.files}
+    except (OSError, KeyError, ValueError):
+        pass
+    
+    envelope = build_envelope(analytics, num_joints, fps)
+    try:
+        np.savez(
+            cache_path,
+            source_size=stat.st_size,
+            source_mtime_ns=stat.st_mtime_ns,
+            **envelope
+        )
+    except OSError as e:
+        print(f"Could not cache envelope: {e}")
+    return envelope
+
+def page_html(metadata):
+    """The page with only the recording metadata injected; frames are
+    fetched through js_api"""
+    return HTML_CONTENT.replace('__KEYPOINTS_META__', json.dumps(metadata))
 
-def create_app():
-    """Create and configure the PyWebView application"""
+def create_app(keypoints_files=None, follow=False):
+    """Create and configure the PyWebView application
+    
+    The first keypoints file is played back; any further files are aligned
+    to it with DTW and drawn as overlaid skeletons. With `follow`, the first
+    file is watched for frames appended while it is still being recorded.
+    """
     api = API()
     
-    # Load keypoints data (you can modify the path)
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    keypoints_file = os.path.join(script_dir, 'keypoints_1.json')
+    # Load keypoints data (you can modify the path); a binary .kpt
+    # conversion of the file is preferred when present
+    if keypoints_files:
+        keypoints_file = keypoints_files[0]
+    else:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        keypoints_file = os.path.join(script_dir, 'keypoints_1.kpt')
+        if not os.path.exists(keypoints_file):
+            keypoints_file = os.path.join(script_dir, 'keypoints_1.json')
     
     # If file doesn't exist, use sample data
     if not os.path.exists(keypoints_file):
         print("Keypoints file not found, using sample data...")
         # Use the first few frames from your data as sample
-        api.keypoints_data = {
+        api.set_keypoints({
             "video_id": 1,
             "frames": 150,
             "fps": 30,
@@ -521,28 +1361,30 @@ def create_app():
                  "left_eye": {"x": 0.5168, "y": 0.8166, "z": 0.6040, "confidence": 0.9390}}
                 # Add more sample data as needed
             ]
-        }
+        })
     else:
         api.load_keypoints(keypoints_file)
-    
-    # Inject keypoints data into HTML
-    html_with_data = HTML_CONTENT.replace(
-        '__KEYPOINTS_DATA__',
-        json.dumps(api.keypoints_data)
-    )
+        if keypoints_files and len(keypoints_files) > 1 and not follow:
+            api.add_comparisons(keypoints_files[1:])
     
     # Create window
     window = webview.create_window(
         'Robot Movement Analyzer',
-        html=html_with_data,
+        html=page_html(api.get_metadata()),
+        js_api=api,
         width=1400,
         height=900,
         resizable=True,
         background_color='#1a1a2e'
     )
     
+    if follow:
+        api.follow(keypoints_file, window)
+    
     return window
 
 if __name__ == '__main__':
-    window = create_app()
+    args = sys.argv[1:]
+    follow = '--follow' in args
+    window = create_app([arg for arg in args if arg != '--follow'], follow=follow)
     webview.start(debug=True)
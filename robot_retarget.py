@@ -0,0 +1,359 @@
+"""Retarget COCO keypoints to humanoid robot joint angles
+
+A robot is described by a JSON file in `robots/`: a tree of joints, each
+mapping a bone between two keypoints onto one or more degrees of freedom.
+Joint types:
+
+    torso   orientation of the torso (neck over pelvis, shoulder line)
+            relative to the pelvis: `yaw`, `pitch` and `roll`
+    ball    direction of `bone` in the frame of its parent, which is
+            `pelvis` or a torso joint: `pitch` (swing forward) and
+            `roll` (swing towards the body's left), measured from a bone
+            hanging down, or pointing up with `"rest": "up"`
+    hinge   angle between `bone` and the bone of its parent joint:
+            `flex`, zero when straight
+
+Keypoints are in MediaPipe image coordinates (see pose_estimation.py): x to
+the right, y down and smaller z closer to the camera, so a person facing
+the camera has their left side at +x and faces -z. `check_conventions`
+solves a hand-built pose of that kind and fails if any angle comes out
+with the wrong sign.
+
+Bones may also end at the virtual keypoints `neck` (between the shoulders)
+and `pelvis` (between the hips). Every degree of freedom maps a human angle
+to the robot as `sign * angle + offset`, clipped to `limits`; offsets and
+limits are given in degrees, solved angles are in radians.
+
+The body frames and all angles are computed with array operations over
+every frame at once; `Robot.solve` takes any number of leading axes, so a
+whole batch of clips is one call.
+
+    python robot_retarget.py ROBOT KEYPOINTS_FILE [OUTPUT]
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from keypoint_format import JOINT_NAMES, PoseSequence, joint_table
+
+ROBOTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'robots')
+
+# Frames solved per call by retarget_clips; bounds the temporary arrays
+BATCH_FRAMES = 1 << 18
+
+# Up in image coordinates (y grows downwards)
+WORLD_UP = (0.0, -1.0, 0.0)
+
+# Virtual keypoints, midway between two keypoints
+VIRTUAL_KEYPOINTS = {
+    'neck': ('left_shoulder', 'right_shoulder'),
+    'pelvis': ('left_hip', 'right_hip')
+}
+
+# Angles each joint type can drive
+JOINT_ANGLES = {
+    'torso': ('yaw', 'pitch', 'roll'),
+    'ball': ('pitch', 'roll'),
+    'hinge': ('flex',)
+}
+
+# Components of a vector expressed in a body frame
+LATERAL, UP, FORWARD = 0, 1, 2
+
+
+def available_robots():
+    """Names of the robot configs shipped in ROBOTS_DIR"""
+    return sorted(
+        name[:-len('.json')] for name in os.listdir(ROBOTS_DIR) if name.endswith('.json')
+    )
+
+
+def load_robot(robot):
+    """Load a robot by config name (see `available_robots`) or by path"""
+    if os.path.exists(robot):
+        return Robot.load(robot)
+    if robot not in available_robots():
+        raise ValueError(f'Unknown robot: {robot}')
+    return Robot.load(os.path.join(ROBOTS_DIR, f'{robot}.json'))
+
+
+# Vectors below are (3, ...) arrays, one contiguous array per component,
+# which keeps every operation a plain elementwise pass over all frames
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _cross(a, b):
+    return np.stack([
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0]
+    ])
+
+
+def _normalize(vectors):
+    norm = np.sqrt(_dot(vectors, vectors))
+    return np.divide(vectors, norm, out=np.zeros_like(vectors), where=norm > 1e-8)
+
+
+def _body_frame(lateral, up):
+    """Axes lateral (towards the body's left), up and forward of an
+    orthonormal frame, from a lateral direction and an approximate up
+    direction"""
+    lateral = _normalize(lateral)
+    up = _normalize(up - _dot(up, lateral) * lateral)
+    # Facing the camera: left (+x) cross up (-y) is towards it (-z)
+    return lateral, up, _cross(lateral, up)
+
+
+def _local(frame, vectors):
+    """Components of `vectors` along the axes of `frame`"""
+    return [_dot(axis, vectors) for axis in frame]
+
+
+class Robot:
+    """A robot morphology: its joint tree and degrees of freedom"""
+
+    def __init__(self, config, name=None):
+        self.name = name or config.get('name', 'robot')
+        self.description = config.get('description', '')
+        self.joints = config['joints']
+        self.dof_names = []
+        signs, offsets, limits = [], [], []
+        types = {'pelvis': 'pelvis'}
+        for joint in self.joints:
+            kind, parent = joint.get('type'), joint.get('parent')
+            if kind not in JOINT_ANGLES:
+                raise ValueError(f"Joint {joint['name']}: unknown type {kind}")
+            if parent not in types:
+                raise ValueError(f"Joint {joint['name']}: parent {parent} must come before it")
+            if kind in ('torso', 'ball') and types[parent] not in ('pelvis', 'torso'):
+                raise ValueError(f"Joint {joint['name']}: parent must be pelvis or a torso joint")
+            if kind == 'hinge' and types[parent] not in ('ball', 'hinge'):
+                raise ValueError(f"Joint {joint['name']}: parent must be a ball or hinge joint")
+            for keypoint in joint.get('bone', ()):
+                if keypoint not in JOINT_NAMES and keypoint not in VIRTUAL_KEYPOINTS:
+                    raise ValueError(f"Joint {joint['name']}: unknown keypoint {keypoint}")
+            types[joint['name']] = kind
+
+            for dof, spec in joint['dofs'].items():
+                if spec['angle'] not in JOINT_ANGLES[kind]:
+                    raise ValueError(f"{dof}: a {kind} joint has no {spec['angle']} angle")
+                low, high = spec.get('limits', (-180, 180))
+                if low > high:
+                    raise ValueError(f'{dof}: lower limit above upper limit')
+                self.dof_names.append(dof)
+                signs.append(spec.get('sign', 1))
+                offsets.append(spec.get('offset', 0))
+                limits.append((low, high))
+
+        self.signs = np.array(signs, dtype=np.float32)
+        self.offsets = np.radians(np.array(offsets, dtype=np.float32))
+        self.limits = np.radians(np.array(limits, dtype=np.float32).reshape(-1, 2))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(config, config.get('name') or os.path.splitext(os.path.basename(path))[0])
+
+    def __repr__(self):
+        return f'Robot({self.name!r}, dofs={len(self.dof_names)})'
+
+    def solve(self, data, joints=JOINT_NAMES):
+        """Joint angles of (..., joints, 4) keypoint arrays.
+
+        Returns `(angles, confidence)`, both (..., dofs) float32 in
+        `dof_names` order: angles in radians, and the lowest confidence of
+        the keypoints each angle was solved from.
+        """
+        data = np.asarray(data, dtype=np.float32)
+        _, index = joint_table(joints)
+        # (4, joints, ...): each field of each keypoint contiguous over frames
+        fields = np.ascontiguousarray(np.moveaxis(data, (-1, -2), (0, 1)))
+
+        def keypoint(name):
+            if name in VIRTUAL_KEYPOINTS:
+                a, b = (keypoint(end) for end in VIRTUAL_KEYPOINTS[name])
+                return 0.5 * (a[0] + b[0]), np.minimum(a[1], b[1])
+            i = index[name]
+            return fields[:3, i], fields[3, i]
+
+        def bone(start, end):
+            (a, a_confidence), (b, b_confidence) = keypoint(start), keypoint(end)
+            return _normalize(b - a), np.minimum(a_confidence, b_confidence)
+
+        # Pelvis frame: hip line, turned upright
+        hips, hips_confidence = bone('right_hip', 'left_hip')
+        world_up = np.array(WORLD_UP, dtype=np.float32).reshape((3,) + (1,) * (hips.ndim - 1))
+        frames = {'pelvis': (_body_frame(hips, world_up), hips_confidence)}
+        bones = {}
+        values = {}
+
+        for joint in self.joints:
+            name, kind = joint['name'], joint['type']
+            parent_frame, parent_confidence = frames.get(joint['parent'], (None, None))
+            if kind == 'torso':
+                spine, spine_confidence = bone('pelvis', 'neck')
+                shoulders, shoulders_confidence = bone('right_shoulder', 'left_shoulder')
+                frame = _body_frame(shoulders, spine)
+                confidence = np.minimum(
+                    parent_confidence, np.minimum(spine_confidence, shoulders_confidence)
+                )
+                frames[name] = (frame, confidence)
+                up = _local(parent_frame, frame[UP])
+                lateral = _local(parent_frame, frame[LATERAL])
+                angles = {
+                    'yaw': np.arctan2(-lateral[FORWARD], lateral[LATERAL]),
+                    'pitch': np.arctan2(up[FORWARD], up[UP]),
+                    'roll': np.arctan2(up[LATERAL], up[UP])
+                }
+            elif kind == 'ball':
+                direction, bone_confidence = bone(*joint['bone'])
+                bones[name] = (direction, bone_confidence)
+                confidence = np.minimum(parent_confidence, bone_confidence)
+                local = _local(parent_frame, direction)
+                rest = 1.0 if joint.get('rest', 'down') == 'up' else -1.0
+                angles = {
+                    # + 0.0 turns -0.0 into 0.0, which atan2 would read as 180 degrees
+                    'pitch': np.arctan2(local[FORWARD], rest * local[UP] + 0.0),
+                    'roll': np.arcsin(np.clip(local[LATERAL], -1.0, 1.0))
+                }
+            else:
+                direction, bone_confidence = bone(*joint['bone'])
+                bones[name] = (direction, bone_confidence)
+                parent_direction, parent_confidence = bones[joint['parent']]
+                confidence = np.minimum(parent_confidence, bone_confidence)
+                cosine = _dot(direction, parent_direction)
+                angles = {'flex': np.arccos(np.clip(cosine, -1.0, 1.0))}
+
+            for dof, spec in joint['dofs'].items():
+                values[dof] = (angles[spec['angle']], confidence)
+
+        shape = data.shape[:-2] + (len(self.dof_names),)
+        angles = np.empty(shape, dtype=np.float32)
+        confidence = np.empty(shape, dtype=np.float32)
+        for i, dof in enumerate(self.dof_names):
+            angles[..., i], confidence[..., i] = values[dof]
+        angles *= self.signs
+        angles += self.offsets
+        np.clip(angles, self.limits[:, 0], self.limits[:, 1], out=angles)
+        return angles, confidence
+
+
+def retarget_clips(robot, clips, batch_frames=BATCH_FRAMES):
+    """Yield `(clip, angles, confidence)` for PoseSequence `clips`.
+
+    Consecutive clips are solved together in batches of about
+    `batch_frames` frames, so short clips do not pay per-call overhead.
+    """
+    pending, pending_frames = [], 0
+    for clip in clips:
+        pending.append(clip.select(JOINT_NAMES))
+        pending_frames += len(pending[-1])
+        if pending_frames >= batch_frames:
+            yield from _solve_batch(robot, pending)
+            pending, pending_frames = [], 0
+    if pending:
+        yield from _solve_batch(robot, pending)
+
+
+def _solve_batch(robot, clips):
+    data = np.concatenate([clip.data for clip in clips]) if len(clips) > 1 else clips[0].data
+    angles, confidence = robot.solve(data)
+    bounds = np.cumsum([0] + [len(clip) for clip in clips])
+    for clip, start, end in zip(clips, bounds[:-1], bounds[1:]):
+        yield clip, angles[start:end], confidence[start:end]
+
+
+# A person facing the camera, in image coordinates: left arm raised straight
+# forward with the elbow straight, left thigh raised forward with the knee
+# bent square, head tipped slightly forward, right arm and leg hanging
+CHECK_POSE = {
+    'nose': (0.50, 0.22, -0.04),
+    'left_shoulder': (0.56, 0.30, 0.0), 'right_shoulder': (0.44, 0.30, 0.0),
+    'left_elbow': (0.56, 0.30, -0.15), 'right_elbow': (0.44, 0.45, 0.0),
+    'left_wrist': (0.56, 0.30, -0.30), 'right_wrist': (0.44, 0.60, 0.0),
+    'left_hip': (0.55, 0.60, 0.0), 'right_hip': (0.45, 0.60, 0.0),
+    'left_knee': (0.55, 0.60, -0.20), 'right_knee': (0.45, 0.80, 0.0),
+    'left_ankle': (0.55, 0.80, -0.20), 'right_ankle': (0.45, 1.00, 0.0)
+}
+
+CHECK_ROBOT = {
+    'joints': [
+        {'name': 'waist', 'type': 'torso', 'parent': 'pelvis',
+         'dofs': {'waist_yaw': {'angle': 'yaw'}, 'waist_pitch': {'angle': 'pitch'}}},
+        {'name': 'neck', 'type': 'ball', 'parent': 'waist', 'bone': ['neck', 'nose'], 'rest': 'up',
+         'dofs': {'neck_pitch': {'angle': 'pitch'}}},
+        {'name': 'left_shoulder', 'type': 'ball', 'parent': 'waist', 'bone': ['left_shoulder', 'left_elbow'],
+         'dofs': {'left_shoulder_pitch': {'angle': 'pitch'}, 'left_shoulder_roll': {'angle': 'roll'}}},
+        {'name': 'left_elbow', 'type': 'hinge', 'parent': 'left_shoulder', 'bone': ['left_elbow', 'left_wrist'],
+         'dofs': {'left_elbow': {'angle': 'flex'}}},
+        {'name': 'right_shoulder', 'type': 'ball', 'parent': 'waist', 'bone': ['right_shoulder', 'right_elbow'],
+         'dofs': {'right_shoulder_pitch': {'angle': 'pitch'}}},
+        {'name': 'left_hip', 'type': 'ball', 'parent': 'pelvis', 'bone': ['left_hip', 'left_knee'],
+         'dofs': {'left_hip_pitch': {'angle': 'pitch'}}},
+        {'name': 'left_knee', 'type': 'hinge', 'parent': 'left_hip', 'bone': ['left_knee', 'left_ankle'],
+         'dofs': {'left_knee': {'angle': 'flex'}}}
+    ]
+}
+
+# Expected angles of CHECK_POSE, in degrees
+CHECK_ANGLES = {
+    'waist_yaw': 0, 'waist_pitch': 0, 'neck_pitch': 26.6,
+    'left_shoulder_pitch': 90, 'left_shoulder_roll': 0, 'left_elbow': 0,
+    'right_shoulder_pitch': 0, 'left_hip_pitch': 90, 'left_knee': 90
+}
+
+
+def check_conventions(tolerance=0.5):
+    """Solve CHECK_POSE and raise if any angle is off by more than
+    `tolerance` degrees"""
+    data = np.zeros((1, len(JOINT_NAMES), 4), dtype=np.float32)
+    for name, position in CHECK_POSE.items():
+        data[0, JOINT_NAMES.index(name)] = position + (1.0,)
+    robot = Robot(CHECK_ROBOT, 'check')
+    angles, _ = robot.solve(data)
+    solved = dict(zip(robot.dof_names, np.degrees(angles[0]).tolist()))
+    wrong = {
+        dof: round(solved[dof], 1) for dof, expected in CHECK_ANGLES.items()
+        if abs(solved[dof] - expected) > tolerance
+    }
+    if wrong:
+        raise RuntimeError(f'Retargeting conventions broken, solved {wrong}, expected {CHECK_ANGLES}')
+
+
+def save_angles(path, robot, angles, confidence, fps=30, video_id=None):
+    """Write solved angles of one clip as an .npz file"""
+    np.savez(
+        path,
+        angles=angles,
+        confidence=confidence,
+        dofs=np.array(robot.dof_names),
+        limits=robot.limits,
+        robot=np.array(robot.name),
+        fps=np.array(fps),
+        video_id=np.array(-1 if video_id is None else video_id)
+    )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print(f'Usage: {sys.argv[0]} ROBOT KEYPOINTS_FILE [OUTPUT]')
+        print(f"Robots: {', '.join(available_robots())}")
+        sys.exit(1)
+    check_conventions()
+    robot = load_robot(sys.argv[1])
+    clip = PoseSequence.load(sys.argv[2]).select(JOINT_NAMES)
+    start = time.perf_counter()
+    angles, confidence = robot.solve(clip.data)
+    elapsed = time.perf_counter() - start
+    print(f'{robot.name}: {len(clip)} frames, {len(robot.dof_names)} dofs, '
+          f'{len(clip) / max(elapsed, 1e-9):,.0f} frames/s')
+    if len(sys.argv) == 4:
+        save_angles(sys.argv[3], robot, angles, confidence, clip.fps, clip.video_id)
@@ -1,15 +1,181 @@
 import webview
 import json
 import base64
+import hashlib
 import os
+import shutil
+import sys
+import threading
+import time
+import uuid
 from pathlib import Path
 
+import numpy as np
+
+from clip_quality import QUALITY_VERSION, clean_clip, clean_sequence, kept_frames, summarize
+from keypoint_format import BINARY_EXTENSION, JOINT_NAMES, PoseSequence
+from motion_preprocess import PreprocessCache
+from robot_retarget import available_robots, load_robot, retarget_clips, save_angles
+from synthetic_motion import iter_sequences
+from training_dataset import write_dataset
+from training_export import EXTENSIONS, WRITE_BUFFER_SIZE, export_incremental, export_rows, read_manifest
+from video_jobs import ACTIVE_STATUSES, JobQueue
+from video_registry import VideoRegistry
+
+# Largest decoded chunk accepted by append_upload_chunk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+VIDEO_FILE_TYPES = ('Video files (*.mp4;*.avi;*.mov;*.mkv;*.webm)', 'All files (*.*)')
+
+# Linux ioctl that makes dst share src's extents (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+# Bridge responses stay bounded whatever the dataset size
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_FRAMES_PER_REQUEST = 256
+
+# Joints below this confidence count as unreliable in clip summaries
+LOW_CONFIDENCE = 0.5
+
+# Bytes read at each of the start, middle and end of a file for its sample hash
+SAMPLE_BLOCK_SIZE = 1024 * 1024
+
+def hash_file(path, block_size=8 * 1024 * 1024):
+    """SHA-256 of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def sample_hash(path, size, block_size=SAMPLE_BLOCK_SIZE):
+    """SHA-256 of a file's size and of blocks at its start, middle and
+    end: equal for identical files, and a few reads whatever the size"""
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        for offset in sorted({0, max(size // 2 - block_size // 2, 0), max(size - block_size, 0)}):
+            f.seek(offset)
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+def page_bounds(offset, limit):
+    """Clamp a requested page to the allowed size"""
+    return max(int(offset), 0), min(max(int(limit), 0), MAX_PAGE_SIZE)
+
+def load_clip(path):
+    """Load a keypoints file as a PoseSequence in JOINT_NAMES order"""
+    return PoseSequence.load(path).select(JOINT_NAMES)
+
+def confidence_stats(clip):
+    """Confidence summary of a PoseSequence"""
+    confidence = clip.confidence
+    if confidence.size == 0:
+        return {'mean_confidence': None, 'min_confidence': None, 'low_confidence': None}
+    return {
+        'mean_confidence': float(confidence.mean()),
+        'min_confidence': float(confidence.min()),
+        'low_confidence': float((confidence < LOW_CONFIDENCE).mean())
+    }
+
+def place_file(source, target):
+    """Make `source` available at `target` without copying bytes if possible.
+    
+    Tries a hard link, then a reflink, and falls back to a copy when the
+    files are on different filesystems. Returns the method used.
+    """
+    try:
+        os.link(source, target)
+        return 'hardlink'
+    except OSError:
+        pass
+    
+    if sys.platform.startswith('linux'):
+        import fcntl
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return 'reflink'
+        except OSError:
+            if os.path.exists(target):
+                os.remove(target)
+    
+    shutil.copyfile(source, target)
+    return 'copy'
+
 class RobotTrainingAPI:
-    def __init__(self):
-        self.videos = []
-        self.training_data = []
+    def __init__(self, max_workers=None):
         self.output_dir = Path("robot_training_data")
         self.output_dir.mkdir(exist_ok=True)
+        # Videos, processing runs and keypoint files survive restarts
+        self.registry = VideoRegistry(self.output_dir / 'registry.db')
+        # In-progress chunked uploads by upload id
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self._window = None
+        # Last clip read by get_frames, as (path, mtime, PoseSequence)
+        self._frames_cache = None
+        # Keypoint extraction runs in background worker processes
+        self.jobs = JobQueue(
+            self.registry,
+            max_workers=max_workers,
+            on_complete=self._on_job_complete
+        )
+    
+    def _find_duplicate(self, path, size, sample, sha256=None):
+        """Look for stored content identical to the file at `path`.
+        
+        Returns `(entry, sha256)`, the entry marked as a duplicate or None.
+        Only videos with the same size and sample hash can match; the file
+        (when `sha256` is not given) and those videos are hashed whole only
+        then, so sha256 stays None for content seen for the first time.
+        """
+        for video in self.registry.find_videos_by_sample(size, sample):
+            if not os.path.isfile(video['path']):
+                continue
+            if video['sample_hash'] is None:
+                # Stored before sample hashes were kept
+                video['sample_hash'] = sample_hash(video['path'], size)
+                self.registry.update_video(video['id'], sample_hash=video['sample_hash'])
+                if video['sample_hash'] != sample:
+                    continue
+            if sha256 is None:
+                sha256 = hash_file(path)
+            if video['sha256'] is None:
+                video['sha256'] = hash_file(video['path'])
+                self.registry.update_video(video['id'], sha256=video['sha256'])
+            if video['sha256'] == sha256:
+                return dict(video, duplicate=True), sha256
+        return None, sha256
+    
+    def _register_video(self, source_path, size, sha256=None, ingest='upload', sample=None):
+        """Move a fully written file into place and record it; with
+        `ingest='reference'`, the file is recorded where it is instead.
+        
+        If identical content is already stored (see _find_duplicate), the
+        new file is discarded and the existing entry (with any processed
+        keypoints) is returned instead.
+        """
+        reference = ingest == 'reference'
+        if sample is None:
+            sample = sample_hash(source_path, size)
+        with self._lock:
+            duplicate, sha256 = self._find_duplicate(source_path, size, sample, sha256)
+            if duplicate:
+                if not reference:
+                    os.remove(source_path)
+                return duplicate
+            
+            if reference:
+                filepath = Path(source_path)
+            else:
+                # Named by the sample hash when the content hash is not known;
+                # a stored file with the same one would have been hashed above
+                filepath = self.output_dir / f"video_{(sha256 or sample)[:16]}.mp4"
+                os.replace(source_path, filepath)
+            
+            # Ids come from the registry and are never reused
+            return self.registry.add_video(filepath.name, filepath, size, sha256, ingest, sample)
         
     def upload_video(self, file_data):
         """Handle video upload"""
@@ -19,113 +185,549 @@ class RobotTrainingAPI:
             video_bytes = base64.b64decode(encoded)
             
             # Save video
-            video_id = len(self.videos)
-            filename = f"video_{video_id}.mp4"
-            filepath = self.output_dir / filename
-            
-            with open(filepath, 'wb') as f:
+            temp_path = self.output_dir / f".upload_{uuid.uuid4().hex}.part"
+            with open(temp_path, 'wb') as f:
                 f.write(video_bytes)
             
-            video_info = {
-                'id': video_id,
+            video_info = self._register_video(
+                temp_path, len(video_bytes), hashlib.sha256(video_bytes).hexdigest()
+            )
+            return {'success': True, 'video': video_info}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def begin_upload(self, filename, size):
+        """Start a chunked upload; returns the id to send chunks to"""
+        try:
+            upload_id = uuid.uuid4().hex
+            temp_path = self.output_dir / f".upload_{upload_id}.part"
+            self._uploads[upload_id] = {
                 'filename': filename,
-                'path': str(filepath),
-                'size': len(video_bytes),
-                'status': 'uploaded'
+                'size': int(size),
+                'received': 0,
+                'path': temp_path,
+                'file': open(temp_path, 'wb'),
+                'hash': hashlib.sha256(),
+                'lock': threading.Lock()
             }
-            self.videos.append(video_info)
+            return {'success': True, 'upload_id': upload_id, 'chunk_size': UPLOAD_CHUNK_SIZE}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def append_upload_chunk(self, upload_id, offset, chunk):
+        """Write the next base64-encoded chunk of an upload straight to disk"""
+        try:
+            upload = self._uploads.get(upload_id)
+            if not upload:
+                return {'success': False, 'error': 'Upload not found'}
+            
+            data = base64.b64decode(chunk)
+            if len(data) > UPLOAD_CHUNK_SIZE:
+                return {'success': False, 'error': 'Chunk too large'}
             
+            with upload['lock']:
+                if int(offset) != upload['received']:
+                    return {'success': False, 'error': f"Expected offset {upload['received']}"}
+                upload['file'].write(data)
+                upload['hash'].update(data)
+                upload['received'] += len(data)
+                received = upload['received']
+            
+            return {'success': True, 'received': received}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def commit_upload(self, upload_id):
+        """Finish an upload once every byte has arrived"""
+        try:
+            upload = self._uploads.pop(upload_id, None)
+            if not upload:
+                return {'success': False, 'error': 'Upload not found'}
+            
+            with upload['lock']:
+                upload['file'].close()
+                if upload['received'] != upload['size']:
+                    os.remove(upload['path'])
+                    return {
+                        'success': False,
+                        'error': f"Received {upload['received']} of {upload['size']} bytes"
+                    }
+            
+            video_info = self._register_video(
+                upload['path'], upload['size'], upload['hash'].hexdigest()
+            )
             return {'success': True, 'video': video_info}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def ingest_local_videos(self, reference=False):
+        """Pick videos with a native file dialog and ingest them by path.
+        
+        The bytes never pass through the page: files are hard-linked or
+        reflinked into output_dir (copied only across filesystems), or with
+        `reference` simply recorded at their current location.
+        """
+        try:
+            paths = self._window.create_file_dialog(
+                webview.OPEN_DIALOG,
+                allow_multiple=True,
+                file_types=VIDEO_FILE_TYPES
+            )
+            ingested, errors = [], []
+            for path in paths or []:
+                try:
+                    ingested.append(self.ingest_video_path(path, reference))
+                except OSError as e:
+                    errors.append(f"{os.path.basename(path)}: {e}")
+            return {'success': True, 'videos': ingested, 'errors': errors}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def ingest_video_path(self, path, reference=False):
+        """Ingest one local video file by path.
+        
+        Duplicates are found without reading the whole file: only a few
+        blocks are hashed, and the full SHA-256 is computed only when a
+        stored video has the same size and sample hash. New content is
+        linked in at once and its sha256 stays unknown until then, so
+        ingesting a large capture still takes milliseconds.
+        """
+        size = os.path.getsize(path)
+        sample = sample_hash(path, size)
+        with self._lock:
+            duplicate, sha256 = self._find_duplicate(path, size, sample)
+        if duplicate:
+            return duplicate
+        
+        if reference:
+            return self._register_video(os.path.abspath(path), size, sha256, 'reference', sample)
+        
+        temp_path = self.output_dir / f".ingest_{uuid.uuid4().hex}.part"
+        method = place_file(path, temp_path)
+        return self._register_video(temp_path, size, sha256, method, sample)
+    
+    def abort_upload(self, upload_id):
+        """Discard an unfinished upload"""
+        try:
+            upload = self._uploads.pop(upload_id, None)
+            if upload:
+                with upload['lock']:
+                    upload['file'].close()
+                    os.remove(upload['path'])
+            return {'success': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
     def process_video(self, video_id):
-        """Process video to extract pose keypoints"""
+        """Queue a video for pose keypoint extraction"""
         try:
-            # Simulate pose estimation processing
-            # In production, this would use MediaPipe, OpenPose, or similar
-            import time
-            time.sleep(2)  # Simulate processing
-            
-            video = next((v for v in self.videos if v['id'] == video_id), None)
+            video = self.registry.get_video(video_id)
             if not video:
                 return {'success': False, 'error': 'Video not found'}
             
-            # Generate sample keypoints data
-            # Each frame has 17 keypoints (typical skeleton)
-            keypoints_data = {
-                'video_id': video_id,
-                'frames': 150,  # Example frame count
-                'fps': 30,
-                'keypoints': self._generate_sample_keypoints(150)
-            }
+            # Identical content uploaded again resolves to the same entry,
+            # so reuse keypoints that were already extracted for it
+            keypoints_file = video.get('keypoints_file')
+            if keypoints_file and os.path.exists(keypoints_file):
+                return {'success': True, 'job': None, 'video': video}
+            
+            # A job that is still queued or running is reused
+            current = self.jobs.status(video['job_id']) if video.get('job_id') else None
+            if current and current['status'] in ACTIVE_STATUSES:
+                return {'success': True, 'job': current, 'video': video}
             
-            # Save keypoints
-            keypoints_file = self.output_dir / f"keypoints_{video_id}.json"
-            with open(keypoints_file, 'w') as f:
-                json.dump(keypoints_data, f)
+            job = self.jobs.enqueue(
+                video_id,
+                video['path'],
+                self.output_dir / f"keypoints_{video_id}{BINARY_EXTENSION}"
+            )
+            self.registry.update_video(video_id, job_id=job['id'])
+            video['job_id'] = job['id']
+            return {'success': True, 'job': job, 'video': video}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def process_all(self):
+        """Queue every video that has not been processed or queued yet"""
+        try:
+            jobs = []
+            for video in self.registry.list_videos(status='uploaded'):
+                current = self.jobs.status(video['job_id']) if video.get('job_id') else None
+                if current and current['status'] in ACTIVE_STATUSES:
+                    continue
+                result = self.process_video(video['id'])
+                if result['success'] and result['job']:
+                    jobs.append(result['job'])
+            return {'success': True, 'jobs': jobs}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_jobs(self):
+        """Get the state and progress of every processing job"""
+        return {'success': True, 'jobs': self.jobs.list()}
+    
+    def get_job(self, job_id):
+        """Get the state and progress of one processing job"""
+        job = self.jobs.status(job_id)
+        if job is None:
+            return {'success': False, 'error': 'Job not found'}
+        return {'success': True, 'job': job}
+    
+    def cancel_job(self, job_id):
+        """Cancel a queued or running job"""
+        return {'success': self.jobs.cancel(job_id)}
+    
+    def retry_job(self, job_id):
+        """Queue a failed or cancelled job again"""
+        return {'success': self.jobs.retry(job_id)}
+    
+    def get_frames(self, video_id, start=0, count=MAX_FRAMES_PER_REQUEST):
+        """Get a range of at most MAX_FRAMES_PER_REQUEST frames of one
+        processed video as [frame][joint][x, y, z, confidence] lists"""
+        try:
+            video = self.registry.get_video(video_id)
+            if not video or not video.get('keypoints_file'):
+                return {'success': False, 'error': 'Video not processed'}
             
-            self.training_data.append(keypoints_data)
-            video['status'] = 'processed'
-            video['keypoints_file'] = str(keypoints_file)
+            path = video['keypoints_file']
+            mtime = os.path.getmtime(path)
+            cached = self._frames_cache
+            if cached and cached[0] == path and cached[1] == mtime:
+                clip = cached[2]
+            else:
+                clip = load_clip(path)
+                self._frames_cache = (path, mtime, clip)
             
-            return {'success': True, 'data': keypoints_data}
+            start = min(max(int(start), 0), len(clip))
+            count = min(max(int(count), 0), MAX_FRAMES_PER_REQUEST)
+            window = clip[start:start + count].data
+            return {
+                'success': True,
+                'video_id': video_id,
+                'start': start,
+                'total': len(clip),
+                'joints': clip.joints,
+                'frames': window.astype(np.float64).round(5).tolist()
+            }
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _generate_sample_keypoints(self, num_frames):
-        """Generate sample keypoint data for demonstration"""
-        import random
-        
-        keypoint_names = [
-            'nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear',
-            'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
-            'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
-            'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
-        ]
-        
-        frames = []
-        for frame in range(num_frames):
-            keypoints = {}
-            for i, name in enumerate(keypoint_names):
-                # Generate smooth movement
-                t = frame / num_frames * 2 * 3.14159
-                keypoints[name] = {
-                    'x': 0.5 + 0.3 * (i / len(keypoint_names)) * random.uniform(0.8, 1.2),
-                    'y': 0.5 + 0.2 * random.uniform(0.9, 1.1) + 0.1 * (i % 3),
-                    'z': 0.5 + 0.1 * random.uniform(0.95, 1.05),
-                    'confidence': random.uniform(0.85, 0.99)
-                }
-            frames.append(keypoints)
+    def _on_job_complete(self, job):
+        """Record the keypoints written by a finished job"""
+        clip = load_clip(job['keypoints_path'])
+        
+        self.registry.add_artifact(
+            job['video_id'],
+            'keypoints',
+            job['keypoints_path'],
+            run_id=job['id'],
+            frames=len(clip),
+            fps=clip.fps,
+            **confidence_stats(clip)
+        )
+        self.registry.update_video(
+            job['video_id'], status='processed', keypoints_file=job['keypoints_path']
+        )
+    
+    def generate_synthetic_dataset(self, num_videos, num_frames, seed=0):
+        """Fill the store with seeded synthetic clips, for load testing.
+        
+        Clips are written as binary keypoint files and registered as
+        processed videos in one transaction; clips already generated with
+        the same seed and length are skipped.
+        """
+        try:
+            num_videos, num_frames, seed = int(num_videos), int(num_frames), int(seed)
+            added = 0
+            with self.registry.bulk():
+                for clip in iter_sequences(num_videos, num_frames, seed):
+                    key = f"synthetic:{seed}:{clip.video_id}:{num_frames}:{clip.fps}"
+                    sha256 = hashlib.sha256(key.encode('utf-8')).hexdigest()
+                    if self.registry.find_video_by_hash(sha256):
+                        continue
+                    
+                    video = self.registry.add_video(
+                        f"synthetic_{seed}_{clip.video_id}", '', 0, sha256, 'synthetic'
+                    )
+                    clip.video_id = video['id']
+                    path = self.output_dir / f"keypoints_{video['id']}{BINARY_EXTENSION}"
+                    clip.save(path)
+                    self.registry.add_artifact(
+                        video['id'], 'keypoints', path,
+                        frames=len(clip), fps=clip.fps, **confidence_stats(clip)
+                    )
+                    self.registry.update_video(video['id'], status='processed', keypoints_file=str(path))
+                    added += 1
+            return {'success': True, 'videos': added, 'frames': added * num_frames}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def shutdown(self):
+        """Stop background workers"""
+        self.jobs.shutdown()
+        self.registry.close()
+    
+    def _iter_training_data(self, reports=None):
+        """Keypoints of every processed video, loaded one file at a time"""
+        # Legacy JSON files are streamed too, rather than parsed whole
+        for clip in self._iter_sequences(reports):
+            data = clip.to_dict()
+            if reports is not None:
+                # Cleaned clips skip frames; these are the original numbers
+                data['frame_numbers'] = kept_frames(reports[clip.video_id]).tolist()
+            yield data
+    
+    def _iter_sequences(self, reports=None):
+        """PoseSequence of every processed video, loaded one at a time.
+        
+        With a `reports` dict, clips are cleaned first: the quality report
+        of every clip is stored in it, and clips that fail are skipped.
+        """
+        for artifact in self.registry.list_artifacts('keypoints'):
+            clip = load_clip(artifact['path'])
+            clip.video_id = artifact['video_id']
+            if reports is not None:
+                clip, reports[clip.video_id] = clean_sequence(clip)
+                if not reports[clip.video_id]['passed']:
+                    continue
+            yield clip
+    
+    def _iter_clips(self, reports=None):
+        """`(video_id, frames)` arrays of every processed video, one at a
+        time; cleaned clips come with the original numbers of their frames"""
+        for clip in self._iter_sequences(reports):
+            if reports is None:
+                yield clip.video_id, clip.data
+            else:
+                yield clip.video_id, clip.data, kept_frames(reports[clip.video_id])
+    
+    def _iter_normalized(self, cache):
+        """Body-normalized PoseSequence of every processed video, reusing
+        results cached by earlier builds"""
+        for clip in self._iter_sequences():
+            data = cache.get(clip.data, clip.joints)
+            yield PoseSequence(data, clip.joints, clip.fps, clip.video_id)
+    
+    def build_dataset(self, normalized=False):
+        """Pack every processed clip into sharded files with an offset
+        index, for random-access sampling during training.
+        
+        With `normalized`, clips are made root-relative, torso-scaled and
+        facing-aligned first, into a separate dataset.
+        """
+        try:
+            if normalized:
+                dataset_dir = self.output_dir / 'dataset_normalized'
+                cache = PreprocessCache(self.output_dir / 'preprocess_cache')
+                clips = self._iter_normalized(cache)
+            else:
+                dataset_dir = self.output_dir / 'dataset'
+                cache = None
+                clips = self._iter_sequences()
+            metadata = write_dataset(str(dataset_dir), clips)
+            result = {
+                'success': True,
+                'path': str(dataset_dir),
+                'videos': metadata['videos'],
+                'frames': metadata['frames'],
+                'shards': len(metadata['shards'])
+            }
+            if cache is not None:
+                result['cached'] = cache.hits
+            return result
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_robots(self):
+        """Robot morphologies available for retargeting"""
+        try:
+            robots = []
+            for name in available_robots():
+                robot = load_robot(name)
+                robots.append({
+                    'id': name,
+                    'name': robot.name,
+                    'description': robot.description,
+                    'dofs': robot.dof_names
+                })
+            return {'success': True, 'robots': robots}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def retarget_training_data(self, robot_name):
+        """Solve robot joint angles for every processed clip.
+        
+        Angles of each clip are written to retargeted/<robot>/ and recorded
+        as an `angles:<robot>` artifact.
+        """
+        try:
+            if robot_name not in available_robots():
+                return {'success': False, 'error': f'Unknown robot: {robot_name}'}
+            robot = load_robot(robot_name)
+            angles_dir = self.output_dir / 'retargeted' / robot_name
+            angles_dir.mkdir(parents=True, exist_ok=True)
+            kind = f'angles:{robot_name}'
+            videos = frames = 0
+            start = time.perf_counter()
+            with self.registry.bulk():
+                for clip, angles, confidence in retarget_clips(robot, self._iter_sequences()):
+                    path = angles_dir / f'angles_{clip.video_id}.npz'
+                    save_angles(path, robot, angles, confidence, clip.fps, clip.video_id)
+                    self.registry.add_artifact(clip.video_id, kind, path, frames=len(clip), fps=clip.fps)
+                    videos += 1
+                    frames += len(clip)
+            elapsed = time.perf_counter() - start
+            return {
+                'success': True,
+                'robot': robot.name,
+                'path': str(angles_dir),
+                'videos': videos,
+                'frames': frames,
+                'dofs': len(robot.dof_names),
+                'frames_per_second': frames / elapsed if elapsed else None
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_videos(self, offset=0, limit=PAGE_SIZE):
+        """Get one page of uploaded videos and the total count"""
+        try:
+            offset, limit = page_bounds(offset, limit)
+            return {
+                'success': True,
+                'videos': self.registry.list_videos(offset=offset, limit=limit),
+                'offset': offset,
+                'total': self.registry.count_videos()
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_training_data(self, offset=0, limit=PAGE_SIZE):
+        """Get one page of processed clip summaries and dataset totals.
         
-        return frames
+        Frame data is not included; fetch it with get_frames.
+        """
+        try:
+            offset, limit = page_bounds(offset, limit)
+            summaries = [
+                {
+                    'video_id': artifact['video_id'],
+                    'frames': artifact['frames'],
+                    'fps': artifact['fps'],
+                    'mean_confidence': artifact['mean_confidence'],
+                    'min_confidence': artifact['min_confidence'],
+                    'low_confidence': artifact['low_confidence']
+                }
+                for artifact in self.registry.list_artifacts('keypoints', offset, limit)
+            ]
+            return {
+                'success': True,
+                'data': summaries,
+                'offset': offset,
+                'totals': self.registry.artifact_totals('keypoints')
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
     
-    def get_videos(self):
-        """Get list of uploaded videos"""
-        return {'success': True, 'videos': self.videos}
+    def _export_incremental(self, format_type, reports=None):
+        """Update the part-file export of `format_type`, writing only clips
+        whose keypoints changed since the last export"""
+        artifacts = {artifact['video_id']: artifact for artifact in self.registry.list_artifacts('keypoints')}
+        
+        def load(video_ids):
+            for video_id in video_ids:
+                clip = load_clip(artifacts[video_id]['path'])
+                if reports is None:
+                    yield video_id, clip.data
+                    continue
+                # Failed clips are left out, and checked again next time
+                data, reports[video_id] = clean_clip(clip.data, clip.joints, clip.fps)
+                if reports[video_id]['passed']:
+                    yield video_id, data, kept_frames(reports[video_id])
+        
+        export_dir = self.output_dir / f'training_data_export_{format_type}'
+        # A new keypoints artifact is a new version of the clip, and so is
+        # a change to cleanup
+        versions = {
+            video_id: artifact['id'] if reports is None else f"{artifact['id']}:quality{QUALITY_VERSION}"
+            for video_id, artifact in artifacts.items()
+        }
+        summary = export_incremental(str(export_dir), format_type, versions, load)
+        return {'success': True, 'file': str(export_dir), 'rows': summary['written_rows'], **summary}
     
-    def get_training_data(self):
-        """Get processed training data"""
-        return {'success': True, 'data': self.training_data}
+    def _write_quality_report(self, reports, export_dir=None):
+        """Save the cleanup reports of an export; returns their summary.
+        
+        An incremental export in `export_dir` only cleans the clips it
+        writes, so its report is kept next to its manifest and keeps the
+        earlier reports of the clips still exported unchanged.
+        """
+        path = self.output_dir / 'quality_report.json'
+        if export_dir is not None:
+            path = export_dir / 'quality_report.json'
+            try:
+                with open(path, 'r') as f:
+                    earlier = json.load(f)['clips']
+            except FileNotFoundError:
+                earlier = {}
+            # Failed clips are cleaned again every run, so what is not in
+            # `reports` or the manifest was removed
+            exported = read_manifest(str(export_dir))['videos']
+            reports = {
+                **{int(video_id): earlier[video_id] for video_id in exported
+                   if video_id in earlier and int(video_id) not in reports},
+                **reports
+            }
+            reports = dict(sorted(reports.items()))
+        summary = summarize(reports)
+        with open(path, 'w') as f:
+            json.dump({'summary': summary, 'clips': reports}, f, indent=2)
+        return summary
     
-    def export_training_data(self, format_type):
-        """Export training data in specified format"""
+    def export_training_data(self, format_type, incremental=False, clean=True):
+        """Export training data in specified format.
+        
+        With `incremental`, the export is a directory of part files plus
+        a manifest, and only new or changed clips are written. With
+        `clean`, clips are scored and cleaned first (see clip_quality):
+        unusable segments and failed clips are left out, and the reports
+        are saved to quality_report.json (in the export directory of an
+        incremental export). The result then lists the `excluded` video
+        ids and the numbers of kept and dropped frames.
+        """
         try:
-            if format_type == 'json':
+            if format_type != 'json' and format_type not in EXTENSIONS:
+                return {'success': False, 'error': f'Unknown export format: {format_type}'}
+            reports = {} if clean else None
+            export_dir = None
+            
+            if incremental and format_type in EXTENSIONS:
+                result = self._export_incremental(format_type, reports)
+                export_dir = Path(result['file'])
+            elif format_type == 'json':
+                # The legacy nested schema, streamed one video at a time
                 export_file = self.output_dir / 'training_data_export.json'
-                with open(export_file, 'w') as f:
-                    json.dump(self.training_data, f, indent=2)
-            elif format_type == 'csv':
-                export_file = self.output_dir / 'training_data_export.csv'
-                # Convert to CSV format
-                with open(export_file, 'w') as f:
-                    f.write('frame,keypoint,x,y,z,confidence\n')
-                    for data in self.training_data:
-                        for frame_idx, frame in enumerate(data['keypoints']):
-                            for kp_name, kp_data in frame.items():
-                                f.write(f"{frame_idx},{kp_name},{kp_data['x']},{kp_data['y']},{kp_data['z']},{kp_data['confidence']}\n")
-            
-            return {'success': True, 'file': str(export_file)}
+                with open(export_file, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+                    f.write('[')
+                    for i, data in enumerate(self._iter_training_data(reports)):
+                        if i:
+                            f.write(',\n')
+                        json.dump(data, f)
+                    f.write(']\n')
+                result = {'success': True, 'file': str(export_file)}
+            else:
+                # One typed row per video, frame and joint, written in bounded batches
+                export_file = self.output_dir / f'training_data_export{EXTENSIONS[format_type]}'
+                rows = export_rows(export_file, format_type, self._iter_clips(reports))
+                result = {'success': True, 'file': str(export_file), 'rows': rows}
+            
+            if clean:
+                summary = self._write_quality_report(reports, export_dir)
+                result['quality'] = summary
+                result['excluded'] = summary['failed']
+                result['kept_frames'] = summary['kept_frames']
+                result['dropped_frames'] = summary['dropped_frames']
+            return result
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
@@ -228,6 +830,34 @@ def create_html():
         .btn-secondary {
             background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%);
         }
+        .robot-select {
+            padding: 10px;
+            border: 2px solid #667eea;
+            border-radius: 8px;
+            font-size: 14px;
+            margin: 5px;
+        }
+        .upload-progress {
+            margin-top: 15px;
+        }
+        .progress-item {
+            margin-bottom: 10px;
+            font-size: 13px;
+            color: #333;
+        }
+        .progress {
+            height: 8px;
+            background: #e9ecef;
+            border-radius: 4px;
+            overflow: hidden;
+            margin-top: 4px;
+        }
+        .progress-bar {
+            height: 100%;
+            width: 0;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            transition: width 0.2s;
+        }
         .video-list {
             max-height: 300px;
             overflow-y: auto;
@@ -264,10 +894,17 @@ def create_html():
             background: #d4edda;
             color: #155724;
         }
-        .status-processing {
+        .status-processing, .status-queued {
             background: #d1ecf1;
             color: #0c5460;
         }
+        .status-failed {
+            background: #f8d7da;
+            color: #721c24;
+        }
+        .video-item .progress {
+            width: 160px;
+        }
         .canvas-container {
             background: #1a1a2e;
             border-radius: 12px;
@@ -363,10 +1000,19 @@ def create_html():
                     </div>
                 </div>
                 
+                <div class="controls">
+                    <button class="btn" onclick="ingestLocalVideos()">📂 Add from disk (no copy)</button>
+                </div>
+                
+                <div class="upload-progress" id="uploadProgress"></div>
+                
                 <div id="alertContainer"></div>
                 
                 <div style="margin-top: 20px;">
-                    <h3 style="font-size: 16px; margin-bottom: 10px; color: #333;">Uploaded Videos</h3>
+                    <h3 style="font-size: 16px; margin-bottom: 10px; color: #333;">
+                        Uploaded Videos
+                        <button class="btn" style="float: right; margin-top: -8px;" onclick="processAll()">⚙ Process all</button>
+                    </h3>
                     <div class="video-list" id="videoList">
                         <div style="text-align: center; color: #999; padding: 20px;">
                             No videos uploaded yet
@@ -395,6 +1041,14 @@ def create_html():
                 
                 <div style="margin-top: 25px;">
                     <h3 style="font-size: 16px; margin-bottom: 15px; color: #333;">Export Training Data</h3>
+                    <label style="font-size: 14px; color: #555;">
+                        <input type="checkbox" id="incrementalExport">
+                        Incremental (only new or changed clips; not for JSON)
+                    </label>
+                    <label style="font-size: 14px; color: #555; margin-left: 20px;">
+                        <input type="checkbox" id="cleanExport" checked>
+                        Clean up clips (fill short gaps, drop unusable segments)
+                    </label>
                     <div class="controls">
                         <button class="btn btn-secondary" onclick="exportData('json')">
                             Export as JSON
@@ -402,6 +1056,34 @@ def create_html():
                         <button class="btn btn-secondary" onclick="exportData('csv')">
                             Export as CSV
                         </button>
+                        <button class="btn btn-secondary" onclick="exportData('jsonl')">
+                            Export as JSON Lines
+                        </button>
+                        <button class="btn btn-secondary" onclick="exportData('parquet')">
+                            Export as Parquet
+                        </button>
+                        <button class="btn btn-secondary" onclick="exportData('arrow')">
+                            Export as Arrow
+                        </button>
+                        <button class="btn btn-secondary" onclick="exportData('npz')">
+                            Export as NPZ
+                        </button>
+                        <button class="btn" onclick="buildDataset(false)">
+                            Build sharded dataset
+                        </button>
+                        <button class="btn" onclick="buildDataset(true)">
+                            Build normalized dataset
+                        </button>
+                    </div>
+                </div>
+                
+                <div style="margin-top: 25px;">
+                    <h3 style="font-size: 16px; margin-bottom: 15px; color: #333;">Retarget to Robot</h3>
+                    <div class="controls">
+                        <select id="robotSelect" class="robot-select"></select>
+                        <button class="btn" onclick="retargetData()">
+                            Solve joint angles
+                        </button>
                     </div>
                 </div>
             </div>
@@ -423,8 +1105,12 @@ def create_html():
     </div>
 
     <script>
+        // Videos are listed a page at a time; stats come from server totals
+        const VIDEO_PAGE_SIZE = 100;
         let videos = [];
-        let trainingData = [];
+        let videosLoaded = 0;
+        let videosTotal = 0;
+        let trainingTotals = { videos: 0, frames: 0 };
         let animationFrame = 0;
         let isPlaying = false;
         let currentView = 0;
@@ -449,68 +1135,250 @@ def create_html():
         });
         
         document.getElementById('videoInput').addEventListener('change', async (e) => {
-            const files = e.target.files;
-            for (let file of files) {
-                await uploadVideo(file);
-            }
+            const files = Array.from(e.target.files);
             e.target.value = '';
+            await uploadFiles(files);
         });
         
-        async function uploadVideo(file) {
-            showAlert('Uploading ' + file.name + '...', 'info');
-            
-            const reader = new FileReader();
-            reader.onload = async (e) => {
-                try {
-                    const result = await pywebview.api.upload_video(e.target.result);
-                    if (result.success) {
-                        videos.push(result.video);
-                        showAlert('Video uploaded successfully!', 'success');
-                        updateVideoList();
-                        updateStats();
-                    } else {
-                        showAlert('Upload failed: ' + result.error, 'error');
+        // Files are sent in bounded chunks, several uploads at a time
+        const UPLOAD_CONCURRENCY = 3;
+        
+        async function uploadFiles(files) {
+            const queue = files.slice();
+            const workers = [];
+            for (let i = 0; i < Math.min(UPLOAD_CONCURRENCY, queue.length); i++) {
+                workers.push((async () => {
+                    while (queue.length > 0) {
+                        await uploadVideo(queue.shift());
                     }
-                } catch (error) {
-                    showAlert('Upload error: ' + error, 'error');
+                })());
+            }
+            await Promise.all(workers);
+        }
+        
+        function bytesToBase64(buffer) {
+            const bytes = new Uint8Array(buffer);
+            let binary = '';
+            for (let i = 0; i < bytes.length; i += 0x8000) {
+                binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+            }
+            return btoa(binary);
+        }
+        
+        function createProgressItem(name) {
+            const item = document.createElement('div');
+            item.className = 'progress-item';
+            const label = document.createElement('div');
+            label.textContent = name;
+            const progress = document.createElement('div');
+            progress.className = 'progress';
+            const bar = document.createElement('div');
+            bar.className = 'progress-bar';
+            progress.appendChild(bar);
+            item.appendChild(label);
+            item.appendChild(progress);
+            document.getElementById('uploadProgress').appendChild(item);
+            return { item, bar };
+        }
+        
+        async function uploadVideo(file) {
+            const progress = createProgressItem(file.name);
+            let uploadId = null;
+            
+            try {
+                const begin = await pywebview.api.begin_upload(file.name, file.size);
+                if (!begin.success) throw new Error(begin.error);
+                uploadId = begin.upload_id;
+                
+                for (let offset = 0; offset < file.size; offset += begin.chunk_size) {
+                    const buffer = await file.slice(offset, offset + begin.chunk_size).arrayBuffer();
+                    const chunk = await pywebview.api.append_upload_chunk(uploadId, offset, bytesToBase64(buffer));
+                    if (!chunk.success) throw new Error(chunk.error);
+                    progress.bar.style.width = (chunk.received / file.size * 100).toFixed(1) + '%';
+                }
+                
+                const result = await pywebview.api.commit_upload(uploadId);
+                if (!result.success) throw new Error(result.error);
+                
+                progress.bar.style.width = '100%';
+                if (result.video.duplicate) {
+                    showAlert(`${file.name} is already stored as ${result.video.filename}`, 'success');
+                } else {
+                    videos.push(result.video);
+                    videosTotal++;
+                    showAlert(file.name + ' uploaded successfully!', 'success');
+                }
+                updateVideoList();
+                updateStats();
+            } catch (error) {
+                if (uploadId) pywebview.api.abort_upload(uploadId);
+                showAlert('Upload failed: ' + (error.message || error), 'error');
+            } finally {
+                setTimeout(() => progress.item.remove(), 1000);
+            }
+        }
+        
+        async function ingestLocalVideos() {
+            try {
+                const result = await pywebview.api.ingest_local_videos();
+                if (!result.success) {
+                    showAlert('Ingest failed: ' + result.error, 'error');
+                    return;
                 }
-            };
-            reader.readAsDataURL(file);
+                result.videos.forEach(video => {
+                    if (video.duplicate) return;
+                    videos.push(video);
+                    videosTotal++;
+                });
+                updateVideoList();
+                updateStats();
+                if (result.errors.length > 0) {
+                    showAlert('Some files could not be added: ' + result.errors.join('; '), 'error');
+                } else if (result.videos.length > 0) {
+                    showAlert(`Added ${result.videos.length} video(s) from disk`, 'success');
+                }
+            } catch (error) {
+                showAlert('Ingest error: ' + error, 'error');
+            }
+        }
+        
+        // Processing runs in background jobs; the page polls their state
+        const JOB_POLL_INTERVAL = 500;
+        let jobPollTimer = null;
+        const jobsByVideo = {};
+        
+        function trackJob(job) {
+            jobsByVideo[job.video_id] = job;
+            const video = videos.find(v => v.id === job.video_id);
+            if (video) video.status = jobVideoStatus(job);
+            if (!jobPollTimer) {
+                jobPollTimer = setInterval(refreshJobs, JOB_POLL_INTERVAL);
+            }
+        }
+        
+        function jobVideoStatus(job) {
+            return {
+                queued: 'queued',
+                running: 'processing',
+                done: 'processed',
+                failed: 'failed',
+                cancelled: 'uploaded'
+            }[job.status];
         }
         
         async function processVideo(videoId) {
             const video = videos.find(v => v.id === videoId);
             if (!video) return;
             
-            video.status = 'processing';
-            updateVideoList();
-            showAlert('Processing video...', 'info');
-            
             try {
                 const result = await pywebview.api.process_video(videoId);
-                if (result.success) {
-                    video.status = 'processed';
-                    trainingData.push(result.data);
-                    showAlert('Video processed successfully!', 'success');
-                    updateVideoList();
-                    updateStats();
-                    
-                    // Initialize robot with first keypoints
-                    if (trainingData.length === 1) {
-                        initRobot(result.data);
-                    }
+                if (!result.success) {
+                    showAlert('Processing failed: ' + result.error, 'error');
+                } else if (result.job) {
+                    trackJob(result.job);
                 } else {
-                    video.status = 'uploaded';
+                    // Already processed earlier, e.g. an identical upload
+                    await loadProcessedVideo(video);
+                }
+            } catch (error) {
+                showAlert('Processing error: ' + error, 'error');
+            }
+            updateVideoList();
+        }
+        
+        async function processAll() {
+            try {
+                const result = await pywebview.api.process_all();
+                if (!result.success) {
                     showAlert('Processing failed: ' + result.error, 'error');
-                    updateVideoList();
+                    return;
                 }
+                result.jobs.forEach(trackJob);
+                showAlert(`Queued ${result.jobs.length} video(s) for processing`, 'success');
+                updateVideoList();
             } catch (error) {
-                video.status = 'uploaded';
                 showAlert('Processing error: ' + error, 'error');
+            }
+        }
+        
+        async function cancelJob(videoId) {
+            const job = jobsByVideo[videoId];
+            if (job) await pywebview.api.cancel_job(job.id);
+            refreshJobs();
+        }
+        
+        async function retryJob(videoId) {
+            const job = jobsByVideo[videoId];
+            if (job && (await pywebview.api.retry_job(job.id)).success) {
+                job.status = 'queued';
+                trackJob(job);
                 updateVideoList();
             }
         }
         
+        async function refreshJobs() {
+            const result = await pywebview.api.get_jobs();
+            let active = false;
+            
+            for (const job of result.jobs) {
+                const tracked = jobsByVideo[job.video_id];
+                if (!tracked || tracked.id !== job.id) continue;
+                jobsByVideo[job.video_id] = job;
+                
+                const video = videos.find(v => v.id === job.video_id);
+                if (!video) continue;
+                const wasProcessed = video.status === 'processed';
+                video.status = jobVideoStatus(job);
+                if (job.status === 'queued' || job.status === 'running') active = true;
+                
+                if (job.status === 'done' && !wasProcessed) {
+                    await loadProcessedVideo(video);
+                } else if (job.status === 'failed' && tracked.status !== 'failed') {
+                    showAlert(`Processing ${video.filename} failed: ${job.error}`, 'error');
+                }
+            }
+            
+            if (!active && jobPollTimer) {
+                clearInterval(jobPollTimer);
+                jobPollTimer = null;
+            }
+            updateVideoList();
+        }
+        
+        async function loadProcessedVideo(video) {
+            video.status = 'processed';
+            showAlert(`${video.filename} processed successfully!`, 'success');
+            await refreshTotals();
+            
+            // Initialize robot with the first processed video
+            if (!robot) {
+                initRobot(video.id);
+            }
+        }
+        
+        async function refreshTotals() {
+            const result = await pywebview.api.get_training_data(0, 1);
+            if (result.success) trainingTotals = result.totals;
+            updateStats();
+        }
+        
+        function videoActions(video) {
+            const job = jobsByVideo[video.id];
+            switch (video.status) {
+                case 'uploaded':
+                    return `<button class="btn" onclick="processVideo(${video.id})">Process</button>`;
+                case 'queued':
+                    return `<button class="btn" onclick="cancelJob(${video.id})">Cancel</button>`;
+                case 'processing':
+                    return `<div class="progress"><div class="progress-bar" style="width: ${((job ? job.progress : 0) * 100).toFixed(0)}%"></div></div>
+                            <button class="btn" onclick="cancelJob(${video.id})">Cancel</button>`;
+                case 'failed':
+                    return `<button class="btn" onclick="retryJob(${video.id})">Retry</button>`;
+                default:
+                    return `<span style="color: #28a745; font-weight: 600;">✓ Ready</span>`;
+            }
+        }
+        
         function updateVideoList() {
             const list = document.getElementById('videoList');
             if (videos.length === 0) {
@@ -518,6 +1386,9 @@ def create_html():
                 return;
             }
             
+            const more = videos.length < videosTotal
+                ? `<button class="btn" style="width: 100%; margin-top: 10px;" onclick="loadMoreVideos()">Show more (${videosTotal - videos.length} left)</button>`
+                : '';
             list.innerHTML = videos.map(video => `
                 <div class="video-item">
                     <div class="video-info">
@@ -525,20 +1396,31 @@ def create_html():
                         <span class="video-status status-${video.status}">${video.status}</span>
                     </div>
                     <div>
-                        ${video.status === 'uploaded' ? 
-                            `<button class="btn" onclick="processVideo(${video.id})">Process</button>` :
-                            video.status === 'processing' ?
-                            `<button class="btn" disabled><span class="loading"></span></button>` :
-                            `<span style="color: #28a745; font-weight: 600;">✓ Ready</span>`
-                        }
+                        ${videoActions(video)}
                     </div>
                 </div>
-            `).join('');
+            `).join('') + more;
+        }
+        
+        async function loadMoreVideos() {
+            const result = await pywebview.api.get_videos(videosLoaded, VIDEO_PAGE_SIZE);
+            if (!result.success) {
+                showAlert('Could not load videos: ' + result.error, 'error');
+                return;
+            }
+            videosLoaded += result.videos.length;
+            videosTotal = result.total;
+            // Videos added during this session may already be listed
+            result.videos.forEach(video => {
+                if (!videos.some(v => v.id === video.id)) videos.push(video);
+            });
+            updateVideoList();
+            updateStats();
         }
         
         function updateStats() {
-            document.getElementById('statVideos').textContent = videos.length;
-            const totalFrames = trainingData.reduce((sum, data) => sum + data.frames, 0);
+            document.getElementById('statVideos').textContent = videosTotal;
+            const totalFrames = trainingTotals.frames;
             document.getElementById('statFrames').textContent = totalFrames;
             const totalKeypoints = totalFrames * 17; // 17 keypoints per frame
             document.getElementById('statKeypoints').textContent = totalKeypoints.toLocaleString();
@@ -559,9 +1441,25 @@ def create_html():
         
         async function exportData(format) {
             try {
-                const result = await pywebview.api.export_training_data(format);
+                const incremental = document.getElementById('incrementalExport').checked;
+                const clean = document.getElementById('cleanExport').checked;
+                const result = await pywebview.api.export_training_data(format, incremental, clean);
                 if (result.success) {
-                    showAlert(`Data exported to: ${result.file}`, 'success');
+                    const rows = result.rows !== undefined ? ` (${result.rows.toLocaleString()} rows)` : '';
+                    const parts = result.parts !== undefined
+                        ? `, ${result.written_videos} new or changed clip(s), ${result.parts} part(s)`
+                        : '';
+                    let quality = '';
+                    if (result.quality) {
+                        quality = `; ${result.quality.passed} of ${result.quality.clips} clip(s) passed quality checks, ` +
+                            `${result.kept_frames.toLocaleString()} frame(s) kept, ${result.dropped_frames.toLocaleString()} dropped`;
+                        if (result.excluded.length) {
+                            const shown = result.excluded.slice(0, 20).join(', ');
+                            const more = result.excluded.length > 20 ? ` and ${result.excluded.length - 20} more` : '';
+                            quality += `; excluded video(s): ${shown}${more} (see quality_report.json)`;
+                        }
+                    }
+                    showAlert(`Data exported to: ${result.file}${rows}${parts}${quality}`, 'success');
                 } else {
                     showAlert('Export failed: ' + result.error, 'error');
                 }
@@ -570,17 +1468,96 @@ def create_html():
             }
         }
         
-        // Robot visualization
-        function initRobot(data) {
-            robot = data;
+        async function buildDataset(normalized) {
+            try {
+                const result = await pywebview.api.build_dataset(normalized);
+                if (result.success) {
+                    const cached = result.cached !== undefined ? `, ${result.cached} clip(s) from cache` : '';
+                    showAlert(`Dataset built in ${result.path}: ${result.videos} videos, ${result.frames.toLocaleString()} frames in ${result.shards} shard(s)${cached}`, 'success');
+                } else {
+                    showAlert('Dataset build failed: ' + result.error, 'error');
+                }
+            } catch (error) {
+                showAlert('Dataset build error: ' + error, 'error');
+            }
+        }
+        
+        async function loadRobots() {
+            const result = await pywebview.api.get_robots();
+            if (!result.success) return;
+            const select = document.getElementById('robotSelect');
+            select.innerHTML = result.robots.map(robot =>
+                `<option value="${robot.id}" title="${robot.description}">${robot.name} (${robot.dofs.length} DoF)</option>`
+            ).join('');
+        }
+        
+        async function retargetData() {
+            const robotName = document.getElementById('robotSelect').value;
+            if (!robotName) return;
+            try {
+                const result = await pywebview.api.retarget_training_data(robotName);
+                if (result.success) {
+                    const speed = result.frames_per_second ? `, ${Math.round(result.frames_per_second).toLocaleString()} frames/s` : '';
+                    showAlert(`${result.robot}: ${result.dofs} joint angles solved for ${result.videos} videos, ${result.frames.toLocaleString()} frames${speed}`, 'success');
+                } else {
+                    showAlert('Retargeting failed: ' + result.error, 'error');
+                }
+            } catch (error) {
+                showAlert('Retargeting error: ' + error, 'error');
+            }
+        }
+        
+        // Robot visualization; frames are fetched in bounded windows while
+        // playing, with the next window requested halfway through the current one
+        function initRobot(videoId) {
+            robot = { videoId, total: 0, joints: [], window: null, next: null };
             animationFrame = 0;
-            drawRobot();
+            requestRobotWindow(0).then(drawRobot);
         }
         
-        function drawRobot() {
-            ctx.clearRect(0, 0, canvas.width, canvas.height);
+        function requestRobotWindow(start) {
+            const current = robot;
+            const pending = { start, frames: null };
+            current.next = pending;
+            return pywebview.api.get_frames(current.videoId, start).then(result => {
+                if (!result.success) return;
+                current.total = result.total;
+                current.joints = result.joints;
+                pending.start = result.start;
+                pending.frames = result.frames;
+            });
+        }
+        
+        function robotFrame(index) {
+            const inWindow = w => w && w.frames && index >= w.start && index < w.start + w.frames.length;
+            if (!inWindow(robot.window) && inWindow(robot.next)) {
+                robot.window = robot.next;
+                robot.next = null;
+            }
+            const current = robot.window;
+            if (!inWindow(current)) {
+                if (!robot.next || robot.next.start !== index) requestRobotWindow(index).then(drawRobot);
+                return null;
+            }
+            
+            const end = current.start + current.frames.length;
+            if (!robot.next && end < robot.total && index - current.start >= current.frames.length / 2) {
+                requestRobotWindow(end);
+            }
             
-            if (!robot || !robot.keypoints || robot.keypoints.length === 0) {
+            const frame = {};
+            current.frames[index - current.start].forEach((values, j) => {
+                // Undetected joints are stored with zero confidence
+                if (values[3] > 0) {
+                    frame[robot.joints[j]] = { x: values[0], y: values[1], z: values[2], confidence: values[3] };
+                }
+            });
+            return frame;
+        }
+        
+        function drawRobot() {
+            if (!robot || robot.total === 0) {
+                ctx.clearRect(0, 0, canvas.width, canvas.height);
                 // Draw placeholder
                 ctx.fillStyle = '#667eea';
                 ctx.font = '20px sans-serif';
@@ -589,7 +1566,10 @@ def create_html():
                 return;
             }
             
-            const frame = robot.keypoints[animationFrame % robot.keypoints.length];
+            // Keep the last drawn frame while the next window loads
+            const frame = robotFrame(animationFrame % robot.total);
+            if (!frame) return;
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
             const scale = Math.min(canvas.width, canvas.height) * 0.8;
             const offsetX = canvas.width / 2;
             const offsetY = canvas.height / 2;
@@ -647,7 +1627,7 @@ def create_html():
             ctx.fillStyle = '#fff';
             ctx.font = '16px monospace';
             ctx.textAlign = 'left';
-            ctx.fillText(`Frame: ${animationFrame + 1}/${robot.keypoints.length}`, 20, 30);
+            ctx.fillText(`Frame: ${animationFrame + 1}/${robot.total}`, 20, 30);
         }
         
         function playAnimation() {
@@ -674,7 +1654,7 @@ def create_html():
         function animate() {
             if (!isPlaying) return;
             
-            animationFrame = (animationFrame + 1) % robot.keypoints.length;
+            if (robot.total > 0) animationFrame = (animationFrame + 1) % robot.total;
             drawRobot();
             
             setTimeout(() => {
@@ -682,6 +1662,32 @@ def create_html():
             }, 1000 / 30); // 30 FPS
         }
         
+        // Videos and processed keypoints persist across restarts
+        async function loadRegistry() {
+            try {
+                await loadRobots();
+                await loadMoreVideos();
+                
+                const data = await pywebview.api.get_training_data(0, 1);
+                if (data.success) {
+                    trainingTotals = data.totals;
+                    if (data.data.length > 0) initRobot(data.data[0].video_id);
+                }
+                
+                // Resume polling jobs restored from the previous session
+                const jobs = await pywebview.api.get_jobs();
+                jobs.jobs
+                    .filter(job => job.status === 'queued' || job.status === 'running')
+                    .forEach(trackJob);
+            } catch (error) {
+                showAlert('Could not load stored videos: ' + error, 'error');
+            }
+            updateVideoList();
+            updateStats();
+        }
+        
+        window.addEventListener('pywebviewready', loadRegistry);
+        
         // Initial draw
         drawRobot();
     </script>
@@ -693,6 +1699,12 @@ def create_html():
 def main():
     api = RobotTrainingAPI()
     
+    if sys.argv[1:2] == ['--synthetic']:
+        # Fill the store for load testing: --synthetic VIDEOS FRAMES [SEED]
+        print(api.generate_synthetic_dataset(*sys.argv[2:5]))
+        api.shutdown()
+        return
+    
     window = webview.create_window(
         'Gaming to Robot Training Data',
         html=create_html(),
@@ -702,8 +1714,11 @@ def main():
         resizable=True,
         background_color='#667eea'
     )
+    # Needed for native file dialogs; underscored so it isn't exposed to JS
+    api._window = window
     
     webview.start()
+    api.shutdown()
 
 
 if __name__ == '__main__':
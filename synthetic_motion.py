@@ -0,0 +1,205 @@
+"""Seeded synthetic keypoint clips for demos and load testing
+
+Each clip is a figure walking in place with its own gait: per-video
+parameters (gait frequency and phase, limb swing, knee and elbow bend,
+torso lean, heading, drift and body height) drive a small forward
+kinematic chain evaluated for all frames of a batch of videos at once.
+Arms swing against the legs, the body bobs at twice the gait frequency,
+and confidences vary smoothly per joint.
+
+Coordinates follow MediaPipe image capture, like pose_estimation.py: x to
+the right, y down and smaller z closer to the camera. At zero heading the
+figure faces the camera, so its left side is at +x and forward is -z.
+
+Parameters and jitter of video `i` only depend on `(seed, i)`, so a
+dataset is reproducible however it is batched.
+
+    python synthetic_motion.py OUTPUT_DIR VIDEOS FRAMES [SEED]
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from keypoint_format import BINARY_EXTENSION, FIELDS, JOINT_NAMES, PoseSequence
+
+# Frames generated per batch; bounds the size of the temporary arrays
+BATCH_FRAMES = 1 << 18
+
+# Largest positional jitter (uniform), in units of body height
+JITTER = 0.006
+
+# Per-video parameter ranges, drawn uniformly
+PARAMETER_RANGES = {
+    'gait_frequency': (0.6, 1.6),
+    'gait_phase': (0.0, 2 * np.pi),
+    'leg_swing': (0.15, 0.6),
+    'knee_bend': (0.1, 1.0),
+    'arm_swing': (0.1, 0.7),
+    'arm_abduction': (0.05, 0.4),
+    'elbow_bend': (0.1, 0.5),
+    'elbow_swing': (0.0, 0.6),
+    'lean': (-0.05, 0.15),
+    'lean_swing': (0.0, 0.08),
+    'heading': (-0.8, 0.8),
+    'turn': (0.0, 0.6),
+    'turn_frequency': (0.02, 0.1),
+    'x': (0.35, 0.65),
+    'drift': (0.0, 0.12),
+    'drift_frequency': (0.02, 0.1),
+    'y': (0.55, 0.65),
+    'bob': (0.0, 0.015),
+    'height': (0.4, 0.6),
+    'confidence': (0.85, 0.97),
+    'confidence_frequency': (0.05, 0.5)
+}
+_LOW = np.array([low for low, _ in PARAMETER_RANGES.values()])
+_HIGH = np.array([high for _, high in PARAMETER_RANGES.values()])
+
+# Segment lengths as fractions of body height
+TORSO = 0.30
+HEAD = 0.10
+SHOULDER_HALF_WIDTH = 0.10
+HIP_HALF_WIDTH = 0.06
+UPPER_ARM = 0.17
+FOREARM = 0.15
+THIGH = 0.24
+SHIN = 0.24
+# Sideways spread of the legs, in radians
+LEG_ABDUCTION = 0.03
+
+# z of the figure's forward direction: facing the camera is towards it
+FORWARD = -1.0
+
+
+def _direction(swing, abduction):
+    """Unit vector hanging down (+y), swung forward (FORWARD z) by `swing`
+    and sideways (+x) by `abduction`"""
+    swing, abduction = np.broadcast_arrays(swing, abduction)
+    side = np.cos(abduction)
+    return np.stack(
+        [np.sin(abduction), side * np.cos(swing), FORWARD * side * np.sin(swing)], axis=-1
+    )
+
+
+def _offset(x, y, z):
+    return np.array([x, y, z], dtype=np.float32)
+
+
+def _batch(seed, first_video, num_videos, num_frames, fps):
+    """Clips of videos `first_video ...` as a (videos, frames, joints, 4) array"""
+    num_joints = len(JOINT_NAMES)
+    parameters = np.empty((num_videos, len(PARAMETER_RANGES)), dtype=np.float32)
+    joint_phases = np.empty((num_videos, num_joints), dtype=np.float32)
+    body = np.empty((num_videos, num_frames, num_joints, 3), dtype=np.float32)
+    for i in range(num_videos):
+        rng = np.random.default_rng([seed, first_video + i])
+        parameters[i] = rng.uniform(_LOW, _HIGH)
+        joint_phases[i] = rng.uniform(0, 2 * np.pi, num_joints)
+        # Positional jitter, scaled and added once the pose is known
+        rng.random(dtype=np.float32, out=body[i])
+    body -= 0.5
+    body *= 2 * JITTER
+    p = {name: parameters[:, i, None] for i, name in enumerate(PARAMETER_RANGES)}
+    t = (np.arange(num_frames, dtype=np.float32) / fps)[None, :]
+
+    phase = 2 * np.pi * p['gait_frequency'] * t + p['gait_phase']
+    opposite = phase + np.pi
+
+    # Torso, head and shoulders relative to the hip center
+    lean = p['lean'] + p['lean_swing'] * np.sin(2 * phase)
+    up = np.stack([np.zeros_like(lean), -np.cos(lean), FORWARD * np.sin(lean)], axis=-1)
+    neck = TORSO * up
+    nose = neck + HEAD * up
+    left_shoulder = neck + _offset(SHOULDER_HALF_WIDTH, 0, 0)
+    right_shoulder = neck + _offset(-SHOULDER_HALF_WIDTH, 0, 0)
+
+    # Legs swing against each other; knees bend on the back swing
+    def leg(side, leg_phase):
+        hip = _offset(side * HIP_HALF_WIDTH, 0, 0)
+        swing = p['leg_swing'] * np.sin(leg_phase)
+        knee = hip + THIGH * _direction(swing, side * LEG_ABDUCTION)
+        bend = p['knee_bend'] * 0.5 * (1 + np.sin(leg_phase - np.pi / 2))
+        ankle = knee + SHIN * _direction(swing - bend, side * LEG_ABDUCTION)
+        return hip, knee, ankle
+
+    # Arms swing against the leg on the same side; elbows bend forward
+    def arm(shoulder, side, arm_phase):
+        swing = p['arm_swing'] * np.sin(arm_phase)
+        abduction = side * p['arm_abduction']
+        elbow = shoulder + UPPER_ARM * _direction(swing, abduction)
+        bend = p['elbow_bend'] + p['elbow_swing'] * 0.5 * (1 + np.sin(arm_phase))
+        wrist = elbow + FOREARM * _direction(swing + bend, abduction)
+        return elbow, wrist
+
+    left_hip, left_knee, left_ankle = leg(1, phase)
+    right_hip, right_knee, right_ankle = leg(-1, opposite)
+    left_elbow, left_wrist = arm(left_shoulder, 1, opposite)
+    right_elbow, right_wrist = arm(right_shoulder, -1, phase)
+
+    joints = {
+        'nose': nose,
+        'left_eye': nose + _offset(0.025, -0.02, 0),
+        'right_eye': nose + _offset(-0.025, -0.02, 0),
+        'left_ear': nose + _offset(0.05, -0.005, -0.03 * FORWARD),
+        'right_ear': nose + _offset(-0.05, -0.005, -0.03 * FORWARD),
+        'left_shoulder': left_shoulder, 'right_shoulder': right_shoulder,
+        'left_elbow': left_elbow, 'right_elbow': right_elbow,
+        'left_wrist': left_wrist, 'right_wrist': right_wrist,
+        'left_hip': left_hip, 'right_hip': right_hip,
+        'left_knee': left_knee, 'right_knee': right_knee,
+        'left_ankle': left_ankle, 'right_ankle': right_ankle
+    }
+    for j, name in enumerate(JOINT_NAMES):
+        body[:, :, j] += joints[name]
+
+    # Turn the body about the vertical axis, then place it in the image
+    heading = p['heading'] + p['turn'] * np.sin(2 * np.pi * p['turn_frequency'] * t)
+    cos, sin = np.cos(heading)[..., None], np.sin(heading)[..., None]
+    x, y, z = body[..., 0], body[..., 1], body[..., 2]
+    height = p['height'][..., None]
+    root_x = p['x'] + p['drift'] * np.sin(2 * np.pi * p['drift_frequency'] * t)
+    root_y = p['y'] + p['bob'] * np.cos(2 * phase)
+
+    clips = np.empty(body.shape[:3] + (len(FIELDS),), dtype=np.float32)
+    clips[..., 0] = root_x[..., None] + height * (x * cos + z * sin)
+    clips[..., 1] = root_y[..., None] + height * y
+    clips[..., 2] = 0.5 + height * (z * cos - x * sin)
+
+    # Smoothly varying per-joint confidence
+    confidence_phase = 2 * np.pi * p['confidence_frequency'] * t
+    clips[..., 3] = p['confidence'][..., None] + 0.04 * np.sin(
+        confidence_phase[..., None] + joint_phases[:, None, :]
+    )
+    np.clip(clips[..., 3], 0.0, 1.0, out=clips[..., 3])
+    return clips
+
+
+def generate(num_videos, num_frames, seed=0, fps=30, first_video=0):
+    """Clips of `num_videos` videos as a (videos, frames, joints, 4) array"""
+    return _batch(seed, first_video, num_videos, num_frames, fps)
+
+
+def iter_sequences(num_videos, num_frames, seed=0, fps=30):
+    """Yield one PoseSequence per video, generated in bounded batches.
+
+    `video_id` of each sequence is its index in the dataset.
+    """
+    per_batch = max(1, BATCH_FRAMES // max(num_frames, 1))
+    for first in range(0, num_videos, per_batch):
+        count = min(per_batch, num_videos - first)
+        clips = _batch(seed, first, count, num_frames, fps)
+        for i in range(count):
+            yield PoseSequence(clips[i], JOINT_NAMES, fps, first + i)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (4, 5):
+        print(f'Usage: {sys.argv[0]} OUTPUT_DIR VIDEOS FRAMES [SEED]')
+        sys.exit(1)
+    output_dir = sys.argv[1]
+    os.makedirs(output_dir, exist_ok=True)
+    seed = int(sys.argv[4]) if len(sys.argv) == 5 else 0
+    for clip in iter_sequences(int(sys.argv[2]), int(sys.argv[3]), seed):
+        clip.save(os.path.join(output_dir, f'synthetic_{clip.video_id}{BINARY_EXTENSION}'))
@@ -0,0 +1,176 @@
+"""Sharded training dataset with a random-access offset index
+
+A dataset directory holds processed clips packed back to back into shard
+files of raw float32 frames, plus a small index:
+
+    dataset.json        joints, fields, frame size and shard file names
+    index.npy           one record per clip: video_id, shard, first frame
+                        in the shard, frame count and fps
+    shard_00000.bin     (frames, joints, 4) float32, little endian
+    ...
+
+A clip never spans two shards, so any window of frames of any clip is one
+contiguous byte range: `ShardedDataset.read` finds it through a dict
+lookup and fetches it with a single read.
+"""
+
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from keypoint_format import DTYPE, FIELDS, JOINT_NAMES, frame_size
+
+# Shards are closed once they reach this size
+SHARD_BYTES = 256 * 1024 * 1024
+
+INDEX_DTYPE = np.dtype([
+    ('video_id', '<i8'),
+    ('shard', '<u4'),
+    ('offset', '<u8'),
+    ('frames', '<u4'),
+    ('fps', '<f4')
+])
+
+METADATA_FILE = 'dataset.json'
+INDEX_FILE = 'index.npy'
+
+
+def shard_name(number):
+    return f'shard_{number:05d}.bin'
+
+
+def write_dataset(path, clips, joints=JOINT_NAMES, shard_bytes=SHARD_BYTES):
+    """Pack PoseSequence `clips` into a sharded dataset at `path`.
+
+    Clips are written one at a time in the order given. The dataset is
+    built next to `path` and swapped in when complete, so readers never
+    see a partial dataset. Returns the metadata.
+    """
+    joints = list(joints)
+    frame_bytes = frame_size(len(joints))
+    building = f'{path}.building'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    records = []
+    shards = []
+    shard_file = None
+    shard_frames = 0
+    try:
+        for clip in clips:
+            data = np.ascontiguousarray(clip.select(joints).data, dtype=DTYPE)
+            if shard_file is None or (shard_frames and (shard_frames + len(data)) * frame_bytes > shard_bytes):
+                if shard_file:
+                    shard_file.close()
+                shards.append(shard_name(len(shards)))
+                shard_file = open(os.path.join(building, shards[-1]), 'wb')
+                shard_frames = 0
+            shard_file.write(data.tobytes())
+            records.append((clip.video_id, len(shards) - 1, shard_frames, len(data), clip.fps))
+            shard_frames += len(data)
+    finally:
+        if shard_file:
+            shard_file.close()
+
+    index = np.array(records, dtype=INDEX_DTYPE)
+    np.save(os.path.join(building, INDEX_FILE), index)
+    metadata = {
+        'joints': joints,
+        'fields': list(FIELDS),
+        'dtype': DTYPE.str,
+        'frame_bytes': frame_bytes,
+        'shards': shards,
+        'videos': len(index),
+        'frames': int(index['frames'].sum())
+    }
+    with open(os.path.join(building, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(building, path)
+    return metadata
+
+
+class ShardedDataset:
+    """Read-only access to a dataset written by `write_dataset`.
+
+    Safe to share between threads: reads are positional and never move a
+    shared file offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, METADATA_FILE), 'r') as f:
+            self.metadata = json.load(f)
+        self.joints = self.metadata['joints']
+        self.frame_bytes = self.metadata['frame_bytes']
+        self.index = np.load(os.path.join(path, INDEX_FILE))
+        self._rows = {int(video_id): row for row, video_id in enumerate(self.index['video_id'])}
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def video_ids(self):
+        return self.index['video_id']
+
+    def num_frames(self, video_id):
+        return int(self.index['frames'][self._rows[video_id]])
+
+    def _file(self, shard):
+        f = self._files.get(shard)
+        if f is None:
+            with self._lock:
+                f = self._files.get(shard)
+                if f is None:
+                    f = open(os.path.join(self.path, self.metadata['shards'][shard]), 'rb')
+                    self._files[shard] = f
+        return f
+
+    def read(self, video_id, start=0, length=None):
+        """Frames `start:start + length` of a clip as a (frames, joints, 4) array"""
+        row = self._rows[video_id]
+        frames = int(self.index['frames'][row])
+        start = min(max(int(start), 0), frames)
+        if length is None:
+            length = frames - start
+        length = min(int(length), frames - start)
+
+        out = np.empty((length, len(self.joints), len(FIELDS)), dtype=DTYPE)
+        self.read_into(out, row, start)
+        return out
+
+    def read_into(self, out, row, start):
+        """Fill the contiguous array `out` with frames of index `row` from
+        `start` on, with one read straight into its memory"""
+        record = self.index[row]
+        if start + len(out) > record['frames']:
+            raise IndexError('Window extends past the end of the clip')
+        offset = (int(record['offset']) + int(start)) * self.frame_bytes
+        buffer = memoryview(out).cast('B')
+        f = self._file(int(record['shard']))
+        if hasattr(os, 'preadv'):
+            read = os.preadv(f.fileno(), [buffer], offset)
+        else:
+            with self._lock:
+                f.seek(offset)
+                read = f.readinto(buffer)
+        if read != len(buffer):
+            raise IOError(f'Short read from shard {int(record["shard"])}')
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,437 @@
+"""Row exports of processed keypoints
+
+Every export has one row per (video, frame, joint) with typed columns:
+
+    video_id    int32
+    frame       int32, the frame's number in its source clip
+    joint       joint name (dictionary encoded; an int16 index in NPZ)
+    x, y, z     float32
+    confidence  float32
+
+Clips are read one at a time and written in row groups of a bounded
+number of rows, so memory use does not grow with the dataset. Parquet and
+Arrow (Feather v2) need pyarrow; NPZ, CSV and JSON Lines are always
+available. Text formats print floats with 9 significant digits, enough
+for every float32 value to read back exactly.
+
+`export_incremental` keeps an export up to date as a directory of parts
+plus a manifest of the version of every video exported, and only writes
+the clips that are new or changed since the last run. A changed clip's
+old rows stay in their part until it is compacted, so such an export is
+read with `iter_incremental`, or by taking from every part only the rows
+of the videos in its `live` list in the manifest.
+"""
+
+import csv
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from operator import itemgetter
+
+import numpy as np
+
+from keypoint_format import FIELDS, JOINT_NAMES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Rows per row group / record batch
+ROW_GROUP_ROWS = 1 << 20
+
+# Rows formatted per batch by the text exports, and their write buffer
+TEXT_BATCH_ROWS = 1 << 16
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+COLUMNS = ('video_id', 'frame', 'joint') + FIELDS
+
+COLUMN_DTYPES = dict(
+    video_id=np.dtype('<i4'),
+    frame=np.dtype('<i4'),
+    joint=np.dtype('<i2'),
+    **{field: np.dtype('<f4') for field in FIELDS}
+)
+
+EXTENSIONS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'npz': '.npz',
+    'csv': '.csv',
+    'jsonl': '.jsonl'
+}
+
+MANIFEST_FILE = 'manifest.json'
+
+# Parts whose live rows drop below this fraction are rewritten
+COMPACT_FRACTION = 0.5
+
+# Header and per-row format of the text exports
+TEXT_FORMATS = {
+    'csv': (
+        ','.join(COLUMNS) + '\n',
+        '%d,%d,%s,%.9g,%.9g,%.9g,%.9g\n'
+    ),
+    'jsonl': (
+        '',
+        '{"video_id": %d, "frame": %d, "joint": "%s", '
+        '"x": %.9g, "y": %.9g, "z": %.9g, "confidence": %.9g}\n'
+    )
+}
+
+
+def available_formats():
+    """Export formats that can be written with the installed packages"""
+    if pa is None:
+        return ['npz', 'csv', 'jsonl']
+    return ['parquet', 'arrow', 'npz', 'csv', 'jsonl']
+
+
+def clip_columns(video_id, frames, frame_numbers=None):
+    """Columns of one (frames, joints, 4) clip, one row per frame and joint.
+
+    `frame_numbers` are the source frame numbers of a clip with frames
+    left out (see clip_quality.kept_frames); by default frames count from 0.
+    """
+    frames = np.asarray(frames, dtype=COLUMN_DTYPES['x'])
+    num_frames, num_joints = frames.shape[:2]
+    rows = num_frames * num_joints
+    if frame_numbers is None:
+        frame_numbers = np.arange(num_frames, dtype=COLUMN_DTYPES['frame'])
+    elif len(frame_numbers) != num_frames:
+        raise ValueError(f'Expected {num_frames} frame numbers, got {len(frame_numbers)}')
+    columns = {
+        'video_id': np.full(rows, video_id, dtype=COLUMN_DTYPES['video_id']),
+        'frame': np.repeat(np.asarray(frame_numbers, dtype=COLUMN_DTYPES['frame']), num_joints),
+        'joint': np.tile(np.arange(num_joints, dtype=COLUMN_DTYPES['joint']), num_frames)
+    }
+    flat = frames.reshape(rows, len(FIELDS))
+    for i, field in enumerate(FIELDS):
+        columns[field] = np.ascontiguousarray(flat[:, i])
+    return columns
+
+
+def row_groups(clips, rows=ROW_GROUP_ROWS):
+    """Regroup the columns of `(video_id, frames)` or `(video_id, frames,
+    frame_numbers)` clips into groups of `rows` rows (the last one may be
+    shorter)"""
+    pending, pending_rows = [], 0
+    for clip in clips:
+        columns = clip_columns(*clip)
+        total = len(columns['frame'])
+        start = 0
+        while start < total:
+            take = min(rows - pending_rows, total - start)
+            pending.append({name: column[start:start + take] for name, column in columns.items()})
+            pending_rows += take
+            start += take
+            if pending_rows == rows:
+                yield _concatenate(pending)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield _concatenate(pending)
+
+
+def _concatenate(parts):
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+def _arrow_schema(joints):
+    return pa.schema([
+        ('video_id', pa.int32()),
+        ('frame', pa.int32()),
+        ('joint', pa.dictionary(pa.int16(), pa.string())),
+    ] + [(field, pa.float32()) for field in FIELDS])
+
+
+def _arrow_batch(group, schema, joint_names):
+    arrays = [pa.array(group['video_id']), pa.array(group['frame'])]
+    arrays.append(pa.DictionaryArray.from_arrays(pa.array(group['joint']), joint_names))
+    arrays += [pa.array(group[field]) for field in FIELDS]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _write_arrow(path, clips, joints, rows, parquet):
+    if pa is None:
+        raise RuntimeError('pyarrow is not installed')
+    schema = _arrow_schema(joints)
+    joint_names = pa.array(joints, type=pa.string())
+    total = 0
+    if parquet:
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    with writer:
+        for group in row_groups(clips, rows):
+            batch = _arrow_batch(group, schema, joint_names)
+            if parquet:
+                writer.write_batch(batch, row_group_size=rows)
+            else:
+                writer.write_batch(batch)
+            total += batch.num_rows
+    return total
+
+
+def _write_npz(path, clips, joints, rows):
+    """Stream each column to a scratch file, then store them as .npy members.
+
+    np.savez needs whole arrays in memory; writing the .npy headers once the
+    row count is known keeps memory bounded by one row group.
+    """
+    scratch = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        files = {name: open(os.path.join(scratch, name), 'wb') for name in COLUMNS}
+        total = 0
+        try:
+            for group in row_groups(clips, rows):
+                for name in COLUMNS:
+                    files[name].write(group[name].tobytes())
+                total += len(group['frame'])
+        finally:
+            for f in files.values():
+                f.close()
+
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name in COLUMNS:
+                header = {
+                    'descr': np.lib.format.dtype_to_descr(COLUMN_DTYPES[name]),
+                    'fortran_order': False,
+                    'shape': (total,)
+                }
+                with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, header)
+                    with open(os.path.join(scratch, name), 'rb') as f:
+                        shutil.copyfileobj(f, member, 8 * 1024 * 1024)
+            with archive.open('joints.npy', 'w') as member:
+                np.lib.format.write_array(member, np.array(joints))
+    finally:
+        shutil.rmtree(scratch)
+    return total
+
+
+def _write_text(path, clips, joints, format_type):
+    """Write rows as text. Columns are converted to Python values a batch
+    at a time; each row is still formatted on its own with `%`, and the
+    batch is joined into one write."""
+    header, row_format = TEXT_FORMATS[format_type]
+    joint_names = np.array(joints, dtype=object)
+    total = 0
+    with open(path, 'w', buffering=WRITE_BUFFER_SIZE, newline='') as f:
+        f.write(header)
+        for group in row_groups(clips, TEXT_BATCH_ROWS):
+            group['joint'] = joint_names[group['joint']]
+            columns = [group[name].tolist() for name in COLUMNS]
+            f.write(''.join(map(row_format.__mod__, zip(*columns))))
+            total += len(columns[0])
+    return total
+
+
+def export_rows(path, format_type, clips, joints=JOINT_NAMES, rows=ROW_GROUP_ROWS):
+    """Write `(video_id, frames)` or `(video_id, frames, frame_numbers)`
+    clips to `path` in one of `EXTENSIONS`.
+
+    Returns the number of rows written.
+    """
+    if format_type == 'parquet':
+        return _write_arrow(path, clips, list(joints), rows, parquet=True)
+    if format_type == 'arrow':
+        return _write_arrow(path, clips, list(joints), rows, parquet=False)
+    if format_type == 'npz':
+        return _write_npz(path, clips, list(joints), rows)
+    if format_type in TEXT_FORMATS:
+        return _write_text(path, clips, list(joints), format_type)
+    raise ValueError(f'Unknown export format: {format_type}')
+
+
+def part_name(number, format_type):
+    return f'part-{number:05d}{EXTENSIONS[format_type]}'
+
+
+def read_manifest(directory):
+    """Manifest of an incremental export, or None if there is none"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(f'{path}.part', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f'{path}.part', path)
+
+
+def export_incremental(directory, format_type, versions, load, joints=JOINT_NAMES, rows=ROW_GROUP_ROWS):
+    """Bring the export in `directory` up to date with `versions`.
+
+    `versions` maps every video id to export to a version (anything that
+    changes when its keypoints do); `load(video_ids)` yields their
+    `(video_id, frames)` or `(video_id, frames, frame_numbers)` clips. Videos that are new or whose version
+    changed are written to one new part file; the manifest then records
+    for every video the part holding its current rows, and for every part
+    the `live` videos whose rows in it are current. Rows of an earlier
+    version left in an older part are stale; `iter_incremental` skips
+    them. Parts with no live videos are deleted, and parts that are
+    mostly stale are rewritten into the new part.
+
+    Returns a summary of the run.
+    """
+    if format_type not in EXTENSIONS:
+        raise ValueError(f'Unknown export format: {format_type}')
+    joints = list(joints)
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    if manifest is None or manifest['format'] != format_type or manifest['joints'] != joints:
+        manifest = {'format': format_type, 'joints': joints, 'next_part': 0, 'parts': {}, 'videos': {}}
+
+    versions = {str(video_id): version for video_id, version in versions.items()}
+    exported = manifest['videos']
+    changed = {video_id for video_id, version in versions.items()
+               if exported.get(video_id, {}).get('version') != version}
+    for video_id in set(exported) - set(versions):
+        del exported[video_id]
+
+    # Live rows of every part, once changed and removed videos are dropped
+    live = {name: [] for name in manifest['parts']}
+    for video_id, entry in exported.items():
+        if video_id not in changed:
+            live[entry['part']].append(video_id)
+    obsolete = []
+    rewrite = set()
+    for name, part in manifest['parts'].items():
+        live_rows = sum(exported[video_id]['rows'] for video_id in live[name])
+        if not live[name] or live_rows < part['rows'] * COMPACT_FRACTION:
+            obsolete.append(name)
+            rewrite.update(live[name])
+
+    pending = sorted(changed | rewrite, key=int)
+    written = 0
+    counts = {}
+    if pending:
+        name = part_name(manifest['next_part'], format_type)
+        path = os.path.join(directory, name)
+
+        def counted(clips):
+            for clip in clips:
+                counts[str(clip[0])] = len(clip[1]) * len(joints)
+                yield clip
+
+        written = export_rows(f'{path}.part', format_type, counted(load([int(v) for v in pending])), joints, rows)
+        if counts:
+            os.replace(f'{path}.part', path)
+            manifest['next_part'] += 1
+            manifest['parts'][name] = {'rows': written, 'videos': len(counts)}
+        for video_id in pending:
+            if video_id in counts:
+                exported[video_id] = {'version': versions[video_id], 'part': name, 'rows': counts[video_id]}
+            else:
+                # Not loaded, so not exported; tried again next time
+                exported.pop(video_id, None)
+
+    for name in obsolete:
+        del manifest['parts'][name]
+    for name, part in manifest['parts'].items():
+        part['live'] = []
+    for video_id, entry in exported.items():
+        manifest['parts'][entry['part']]['live'].append(int(video_id))
+    for part in manifest['parts'].values():
+        part['live'].sort()
+    _write_manifest(directory, manifest)
+
+    # Only removed once the manifest no longer refers to them; stray files
+    # from an interrupted run go too, other files are left alone
+    for name in os.listdir(directory):
+        if name not in manifest['parts'] and (name.startswith('part-') or name.endswith('.part')):
+            os.remove(os.path.join(directory, name))
+
+    return {
+        'parts': len(manifest['parts']),
+        'videos': len(exported),
+        'written_videos': len(counts),
+        'written_rows': written,
+        'rewritten_parts': len(obsolete),
+        'total_rows': sum(entry['rows'] for entry in exported.values())
+    }
+
+
+def _text_columns(rows, joint_index):
+    """Column arrays of parsed text rows, each a sequence in COLUMNS order"""
+    values = list(zip(*rows))
+    columns = {
+        name: np.array(column, dtype=np.float64 if name in FIELDS else np.int64).astype(COLUMN_DTYPES[name])
+        for name, column in zip(COLUMNS, values) if name != 'joint'
+    }
+    columns['joint'] = np.array([joint_index[name] for name in values[2]], dtype=COLUMN_DTYPES['joint'])
+    return columns
+
+
+def read_columns(path, format_type, joints=JOINT_NAMES):
+    """Yield the rows of one export file as batches of columns, like
+    `row_groups`; joints are indices into `joints`"""
+    joints = list(joints)
+    joint_index = {name: i for i, name in enumerate(joints)}
+    if format_type in ('parquet', 'arrow'):
+        if pa is None:
+            raise RuntimeError('pyarrow is not installed')
+        if format_type == 'parquet':
+            batches = pq.ParquetFile(path).iter_batches()
+        else:
+            reader = pa.ipc.open_file(path)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        for batch in batches:
+            columns = {name: batch.column(name).to_numpy() for name in COLUMNS if name != 'joint'}
+            joint = batch.column('joint')
+            # Dictionaries are stored per batch; map them onto `joints`
+            table = np.array(
+                [joint_index[name] for name in joint.dictionary.to_pylist()], dtype=COLUMN_DTYPES['joint']
+            )
+            columns['joint'] = table[joint.indices.to_numpy()]
+            yield columns
+    elif format_type == 'npz':
+        with np.load(path) as archive:
+            stored = archive['joints'].tolist()
+            columns = {name: archive[name] for name in COLUMNS}
+        table = np.array([joint_index[name] for name in stored], dtype=COLUMN_DTYPES['joint'])
+        columns['joint'] = table[columns['joint']]
+        yield columns
+    elif format_type in TEXT_FORMATS:
+        with open(path, 'r', newline='') as f:
+            if format_type == 'csv':
+                rows = csv.reader(f)
+                next(rows, None)
+            else:
+                rows = (itemgetter(*COLUMNS)(json.loads(line)) for line in f)
+            for batch in iter(lambda: list(itertools.islice(rows, TEXT_BATCH_ROWS)), []):
+                yield _text_columns(batch, joint_index)
+    else:
+        raise ValueError(f'Unknown export format: {format_type}')
+
+
+def iter_incremental(directory):
+    """Yield the current rows of an incremental export as batches of
+    columns, skipping the stale rows of changed videos left in older
+    parts"""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f'No {MANIFEST_FILE} in {directory}')
+    live = {name: [] for name in manifest['parts']}
+    for video_id, entry in manifest['videos'].items():
+        live[entry['part']].append(int(video_id))
+
+    for name in sorted(manifest['parts']):
+        video_ids = np.array(live[name], dtype=COLUMN_DTYPES['video_id'])
+        path = os.path.join(directory, name)
+        for columns in read_columns(path, manifest['format'], manifest['joints']):
+            keep = np.isin(columns['video_id'], video_ids)
+            if keep.all():
+                yield columns
+            elif keep.any():
+                yield {column: values[keep] for column, values in columns.items()}
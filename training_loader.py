@@ -0,0 +1,107 @@
+"""Batches of fixed-length motion windows for training
+
+`WindowLoader` cuts every clip of a `ShardedDataset` into windows of
+`window` frames, `stride` frames apart, and yields them in batches as one
+contiguous (batch, window, joints, 4) float32 array. Each window is read
+straight into its slot of the batch with a single positional read, so no
+frame is decoded or copied twice.
+
+Batches are assembled by a pool of background threads a few batches
+ahead of the consumer; the reads release the GIL, so disk access overlaps
+with training. With `shuffle`, window order is a seeded permutation that
+changes every epoch.
+
+    with ShardedDataset('robot_training_data/dataset') as dataset:
+        for epoch in range(epochs):
+            for batch in WindowLoader(dataset, 60, stride=15, epoch=epoch):
+                train(batch.frames)
+"""
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from keypoint_format import DTYPE, FIELDS
+
+# Batches assembled ahead of the consumer
+PREFETCH_BATCHES = 4
+
+WindowBatch = collections.namedtuple('WindowBatch', ['frames', 'video_ids', 'starts'])
+
+
+def window_starts(num_frames, window, stride):
+    """Index rows and start frames of every window of every clip, in order"""
+    num_frames = np.asarray(num_frames, dtype=np.int64)
+    counts = np.maximum((num_frames - window) // stride + 1, 0)
+    rows = np.repeat(np.arange(len(num_frames)), counts)
+    # Position of each window within its clip
+    first = np.cumsum(counts) - counts
+    starts = (np.arange(counts.sum()) - np.repeat(first, counts)) * stride
+    return rows, starts
+
+
+class WindowLoader:
+    """Iterable of `WindowBatch`es of windows of a `ShardedDataset`.
+
+    Clips shorter than `window` are skipped. `stride` defaults to
+    `window` (no overlap). Iterating again starts the next epoch.
+    """
+
+    def __init__(self, dataset, window, stride=None, batch_size=32, shuffle=True,
+                 seed=0, epoch=0, drop_last=False, workers=2, prefetch=PREFETCH_BATCHES):
+        if window < 1 or (stride is not None and stride < 1) or batch_size < 1:
+            raise ValueError('window, stride and batch_size must be positive')
+        self.dataset = dataset
+        self.window = int(window)
+        self.stride = int(stride or window)
+        self.batch_size = int(batch_size)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = epoch
+        self.drop_last = drop_last
+        self.workers = max(1, workers)
+        self.prefetch = max(1, prefetch)
+        self.rows, self.starts = window_starts(dataset.index['frames'], self.window, self.stride)
+
+    @property
+    def num_windows(self):
+        return len(self.rows)
+
+    def __len__(self):
+        if self.drop_last:
+            return self.num_windows // self.batch_size
+        return -(-self.num_windows // self.batch_size)
+
+    def _order(self, epoch):
+        if not self.shuffle:
+            return np.arange(self.num_windows)
+        return np.random.default_rng([self.seed, epoch]).permutation(self.num_windows)
+
+    def _load(self, windows):
+        rows, starts = self.rows[windows], self.starts[windows]
+        frames = np.empty(
+            (len(windows), self.window, len(self.dataset.joints), len(FIELDS)), dtype=DTYPE
+        )
+        for i in range(len(windows)):
+            self.dataset.read_into(frames[i], rows[i], starts[i])
+        return WindowBatch(frames, self.dataset.video_ids[rows], starts)
+
+    def __iter__(self):
+        order = self._order(self.epoch)
+        self.epoch += 1
+        stop = len(self) * self.batch_size if self.drop_last else len(order)
+        batches = (order[i:min(i + self.batch_size, stop)] for i in range(0, stop, self.batch_size))
+
+        pool = ThreadPoolExecutor(self.workers)
+        pending = collections.deque()
+        try:
+            for windows in batches:
+                pending.append(pool.submit(self._load, windows))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Also reached when the consumer stops early
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,279 @@
+"""Background keypoint extraction jobs
+
+Jobs run in a pool of worker processes and are scheduled shortest job
+first by video duration, so a large batch keeps every core busy while
+short clips finish early. Every change of a job is saved as a processing
+run in the video registry; jobs that were queued or running when the app
+stopped are queued again on the next start.
+"""
+
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from keypoint_format import PoseSequence
+from synthetic_motion import generate
+
+# Simulated extraction time per video, in seconds
+SIMULATED_SECONDS = 2.0
+PROGRESS_STEPS = 20
+
+# Used to estimate duration from file size when OpenCV is unavailable
+ESTIMATED_BYTES_PER_SECOND = 1024 * 1024
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def video_duration(path):
+    """Duration of a video in seconds.
+
+    Read from the container with OpenCV when it is installed, otherwise
+    estimated from the file size. Only used to order jobs.
+    """
+    try:
+        import cv2
+        capture = cv2.VideoCapture(str(path))
+        try:
+            frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+            fps = capture.get(cv2.CAP_PROP_FPS)
+        finally:
+            capture.release()
+        if frames > 0 and fps > 0:
+            return frames / fps
+    except ImportError:
+        pass
+
+    try:
+        return os.path.getsize(path) / ESTIMATED_BYTES_PER_SECOND
+    except OSError:
+        return math.inf
+
+
+def extract_keypoints(job_id, video_id, keypoints_path, progress, cancelled):
+    """Worker entry point: extract keypoints for one video.
+
+    Reports progress through the shared `progress` dict and stops early
+    when `cancelled` has the job id set. Returns False when cancelled.
+    """
+    # Simulate pose estimation processing
+    # In production, this would use MediaPipe, OpenPose, or similar
+    for step in range(PROGRESS_STEPS):
+        if cancelled.get(job_id):
+            return False
+        time.sleep(SIMULATED_SECONDS / PROGRESS_STEPS)
+        progress[job_id] = (step + 1) / PROGRESS_STEPS * 0.9
+
+    # Each frame has 17 keypoints (typical skeleton); seeded by video
+    clip = PoseSequence(generate(1, 150, seed=video_id)[0], fps=30, video_id=video_id)
+
+    temp_path = f"{keypoints_path}.part"
+    clip.save(temp_path)
+    os.replace(temp_path, keypoints_path)
+
+    progress[job_id] = 1.0
+    return True
+
+
+class JobQueue:
+    """Shortest-job-first queue of extraction jobs over a process pool.
+
+    Jobs are persisted through `registry` (a `VideoRegistry`).
+    `on_complete(job)` is called from a background thread whenever a job
+    finishes successfully; the job stays running until it returns, so its
+    results are recorded before it shows as done.
+    """
+
+    def __init__(self, registry, max_workers=None, on_complete=None):
+        self.registry = registry
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.on_complete = on_complete
+        self.jobs = {}
+
+        self._heap = []
+        self._sequence = itertools.count()
+        # Sequence number of every queued job's current heap entry; entries
+        # left behind by cancel and retry are skipped
+        self._entries = {}
+        self._running = {}
+        self._stopped = False
+        self._condition = threading.Condition()
+
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.dict()
+        self._cancelled = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        self._load()
+        threading.Thread(target=self._schedule, daemon=True).start()
+
+    def _load(self):
+        """Queue again the jobs that never finished in a previous session"""
+        for job in self.registry.list_runs(ACTIVE_STATUSES):
+            job['status'] = 'queued'
+            job['progress'] = 0.0
+            self.jobs[job['id']] = job
+            self._push(job)
+            self._save(job)
+
+    def _save(self, job):
+        """Persist one job; callers hold the condition lock"""
+        self.registry.save_run(job)
+
+    def _push(self, job):
+        sequence = next(self._sequence)
+        self._entries[job['id']] = sequence
+        heapq.heappush(self._heap, (job['duration'], sequence, job['id']))
+
+    def enqueue(self, video_id, video_path, keypoints_path):
+        """Queue extraction for one video and return the job"""
+        job = {
+            'id': uuid.uuid4().hex,
+            'video_id': video_id,
+            'video_path': str(video_path),
+            'keypoints_path': str(keypoints_path),
+            'duration': video_duration(video_path),
+            'status': 'queued',
+            'progress': 0.0,
+            'error': None,
+            'attempts': 0,
+            'created': time.time()
+        }
+        with self._condition:
+            self.jobs[job['id']] = job
+            self._push(job)
+            self._save(job)
+            self._condition.notify()
+        return dict(job)
+
+    def status(self, job_id):
+        """Current state of a job, with live progress for running jobs"""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            job = dict(job) if job is not None else None
+        if job is None:
+            # Finished in an earlier session
+            return self.registry.get_run(job_id)
+        if job['status'] == 'running':
+            job['progress'] = self._progress.get(job_id, job['progress'])
+        return job
+
+    def list(self):
+        """Current state of every job of this session"""
+        with self._condition:
+            job_ids = list(self.jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns whether it was active"""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] not in ACTIVE_STATUSES:
+                return False
+            if job['status'] == 'running':
+                # The worker checks this flag between steps
+                self._cancelled[job_id] = True
+            # Queued jobs are skipped when they reach the top of the heap
+            self._entries.pop(job_id, None)
+            job['status'] = 'cancelled'
+            self._save(job)
+        return True
+
+    def retry(self, job_id):
+        """Queue a failed or cancelled job again"""
+        with self._condition:
+            job = self.jobs.get(job_id) or self.registry.get_run(job_id)
+            if job is None or job['status'] not in ('failed', 'cancelled') or job_id in self._running:
+                return False
+            job['status'] = 'queued'
+            job['progress'] = 0.0
+            job['error'] = None
+            self.jobs[job_id] = job
+            self._cancelled.pop(job_id, None)
+            self._push(job)
+            self._save(job)
+            self._condition.notify()
+        return True
+
+    def _schedule(self):
+        """Hand the shortest queued job to the pool whenever a worker is free"""
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._heap or len(self._running) >= self.max_workers):
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                _, sequence, job_id = heapq.heappop(self._heap)
+                if self._entries.get(job_id) != sequence:
+                    continue
+                del self._entries[job_id]
+                job = self.jobs[job_id]
+                if job['status'] != 'queued':
+                    continue
+
+                job['status'] = 'running'
+                job['attempts'] += 1
+                self._progress[job_id] = 0.0
+                future = self._executor.submit(
+                    extract_keypoints,
+                    job_id,
+                    job['video_id'],
+                    job['keypoints_path'],
+                    self._progress,
+                    self._cancelled
+                )
+                self._running[job_id] = future
+                self._save(job)
+            future.add_done_callback(lambda future, job_id=job_id: self._finish(job_id, future))
+
+    def _finish(self, job_id, future):
+        """Record the outcome of a job that left the pool"""
+        with self._condition:
+            if self._stopped:
+                # Left as running, so the next session queues it again
+                return
+            job = self.jobs[job_id]
+            del self._running[job_id]
+            completed = False
+            try:
+                if future.result():
+                    # Still running until on_complete has recorded the results
+                    job['progress'] = 1.0
+                    completed = True
+                else:
+                    job['status'] = 'cancelled'
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+            self._cancelled.pop(job_id, None)
+            self._progress.pop(job_id, None)
+            if not completed:
+                self._save(job)
+            self._condition.notify()
+            finished = dict(job)
+
+        if not completed:
+            return
+        error = None
+        if self.on_complete:
+            try:
+                self.on_complete(finished)
+            except Exception as e:
+                error = str(e)
+        with self._condition:
+            job['status'] = 'failed' if error else 'done'
+            job['error'] = error
+            self._save(job)
+
+    def shutdown(self):
+        """Stop the worker pool, abandoning jobs that have not started"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
@@ -0,0 +1,270 @@
+"""Persistent registry of videos, processing runs and keypoint artifacts
+
+Everything the training app knows about its data lives in one SQLite
+database inside the output directory, so nothing is lost on restart and
+startup does not rescan files. Lookups by status, content hash and video
+are indexed, which keeps listing fast with tens of thousands of clips.
+
+A video's full SHA-256 may be unknown (NULL): files ingested by path are
+only hashed whole when their size and sample hash match a stored video.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT UNIQUE,
+    sample_hash TEXT,
+    status TEXT NOT NULL DEFAULT 'uploaded',
+    ingest TEXT,
+    job_id TEXT,
+    keypoints_file TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_status ON videos (status);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos (id),
+    video_path TEXT NOT NULL,
+    keypoints_path TEXT NOT NULL,
+    duration REAL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status);
+CREATE INDEX IF NOT EXISTS runs_video ON runs (video_id);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id INTEGER NOT NULL REFERENCES videos (id),
+    run_id TEXT REFERENCES runs (id),
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    frames INTEGER,
+    fps REAL,
+    mean_confidence REAL,
+    min_confidence REAL,
+    low_confidence REAL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_video ON artifacts (video_id, kind);
+CREATE INDEX IF NOT EXISTS artifacts_kind ON artifacts (kind, id);
+"""
+
+VIDEO_FIELDS = (
+    'filename', 'path', 'size', 'sha256', 'sample_hash', 'status', 'ingest', 'job_id', 'keypoints_file'
+)
+# Columns added after the first release, created on older databases
+MIGRATIONS = {
+    'videos': (
+        ('sample_hash', 'TEXT'),
+    ),
+    'artifacts': (
+        ('mean_confidence', 'REAL'),
+        ('min_confidence', 'REAL'),
+        ('low_confidence', 'REAL')
+    )
+}
+
+ARTIFACT_STATS = ('frames', 'fps', 'mean_confidence', 'min_confidence', 'low_confidence')
+
+RUN_FIELDS = (
+    'id', 'video_id', 'video_path', 'keypoints_path', 'duration',
+    'status', 'progress', 'error', 'attempts', 'created'
+)
+
+
+class VideoRegistry:
+    """SQLite-backed store shared by the API thread, bridge calls and the
+    job queue's callbacks; one connection is used under a lock"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        # Commits are skipped while inside bulk()
+        self._deferred = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._migrate()
+        self._db.commit()
+
+    def _migrate(self):
+        for table, columns in MIGRATIONS.items():
+            existing = {row['name'] for row in self._db.execute(f'PRAGMA table_info({table})')}
+            for name, column_type in columns:
+                if name not in existing:
+                    self._db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+        # Older databases require sha256; SQLite cannot drop NOT NULL, so
+        # the table is copied into one without it and swapped in
+        sql = self._db.execute("SELECT sql FROM sqlite_master WHERE name = 'videos'").fetchone()['sql']
+        if 'sha256 TEXT NOT NULL' in sql:
+            sql = sql.replace('sha256 TEXT NOT NULL', 'sha256 TEXT').replace('videos', 'videos_new', 1)
+            self._db.execute(sql)
+            self._db.execute('INSERT INTO videos_new SELECT * FROM videos')
+            self._db.execute('DROP TABLE videos')
+            self._db.execute('ALTER TABLE videos_new RENAME TO videos')
+            self._db.execute('CREATE INDEX videos_status ON videos (status)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS videos_sample ON videos (size, sample_hash)')
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            if not self._deferred:
+                self._db.commit()
+            return cursor
+
+    @contextmanager
+    def bulk(self):
+        """Group the writes made inside the block into one transaction"""
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred:
+                    self._db.commit()
+
+    # Videos
+
+    def add_video(self, filename, path, size, sha256, ingest=None, sample_hash=None):
+        """Record a stored video and return it with its new id"""
+        cursor = self._execute(
+            'INSERT INTO videos (filename, path, size, sha256, sample_hash, ingest, created) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (filename, str(path), size, sha256, sample_hash, ingest, time.time())
+        )
+        return self.get_video(cursor.lastrowid)
+
+    def get_video(self, video_id):
+        rows = self._query('SELECT * FROM videos WHERE id = ?', (video_id,))
+        return rows[0] if rows else None
+
+    def find_video_by_hash(self, sha256):
+        rows = self._query('SELECT * FROM videos WHERE sha256 = ?', (sha256,))
+        return rows[0] if rows else None
+
+    def find_videos_by_sample(self, size, sample_hash):
+        """Videos that may hold the same content as a file of `size` bytes
+        with `sample_hash`: those matching both, and those of that size
+        whose sample hash was never computed"""
+        return self._query(
+            'SELECT * FROM videos WHERE size = ? AND (sample_hash = ? OR sample_hash IS NULL)',
+            (size, sample_hash)
+        )
+
+    def list_videos(self, status=None, offset=0, limit=-1):
+        """Videos in id order, optionally only those with `status`"""
+        if status is None:
+            return self._query(
+                'SELECT * FROM videos ORDER BY id LIMIT ? OFFSET ?', (limit, offset)
+            )
+        return self._query(
+            'SELECT * FROM videos WHERE status = ? ORDER BY id LIMIT ? OFFSET ?',
+            (status, limit, offset)
+        )
+
+    def count_videos(self, status=None):
+        if status is None:
+            return self._query('SELECT COUNT(*) AS n FROM videos')[0]['n']
+        return self._query('SELECT COUNT(*) AS n FROM videos WHERE status = ?', (status,))[0]['n']
+
+    def update_video(self, video_id, **fields):
+        unknown = set(fields) - set(VIDEO_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown video fields: {sorted(unknown)}')
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(
+            f'UPDATE videos SET {assignments} WHERE id = ?',
+            (*fields.values(), video_id)
+        )
+
+    # Processing runs
+
+    def save_run(self, run):
+        """Insert or update a processing run (a job of the job queue)"""
+        self._execute(
+            f'INSERT OR REPLACE INTO runs ({", ".join(RUN_FIELDS)}) '
+            f'VALUES ({", ".join("?" for _ in RUN_FIELDS)})',
+            tuple(run.get(name) for name in RUN_FIELDS)
+        )
+
+    def get_run(self, run_id):
+        rows = self._query('SELECT * FROM runs WHERE id = ?', (run_id,))
+        return rows[0] if rows else None
+
+    def list_runs(self, statuses=None):
+        """Runs in creation order, optionally only those in `statuses`"""
+        if statuses is None:
+            return self._query('SELECT * FROM runs ORDER BY created')
+        placeholders = ', '.join('?' for _ in statuses)
+        return self._query(
+            f'SELECT * FROM runs WHERE status IN ({placeholders}) ORDER BY created',
+            tuple(statuses)
+        )
+
+    # Artifacts
+
+    def add_artifact(self, video_id, kind, path, run_id=None, **stats):
+        """Record a file derived from a video, such as its keypoints.
+
+        `stats` are any of `ARTIFACT_STATS`, kept so listings never have to
+        open the file.
+        """
+        unknown = set(stats) - set(ARTIFACT_STATS)
+        if unknown:
+            raise ValueError(f'Unknown artifact stats: {sorted(unknown)}')
+        fields = ('video_id', 'run_id', 'kind', 'path', 'created') + tuple(stats)
+        cursor = self._execute(
+            f'INSERT INTO artifacts ({", ".join(fields)}) '
+            f'VALUES ({", ".join("?" for _ in fields)})',
+            (video_id, run_id, kind, str(path), time.time(), *stats.values())
+        )
+        return cursor.lastrowid
+
+    def list_artifacts(self, kind='keypoints', offset=0, limit=-1):
+        """Latest artifact of `kind` per video, in video id order"""
+        return self._query(
+            'SELECT * FROM artifacts WHERE id IN '
+            '(SELECT MAX(id) FROM artifacts WHERE kind = ? GROUP BY video_id) '
+            'ORDER BY video_id LIMIT ? OFFSET ?',
+            (kind, limit, offset)
+        )
+
+    def artifact_totals(self, kind='keypoints'):
+        """Number of videos with an artifact of `kind` and their total frames"""
+        return self._query(
+            'SELECT COUNT(*) AS videos, COALESCE(SUM(frames), 0) AS frames FROM artifacts '
+            'WHERE id IN (SELECT MAX(id) FROM artifacts WHERE kind = ? GROUP BY video_id)',
+            (kind,)
+        )[0]
+
+    def latest_artifact(self, video_id, kind='keypoints'):
+        rows = self._query(
+            'SELECT * FROM artifacts WHERE video_id = ? AND kind = ? ORDER BY id DESC LIMIT 1',
+            (video_id, kind)
+        )
+        return rows[0] if rows else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()